@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import xmlrpc.client
+from typing import Any, Dict, List, Tuple
+
+from RpcCodec import codec
+
+
+class AsyncRpcConnection:
+    """Single keep-alive HTTP/1.1 connection to an XML-RPC peer."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Initialize AsyncRpcConnection.
+
+        Args:
+            reader (asyncio.StreamReader): Stream reader of the connection.
+            writer (asyncio.StreamWriter): Stream writer of the connection.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.keep_alive = True
+
+    def close(self) -> None:
+        """Close the underlying socket."""
+        self.keep_alive = False
+        self.writer.close()
+
+    async def request(self, host: str, port: int, path: str, body: bytes) -> bytes:
+        """
+        Send one POST request and read the full response body.
+
+        Args:
+            host (str): Peer host, used for the Host header.
+            port (int): Peer port, used for the Host header.
+            path (str): Request path.
+            body (bytes): Encoded XML-RPC request.
+
+        Returns:
+            bytes: Response body.
+        """
+        head = (f"POST {path} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "User-Agent: Trinity-AsyncRpc\r\n"
+                "Content-Type: text/xml\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: keep-alive\r\n\r\n")
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by peer")
+        version, status, *reason = status_line.decode("latin-1").split(None, 2)
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        connection_header = headers.get("connection", "").lower()
+        # HTTP/1.0 серверы (SimpleXMLRPCServer по умолчанию) закрывают соединение после ответа
+        if version == "HTTP/1.0" and connection_header != "keep-alive" or connection_header == "close":
+            self.keep_alive = False
+        if "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            self.keep_alive = False
+        if int(status) != 200:
+            raise xmlrpc.client.ProtocolError(f"{host}:{port}{path}", int(status), " ".join(reason).strip(), headers)
+        return data
+
+
+class AsyncRpcClient:
+    """
+    Asyncio XML-RPC client for node-to-node traffic.
+
+    Speaks the same XML-RPC methods as xmlrpc.client.ServerProxy, but keeps
+    idle HTTP/1.1 connections per peer and allows thousands of in-flight
+    calls on one event loop.
+    """
+
+    def __init__(self, logger, timeout: float = 3.0, path: str = "/RPC2"):
+        """
+        Initialize AsyncRpcClient.
+
+        Args:
+            logger: Logger object for logging messages.
+            timeout (float): Timeout for connect plus one request/response.
+            path (str): XML-RPC path on the peer.
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.path = path
+        self._idle: Dict[Tuple[str, int], List[AsyncRpcConnection]] = {}
+
+    async def _acquire(self, host: str, port: int) -> Tuple[AsyncRpcConnection, bool]:
+        idle = self._idle.get((host, port))
+        while idle:
+            connection = idle.pop()
+            if not connection.writer.is_closing() and not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+        reader, writer = await asyncio.open_connection(host, port)
+        return AsyncRpcConnection(reader, writer), False
+
+    def _release(self, host: str, port: int, connection: AsyncRpcConnection) -> None:
+        if connection.keep_alive:
+            self._idle.setdefault((host, port), []).append(connection)
+        else:
+            connection.close()
+
+    async def _call_once(self, host: str, port: int, body: bytes) -> Any:
+        connection, reused = await self._acquire(host, port)
+        try:
+            data = await connection.request(host, port, self.path, body)
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            connection.close()
+            if not reused:
+                raise
+            # Пир закрыл простаивающее соединение - повторяем запрос по новому
+            self.logger.debug(f"[AsyncRpcClient][_call_once]> Stale connection to {host}:{port}: {error}, reconnecting")
+            connection, _ = await self._acquire(host, port)
+            try:
+                data = await connection.request(host, port, self.path, body)
+            except BaseException:
+                connection.close()
+                raise
+        except BaseException:
+            connection.close()
+            raise
+        self._release(host, port, connection)
+        params, _ = codec.loads(data)
+        return params[0]
+
+    async def call(self, host: str, port: int, method: str, *params) -> Any:
+        """
+        Call a remote XML-RPC method.
+
+        Args:
+            host (str): Peer host.
+            port (int): Peer port.
+            method (str): Remote method name, e.g. "ping".
+            *params: Method parameters.
+
+        Returns:
+            Any: Unmarshalled result. xmlrpc.client.Fault is raised for remote faults.
+        """
+        body = codec.dumps(params, method).encode("utf-8", "xmlcharrefreplace")
+        return await asyncio.wait_for(self._call_once(host, int(port), body), self.timeout)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+
+class AsyncRpcLoop:
+    """Event loop running in a background thread for use from synchronous code."""
+
+    def __init__(self, name: str = "async-rpc"):
+        """
+        Initialize and start the event loop thread.
+
+        Args:
+            name (str): Name of the loop thread.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine, timeout: float = None) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Args:
+            coroutine: Coroutine to run.
+            timeout (float, optional): Maximum time to wait for the result.
+
+        Returns:
+            Any: Result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
@@ -0,0 +1,266 @@
+import socket
+import socketserver
+import struct
+import threading
+import time
+import xmlrpc.client
+from typing import Any, Dict, List, Optional, Tuple
+
+from RpcCodec import CodecError, codec
+
+
+# Версия протокола, согласуемая при remote_registration
+WIRE_VERSION = 1
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+_FRAME = struct.Struct(">I")
+
+
+class WireProtocolError(Exception):
+    """Exception raised for malformed binary frames."""
+
+    def __init__(self, message="Malformed wire frame"):
+        """
+        Initialize WireProtocolError with a custom error message.
+
+        Args:
+            message (str): The error message to display.
+        """
+        self.message = message
+        super().__init__(self.message)
+
+
+def encode(value: Any) -> bytes:
+    """Encode a value with the shared codec (see RpcCodec.ValueCodec.encode)."""
+    try:
+        return codec.encode(value)
+    except CodecError as error:
+        raise TypeError(error.message)
+
+
+def decode(payload: bytes) -> Any:
+    """Decode a value with the shared codec, WireProtocolError is raised for malformed payloads."""
+    try:
+        return codec.decode(payload)
+    except CodecError as error:
+        raise WireProtocolError(error.message)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionResetError("Connection closed in the middle of a frame")
+        received += count
+    return bytes(buffer)
+
+
+def encode_frame(value: Any) -> bytes:
+    """Encode a value as one length-prefixed frame, TypeError is raised for values the codec does not support."""
+    payload = encode(value)
+    return _FRAME.pack(len(payload)) + payload
+
+
+def send_frame(sock: socket.socket, value: Any) -> None:
+    """Send one length-prefixed frame."""
+    sock.sendall(encode_frame(value))
+
+
+def recv_frame(sock: socket.socket) -> Any:
+    """
+    Receive one length-prefixed frame.
+
+    Returns:
+        Any: Decoded frame, EOFError is raised if the peer closed the connection between frames.
+    """
+    header = _recv_exact(sock, _FRAME.size)
+    if header is None:
+        raise EOFError("Connection closed by peer")
+    length = _FRAME.unpack(header)[0]
+    if length > MAX_FRAME_SIZE:
+        raise WireProtocolError(f"Frame of {length} bytes exceeds {MAX_FRAME_SIZE}")
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        raise ConnectionResetError("Connection closed in the middle of a frame")
+    return decode(payload)
+
+
+class WireRequestHandler(socketserver.BaseRequestHandler):
+    """Обработчик постоянного соединения: кадры запрос/ответ до закрытия соединения."""
+
+    def handle(self):
+        sock = self.request
+        sock.settimeout(self.server.idle_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                request = recv_frame(sock)
+            except (EOFError, OSError):
+                return
+            except WireProtocolError as error:
+                self.server.logger.warning(f"[WireServer][handle]> Invalid frame from {self.client_address}: {error}")
+                return
+            answer = self.server.dispatch(request)
+            try:
+                frame = encode_frame(answer)
+            except Exception as error:
+                # Результат метода не кодируется: клиент получает fault, как при ошибке вызова
+                self.server.logger.warning(f"[WireServer][handle]> Cannot encode result of {request[0] if isinstance(request, list) and request else request}: {error!r}")
+                frame = encode_frame({"fault": f"{type(error).__name__}: {error}"})
+            try:
+                sock.sendall(frame)
+            except OSError:
+                return
+
+
+class WireServer(socketserver.ThreadingTCPServer):
+    """
+    Server of the binary cluster protocol.
+
+    Calls the same methods as the XML-RPC interface: a request frame is
+    [method, [params]], the answer is {"result": value} or {"fault": text}.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, addr, instance, logger, idle_timeout: float = 120.0):
+        """
+        Initialize WireServer.
+
+        Args:
+            addr (tuple): Host and port to listen on.
+            instance: Object whose public methods are exposed, e.g. RPCDossierMethods.
+            logger: Logger object for logging messages.
+            idle_timeout (float): Idle time after which a connection is closed.
+        """
+        self.instance = instance
+        self.logger = logger
+        self.idle_timeout = idle_timeout
+        super().__init__(addr, WireRequestHandler)
+
+    def dispatch(self, request) -> Dict[str, Any]:
+        try:
+            method, params = request
+            if not isinstance(method, str) or method.startswith("_"):
+                raise AttributeError(f"Method {method!r} is not supported")
+            function = getattr(self.instance, method)
+            return {"result": function(*params)}
+        except Exception as error:
+            self.logger.warning(f"[WireServer][dispatch]> Fault in {request[0] if isinstance(request, list) and request else request}: {error!r}")
+            return {"fault": f"{type(error).__name__}: {error}"}
+
+
+class WireClient:
+    """
+    Client of the binary cluster protocol with persistent connections per peer.
+
+    Remote faults are raised as xmlrpc.client.Fault, so callers handle both
+    transports in the same way.
+    """
+
+    def __init__(self, logger, timeout: float = 3.0, idle_timeout: float = 60.0):
+        """
+        Initialize WireClient.
+
+        Args:
+            logger: Logger object for logging messages.
+            timeout (float): Socket timeout for connect and every call.
+            idle_timeout (float): Idle time after which a connection is closed.
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, int], List[Tuple[socket.socket, float]]] = {}
+
+    def _acquire(self, key: Tuple[str, int]) -> Tuple[socket.socket, bool]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                sock, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return sock, True
+                sock.close()
+        sock = socket.create_connection(key, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, False
+
+    def _release(self, key: Tuple[str, int], sock: socket.socket) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append((sock, time.monotonic()))
+
+    def call(self, host: str, port: int, method: str, *params) -> Any:
+        """
+        Call a remote method over the binary protocol.
+
+        Args:
+            host (str): Peer host.
+            port (int): Wire port of the peer.
+            method (str): Remote method name.
+            *params: Method parameters.
+
+        Returns:
+            Any: Result of the remote method.
+        """
+        key = (str(host), int(port))
+        sock, reused = self._acquire(key)
+        try:
+            try:
+                send_frame(sock, [method, list(params)])
+                answer = recv_frame(sock)
+            except (EOFError, ConnectionError) as error:
+                sock.close()
+                if not reused:
+                    raise
+                # Пир закрыл простаивающее соединение - повторяем по новому
+                self.logger.debug(f"[WireClient][call]> Stale connection to {key[0]}:{key[1]}: {error}, reconnecting")
+                sock, _ = self._acquire(key)
+                send_frame(sock, [method, list(params)])
+                answer = recv_frame(sock)
+        except BaseException:
+            sock.close()
+            raise
+        self._release(key, sock)
+        if "fault" in answer:
+            raise xmlrpc.client.Fault(1, answer["fault"])
+        return answer["result"]
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for sock, _ in connections:
+                sock.close()
+
+
+def wire_capabilities(app_setting) -> Dict[str, str]:
+    """Возможности узла для согласования при регистрации (пусто, если бинарный протокол выключен)."""
+    wire_port = app_setting.get_config('RPCInterface', 'wire_port', fallback='')
+    if not wire_port:
+        return {}
+    return {"wire": str(WIRE_VERSION), "wire_port": str(wire_port)}
+
+
+def negotiate_wire_port(app_setting, capabilities) -> Optional[str]:
+    """
+    Choose the binary protocol for a peer.
+
+    Args:
+        app_setting: Application settings.
+        capabilities (dict): Capabilities announced by the peer, may be None for old peers.
+
+    Returns:
+        str: Wire port of the peer if both sides speak the same protocol version, otherwise None.
+    """
+    if not wire_capabilities(app_setting) or not isinstance(capabilities, dict):
+        return None
+    if str(capabilities.get("wire")) != str(WIRE_VERSION) or not capabilities.get("wire_port"):
+        return None
+    return str(capabilities["wire_port"])
@@ -1,56 +1,465 @@
 import configparser
+import errno
+import fcntl
+import multiprocessing
+import multiprocessing.connection
+import os
+import selectors
+import signal
 import socket
 import threading
-import queue
 import time
+from collections import Counter
+
+from ProxyAccessList import AccessList
+from ProxyUpstreams import UpstreamPool
+
+
+class BufferedChannel:
+    """
+    Одно направление передачи через предвыделенный буфер.
+
+    Данные принимаются recv_into в memoryview буфера и отправляются из
+    него же, без промежуточных объектов bytes на каждый вызов.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    @property
+    def pending(self) -> int:
+        return self.end - self.start
+
+    @property
+    def full(self) -> bool:
+        return self.end == self.size
+
+    def fill(self, source) -> int:
+        count = source.recv_into(self.view[self.end:])
+        self.end += count
+        return count
+
+    def drain(self, target) -> int:
+        sent = target.send(self.view[self.start:self.end])
+        self.start += sent
+        if self.start == self.end:
+            self.start = self.end = 0
+        return sent
+
+    def close(self):
+        self.view.release()
+
+
+class SpliceChannel:
+    """
+    Одно направление передачи через pipe и os.splice (Linux).
+
+    Байты перемещаются сокет -> pipe -> сокет внутри ядра и не копируются
+    в память процесса; ёмкость pipe задаётся buffer_size.
+    """
+    FLAGS = getattr(os, 'SPLICE_F_MOVE', 0) | getattr(os, 'SPLICE_F_NONBLOCK', 0)
+
+    def __init__(self, size):
+        self.read_fd, self.write_fd = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        try:
+            self.size = fcntl.fcntl(self.write_fd, fcntl.F_SETPIPE_SZ, size)
+        except OSError:
+            # Больше /proc/sys/fs/pipe-max-size без CAP_SYS_RESOURCE нельзя - остаёмся с текущим размером
+            self.size = fcntl.fcntl(self.write_fd, fcntl.F_GETPIPE_SZ)
+        self.pending = 0
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.size
+
+    def fill(self, source) -> int:
+        count = os.splice(source.fileno(), self.write_fd, self.size - self.pending, flags=self.FLAGS)
+        self.pending += count
+        return count
+
+    def drain(self, target) -> int:
+        sent = os.splice(self.read_fd, target.fileno(), self.pending, flags=self.FLAGS)
+        self.pending -= sent
+        return sent
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+# Параметры секции, которые применяются к работающей секции без перезапуска
+RETUNABLE_OPTIONS = frozenset((
+    "timeout", "idle_timeout", "allow_hosts", "deny_hosts", "max_connections", "rate", "burst",
+    "client_rate", "client_burst", "health_interval", "failure_threshold", "open_timeout", "balance",
+))
+
+# Через сколько секунд адреса upstream разрешаются заново (смена записи DNS)
+RESOLVE_INTERVAL = 30.0
+
+# Счётчики секции, в этом порядке воркеры пишут их в общую память
+STAT_NAMES = ("accepted", "denied", "shed", "rate_limited", "client_rate_limited", "accept_errors", "upstream_errors", "circuit_open", "connections")
+
+
+def resolve_address(host, port, passive=False):
+    """
+    Семейство и адрес сокета для TCP по имени или адресу IPv4/IPv6.
+
+    Returns:
+        tuple: (family, sockaddr) первого адреса getaddrinfo, socket.gaierror при ошибке.
+    """
+    flags = socket.AI_PASSIVE if passive else 0
+    family, _, _, _, sockaddr = socket.getaddrinfo(host or None, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, flags)[0]
+    return family, sockaddr
+
+
+def build_upstream_pool(config_section, logger, setup_nodes=None):
+    """
+    Пул upstream секции: local - только upstream_host:upstream_port,
+    cluster - ещё и активные узлы досье на порту upstream_port.
+    """
+    output_host = config_section.get('upstream_host', '127.0.0.1')
+    output_port = int(config_section.get('upstream_port', config_section.name))
+    upstream_mode = config_section.get('upstream', 'local')
+    if upstream_mode not in ('local', 'cluster'):
+        raise ValueError(f"Unknown upstream mode {upstream_mode!r} in section [{config_section.name}]")
+    include_local = upstream_mode == 'local' or config_section.getboolean('upstream_include_self', True)
+    return UpstreamPool(
+        logger,
+        output_port,
+        strategy=config_section.get('balance', 'round_robin'),
+        static=[(output_host, output_port)] if include_local else [],
+        setup_nodes=setup_nodes if upstream_mode == 'cluster' else None,
+        failure_threshold=int(config_section.get('failure_threshold', '3')),
+        open_timeout=float(config_section.get('open_timeout', '10')),
+    )
+
+
+class HealthProbe:
+    """Активная проверка upstream: неблокирующее TCP-подключение с дедлайном."""
+
+    def __init__(self, sock, upstream, deadline):
+        self.sock = sock
+        self.upstream = upstream
+        self.deadline = deadline
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты: rate токенов в секунду, не больше burst в запасе.
+    """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = now
+
+    def take(self, now) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self, now) -> bool:
+        return self.tokens + (now - self.last) * self.rate >= self.burst
+
+    def retune(self, rate, burst, now):
+        """Меняет частоту и запас, накопленные токены сохраняются (не больше нового burst)."""
+        self.tokens = min(burst, self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.rate = rate
+        self.burst = burst
+
+
+class ProxyConnection:
+    """
+    Пара сокетов клиент - upstream одного проксируемого соединения.
+
+    Для каждого направления держится ограниченный канал: пока он полон,
+    сокет-источник не читается (backpressure), а когда источник закрыл
+    свою сторону и буфер выгружен, приёмнику делается shutdown(SHUT_WR).
+    """
+
+    def __init__(self, client_socket, client_address, upstream_socket, target, connect_deadline, channels):
+        self.client = client_socket
+        self.client_address = client_address
+        self.upstream = upstream_socket
+        self.target = target
+        self.connected = False
+        self.connect_deadline = connect_deadline
+        self.last_active = time.monotonic()
+        # Канал с данными, прочитанными из сокета и ещё не отправленными его паре
+        self.channels = {client_socket: channels[0], upstream_socket: channels[1]}
+        # Сокет, приславший EOF, и сокет, которому уже сделан shutdown(SHUT_WR)
+        self.eof = set()
+        self.write_closed = set()
+        self.events = {client_socket: 0, upstream_socket: 0}
+
+    def peer(self, sock):
+        return self.upstream if sock is self.client else self.client
+
+    @property
+    def finished(self) -> bool:
+        return len(self.write_closed) == 2
+
 
 class ProxyThread(threading.Thread):
     """
     Класс для реализации прокси-сервера.
-    
+
+    Полнодуплексный TCP-прокси на селекторе (epoll в Linux): каждому
+    клиенту открывается своё соединение с upstream, оба направления
+    передаются потоком в одном цикле событий, так что одна секция
+    обслуживает тысячи соединений без потока на каждое.
+
+    Upstream выбирается из UpstreamPool: local - только upstream_host,
+    cluster - ещё и активные узлы досье на порту upstream_port.
+
+    Допуск новых соединений: списки allow/deny, предел одновременных
+    соединений max_connections и token bucket на секцию (rate/burst) и на
+    IP клиента (client_rate/client_burst). Отказ - немедленное закрытие
+    принятого сокета, каждый отказ учитывается в counters.
+
+    Здоровье upstream: каждые health_interval секунд каждому upstream
+    делается TCP-проверка, её результат и результат каждого реального
+    подключения идут в CircuitBreaker пула. Пока цепи всех upstream
+    разомкнуты, клиенты закрываются сразу (circuit_open), не дожидаясь
+    таймаута подключения.
+
     Args:
-        config_section (dict): Словарь с параметрами конфигурации прокси.
-        queue_lock (threading.Lock): Блокировка для синхронизации доступа к очереди.
+        config_section (configparser.SectionProxy): Секция конфигурации прокси, имя секции - порт upstream.
         logger (logging.Logger): Логгер для записи информации о работе прокси.
+        setup_nodes (JSONFileManager, optional): Досье для режима upstream = cluster.
+        reuse_port (bool): Слушать с SO_REUSEPORT (секция в процессах-воркерах).
+        control (multiprocessing.connection.Connection, optional): Канал команд супервизора воркера,
+            без него секция создаёт свой канал, в который пишут retune() и другие потоки процесса.
+        shared_stats (multiprocessing.Array, optional): Общая память для счётчиков воркера.
     """
-    def __init__(self, config_section, queue_lock, logger):
-        super().__init__()
+    def __init__(self, config_section, logger, setup_nodes=None, reuse_port=False, control=None, shared_stats=None):
+        super().__init__(name=f"proxy-{config_section.name}", daemon=True)
         self.logger = logger
         self.config_section = config_section
-        self.queue_lock = queue_lock
-        self.input_host = '127.0.0.1'
+        self.input_host = config_section.get('proxy_host', '0.0.0.0')
         self.input_port = int(config_section['proxy_port'])
-        self.output_host = config_section['proxy_host']
-        self.output_port = int(config_section['proxy_port'])
-        self.timeout = int(config_section['timeout'])
-        self.timeout_queue = int(config_section['timeout_queue'])
+        self.output_host = config_section.get('upstream_host', '127.0.0.1')
+        self.output_port = int(config_section.get('upstream_port', config_section.name))
+        self.upstream_mode = config_section.get('upstream', 'local')
+        self.upstream_pool = build_upstream_pool(config_section, logger, setup_nodes)
+        self.probes = {}
+        self.next_probe = 0.0
+        # upstream -> (family, sockaddr), чтобы не вызывать getaddrinfo на каждое соединение
+        self.upstream_addresses = {}
+        self.next_resolve = 0.0
         self.max_queue = int(config_section['max_queue'])
-        self.allow_hosts = [host.strip() for host in config_section['allow_hosts'].split(',') if host.strip()]
-        self.deny_hosts = [host.strip() for host in config_section['deny_hosts'].split(',') if host.strip()]
+        self.buffer_size = int(config_section.get('buffer_size', '65536'))
+        # auto - splice там, где он есть, buffered - только recv_into/send
+        self.relay = config_section.get('relay', 'auto')
+        if self.relay not in ('auto', 'buffered'):
+            raise ValueError(f"Unknown relay mode {self.relay!r} in section [{config_section.name}]")
+        if self.relay != 'buffered' and not hasattr(os, 'splice'):
+            self.logger.warning(f"[ProxyThread][__init__]> os.splice is not available, section [{config_section.name}] relays through buffers")
+            self.relay = 'buffered'
+        self.rate = self.burst = self.client_rate = self.client_burst = 0.0
+        self.section_bucket = None
+        self.client_buckets = {}
+        self.apply_settings(config_section, self.parse_settings(config_section))
+        self.counters = Counter()
+        self.accept_paused = False
+        self.reuse_port = reuse_port
+        self.control_sender = None
+        if control is None:
+            # Настройки меняет только цикл событий: остальные потоки присылают их через канал
+            control, self.control_sender = multiprocessing.Pipe(duplex=False)
+        self.control = control
+        self.shared_stats = shared_stats
+        self.running = True
+        self.stopping = False
         self.input_socket = None
-        self.output_socket = None
-        self.queue = queue.Queue(self.max_queue)
+        self.selector = selectors.DefaultSelector()
+        self.connections = set()
 
 
     def run(self):
         """
         Метод для запуска потока прокси-сервера.
         """
-        self.input_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.input_socket.bind((self.output_host, self.output_port))
-        self.input_socket.listen(5)
-        self.logger.info(f"[ProxyThread][run]> Proxy for {self.input_host}:{self.input_port} <=> {self.output_host}:{self.output_port}")
-        
+        family, self.input_address = resolve_address(self.input_host, self.input_port, passive=True)
+        self.input_socket = socket.socket(family, socket.SOCK_STREAM)
+        self.input_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if family == socket.AF_INET6:
+            # proxy_host = :: принимает и IPv4 клиентов, их адреса приходят как ::ffff:a.b.c.d
+            self.input_socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        if self.reuse_port:
+            # Ядро распределяет новые соединения между всеми воркерами на этом порту
+            self.input_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.bind()
+        # max_queue - очередь соединений, ожидающих accept
+        self.input_socket.listen(self.max_queue)
+        self.input_socket.setblocking(False)
+        self.selector.register(self.input_socket, selectors.EVENT_READ)
+        self.selector.register(self.control, selectors.EVENT_READ)
+        self.logger.info(f"[ProxyThread][run]> Proxy for {self.input_host}:{self.input_port} <=> {self.upstream_pool.upstreams} ({self.upstream_mode}, {self.upstream_pool.strategy}, {self.relay})")
+
+        next_check = time.monotonic() + 1
+        while self.running:
+            if self.stopping:
+                self.close_listener()
+                if not self.connections:
+                    break
+            for key, mask in self.selector.select(timeout=1):
+                if key.fileobj is self.control:
+                    self.handle_control()
+                elif isinstance(key.data, HealthProbe):
+                    self.finish_probe(key.data, not key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+                elif key.data is None:
+                    self.accept()
+                else:
+                    self.handle(key.data, key.fileobj, mask)
+            now = time.monotonic()
+            if now >= next_check:
+                self.check_timeouts(now)
+                next_check = now + 1
+        self.close_listener()
+        self.upstream_pool.close()
+        self.selector.close()
+        self.logger.info(f"[ProxyThread][run]> Proxy for {self.input_host}:{self.input_port} stopped")
+
+
+    def bind(self):
+        """
+        Метод для привязки слушающего сокета.
+
+        При перезапуске секции старый поток освобождает порт не мгновенно,
+        поэтому EADDRINUSE повторяется до 10 секунд.
+        """
+        deadline = time.monotonic() + 10
         while True:
-            client_socket, client_address = self.input_socket.accept()
-            if self.is_allowed(client_address):
-                self.queue_lock.acquire()
-                if self.queue.qsize() >= self.max_queue:
-                    self.queue.get()
-                self.queue.put((client_socket, client_address))
-                self.queue_lock.release()
-            else:
-                client_socket.close()
+            try:
+                self.input_socket.bind(self.input_address)
+                return
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+
+    def retune(self, config_section):
+        """
+        Метод для применения параметров из RETUNABLE_OPTIONS.
+
+        Вызывается из любого потока: секция разбирается сразу, так что
+        ошибка в ней видна вызывающему и оставляет прежние настройки, а
+        применяет их цикл событий секции по каналу команд. Соединения и
+        слушающий сокет не затрагиваются.
+
+        Args:
+            config_section (configparser.SectionProxy): Секция конфигурации прокси.
+        """
+        self.parse_settings(config_section)
+        self.control_sender.send(("config", dict(config_section)))
+
+
+    def parse_settings(self, config_section):
+        """
+        Метод для разбора параметров из RETUNABLE_OPTIONS.
+
+        Args:
+            config_section (configparser.SectionProxy): Секция конфигурации прокси.
+
+        Returns:
+            dict: Разобранные значения, ValueError - при ошибке в секции.
+        """
+        timeout = float(config_section['timeout'])
+        idle_timeout = float(config_section.get('idle_timeout', '300'))
+        # 0 - без активных проверок, только по результатам реальных подключений
+        health_interval = float(config_section.get('health_interval', '5'))
+        access = AccessList(config_section.get('allow_hosts', ''), config_section.get('deny_hosts', ''))
+        # 0 - без ограничения
+        max_connections = int(config_section.get('max_connections', '0'))
+        rate = float(config_section.get('rate', '0'))
+        # burst 0 - запас в одну секунду частоты
+        burst = float(config_section.get('burst', '0')) or max(rate, 1)
+        client_rate = float(config_section.get('client_rate', '0'))
+        client_burst = float(config_section.get('client_burst', '0')) or max(client_rate, 1)
+        return {
+            "timeout": timeout,
+            "idle_timeout": idle_timeout,
+            "health_interval": health_interval,
+            "access": access,
+            "max_connections": max_connections,
+            "rate": rate,
+            "burst": burst,
+            "client_rate": client_rate,
+            "client_burst": client_burst,
+            "balance": config_section.get('balance', 'round_robin'),
+            "failure_threshold": int(config_section.get('failure_threshold', '3')),
+            "open_timeout": float(config_section.get('open_timeout', '10')),
+        }
+
+
+    def apply_settings(self, config_section, settings):
+        """
+        Метод для подмены параметров разобранными значениями, вызывается циклом событий секции.
+
+        Token bucket пересобираются, только если изменились их частота или
+        запас, и сохраняют накопленные токены: частые SIGHUP не сбрасывают
+        ограничение частоты.
+
+        Args:
+            config_section (configparser.SectionProxy): Секция конфигурации прокси.
+            settings (dict): Результат parse_settings().
+        """
+        self.upstream_pool.configure(settings["balance"], settings["failure_threshold"], settings["open_timeout"])
+        self.config_section = config_section
+        self.timeout = settings["timeout"]
+        self.idle_timeout = settings["idle_timeout"]
+        self.health_interval = settings["health_interval"]
+        self.access = settings["access"]
+        self.max_connections = settings["max_connections"]
+        now = time.monotonic()
+        rate, burst = settings["rate"], settings["burst"]
+        if not rate:
+            self.section_bucket = None
+        elif self.section_bucket is None:
+            self.section_bucket = TokenBucket(rate, burst, now)
+        elif (rate, burst) != (self.rate, self.burst):
+            self.section_bucket.retune(rate, burst, now)
+        client_rate, client_burst = settings["client_rate"], settings["client_burst"]
+        if not client_rate:
+            self.client_buckets = {}
+        elif (client_rate, client_burst) != (self.client_rate, self.client_burst):
+            for bucket in self.client_buckets.values():
+                bucket.retune(client_rate, client_burst, now)
+        self.rate, self.burst = rate, burst
+        self.client_rate, self.client_burst = client_rate, client_burst
+
+
+    def stop(self):
+        """
+        Метод для остановки секции без разрыва соединений.
+
+        Поток закрывает слушающий сокет и завершается, когда закроются
+        все уже принятые соединения (по концу передачи или idle_timeout).
+        """
+        self.stopping = True
+
+
+    def close_listener(self):
+        if self.input_socket is None or self.input_socket.fileno() == -1:
+            return
+        if not self.accept_paused:
+            self.selector.unregister(self.input_socket)
+        self.accept_paused = False
+        self.input_socket.close()
+        for probe in list(self.probes.values()):
+            self.finish_probe(probe, False)
+        self.logger.info(f"[ProxyThread][close_listener]> {self.input_host}:{self.input_port} no longer accepts, draining {len(self.connections)} connections")
 
 
     def is_allowed(self, client_address):
@@ -63,64 +472,655 @@ class ProxyThread(threading.Thread):
         Returns:
             bool: True, если соединение разрешено, иначе False.
         """
-        if self.allow_hosts and client_address[0] not in self.allow_hosts:
-            return False
-        if self.deny_hosts and client_address[0] in self.deny_hosts:
-            return False
-        return True
+        return self.access.is_allowed(client_address[0])
+
+
+    def set_access(self, allow_hosts, deny_hosts):
+        """
+        Метод для замены правил допуска без остановки секции.
+
+        Новые правила собираются целиком и подменяются одним присваиванием,
+        поток accept видит либо старые, либо новые правила.
+
+        Args:
+            allow_hosts (str): Новое значение allow_hosts.
+            deny_hosts (str): Новое значение deny_hosts.
+        """
+        access = AccessList(allow_hosts, deny_hosts)
+        self.access = access
+        self.logger.info(f"[ProxyThread][set_access]> Access lists of {self.input_host}:{self.input_port} replaced: allow {access.allow.size}, deny {access.deny.size} entries")
 
 
-    def process_queue(self):
+    def handle_control(self):
         """
-        Метод для обработки очереди запросов.
+        Метод для обработки команды супервизора воркера.
+
+        ("upstreams", [[host, port], ...]) - новый состав пула upstream;
+        ("config", {параметр: значение}) - новые параметры секции (retune, apply_settings);
+        ("stop", None) - остановка с дожиданием соединений;
+        закрытый канал означает, что родительский процесс завершился.
+        """
+        try:
+            command, value = self.control.recv()
+        except (EOFError, OSError):
+            self.logger.info(f"[ProxyThread][handle_control]> Supervisor of {self.input_host}:{self.input_port} is gone, stopping worker")
+            self.running = False
+            return
+        if command == "upstreams":
+            self.upstream_pool.set_upstreams(value)
+        elif command == "config":
+            config = configparser.ConfigParser()
+            config.read_dict({self.config_section.name: value})
+            config_section = config[self.config_section.name]
+            try:
+                self.apply_settings(config_section, self.parse_settings(config_section))
+            except ValueError as e:
+                self.logger.error(f"[ProxyThread][handle_control]> Invalid settings for {self.input_host}:{self.input_port}: {e}")
+        elif command == "stop":
+            self.stop()
+        else:
+            self.logger.warning(f"[ProxyThread][handle_control]> Unknown command {command!r}")
+
+
+    def start_probes(self):
+        """
+        Метод для запуска TCP-проверок всех upstream пула, у которых нет незавершённой проверки.
+        """
+        for upstream in self.upstream_pool.upstreams:
+            if upstream in self.probes:
+                continue
+            try:
+                family, address = self.resolve_upstream(upstream)
+            except OSError as e:
+                self.logger.warning(f"[ProxyThread][start_probes]> Cannot resolve {upstream[0]}: {e}")
+                self.upstream_pool.report(upstream, False)
+                continue
+            try:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+            except OSError as e:
+                self.logger.warning(f"[ProxyThread][start_probes]> Cannot create a probe socket: {e}")
+                return
+            sock.setblocking(False)
+            result = sock.connect_ex(address)
+            if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                sock.close()
+                self.upstream_pool.report(upstream, False)
+                continue
+            probe = self.probes[upstream] = HealthProbe(sock, upstream, time.monotonic() + self.timeout)
+            self.selector.register(sock, selectors.EVENT_WRITE, probe)
+
+
+    def resolve_upstream(self, upstream):
+        """
+        Метод для получения семейства и адреса сокета upstream, результат кэшируется на RESOLVE_INTERVAL.
+        """
+        address = self.upstream_addresses.get(upstream)
+        if address is None:
+            address = self.upstream_addresses[upstream] = resolve_address(*upstream)
+        return address
+
+
+    def finish_probe(self, probe, ok):
+        """
+        Метод для завершения проверки и передачи её результата пулу.
+        """
+        self.selector.unregister(probe.sock)
+        probe.sock.close()
+        del self.probes[probe.upstream]
+        self.upstream_pool.report(probe.upstream, ok)
+
+
+    def pause_accept(self, error):
+        """
+        Метод для приостановки accept при нехватке ресурсов (EMFILE, ENFILE, ENOBUFS).
+
+        Слушающий сокет остаётся готовым к чтению, поэтому он снимается с
+        селектора до следующей проверки таймаутов, иначе цикл крутится вхолостую.
+        """
+        self.logger.error(f"[ProxyThread][pause_accept]> Cannot accept on {self.input_host}:{self.input_port}: {error}, pausing accept")
+        self.counters["accept_errors"] += 1
+        if not self.accept_paused:
+            self.selector.unregister(self.input_socket)
+            self.accept_paused = True
+
+
+    def admit(self, client_address):
+        """
+        Метод для проверки допуска нового клиента.
+
+        Args:
+            client_address (tuple): Кортеж, содержащий IP-адрес и порт клиента.
+
+        Returns:
+            str: Причина отказа (имя счётчика) или None, если клиент допущен.
+        """
+        if not self.is_allowed(client_address):
+            return "denied"
+        if self.max_connections and len(self.connections) >= self.max_connections:
+            return "shed"
+        now = time.monotonic()
+        if self.section_bucket is not None and not self.section_bucket.take(now):
+            return "rate_limited"
+        if self.client_rate:
+            bucket = self.client_buckets.get(client_address[0])
+            if bucket is None:
+                bucket = self.client_buckets[client_address[0]] = TokenBucket(self.client_rate, self.client_burst, now)
+            if not bucket.take(now):
+                return "client_rate_limited"
+        return None
+
+
+    def stats(self):
+        """
+        Метод для получения счётчиков секции.
+
+        Returns:
+            dict: accepted, denied, shed, rate_limited, client_rate_limited,
+            accept_errors, upstream_errors и число открытых соединений.
+        """
+        stats = {name: self.counters[name] for name in STAT_NAMES}
+        stats["connections"] = len(self.connections)
+        return stats
+
+
+    def new_channel(self):
+        """
+        Метод для создания канала одного направления в режиме relay.
+        """
+        if self.relay != 'buffered':
+            try:
+                return SpliceChannel(self.buffer_size)
+            except OSError as e:
+                # Например, EMFILE: pipe стоит двух дескрипторов, а буферу они не нужны
+                self.logger.warning(f"[ProxyThread][new_channel]> Cannot create a splice pipe: {e}, using a buffer")
+        return BufferedChannel(self.buffer_size)
+
+
+    def accept(self):
+        """
+        Метод для приёма всех ожидающих клиентов и неблокирующего подключения их к upstream.
         """
         while True:
-            if not self.queue.empty():
-                self.queue_lock.acquire()
-                client_socket, client_address = self.queue.get()
-                self.queue_lock.release()
-                if self.output_socket is None or self.output_socket.fileno() == -1:
-                    self.output_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.output_socket.connect((self.output_host, self.output_port))
-                try:
-                    data = client_socket.recv(4096)
-                    if data:
-                        self.logger.info(f"[ProxyThread][process_queue]> Received data from {client_address}: {data.decode()}")
-                        self.output_socket.sendall(data)
-                except Exception as e:
-                    self.logger.error(f"Error: {e}")
-                finally:
-                    client_socket.close()
+            try:
+                client_socket, client_address = self.input_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.pause_accept(e)
+                return
+            self.counters["accepted"] += 1
+            reason = self.admit(client_address)
+            if reason is not None:
+                self.counters[reason] += 1
+                client_socket.close()
+                continue
+            target = self.upstream_pool.acquire(client_address[0])
+            if target is None:
+                # Быстрый отказ: пул пуст или цепи всех upstream разомкнуты
+                self.logger.debug(f"[ProxyThread][accept]> No available upstream for {client_address}")
+                self.counters["circuit_open"] += 1
+                client_socket.close()
+                continue
+            client_socket.setblocking(False)
+            try:
+                family, address = self.resolve_upstream(target)
+            except OSError as e:
+                self.logger.error(f"[ProxyThread][accept]> Cannot resolve {target[0]} for {client_address}: {e}")
+                self.counters["upstream_errors"] += 1
+                self.upstream_pool.report(target, False)
+                self.upstream_pool.release(target)
+                client_socket.close()
+                continue
+            try:
+                upstream_socket = socket.socket(family, socket.SOCK_STREAM)
+            except OSError as e:
+                client_socket.close()
+                self.upstream_pool.release(target)
+                self.pause_accept(e)
+                return
+            upstream_socket.setblocking(False)
+            connection = ProxyConnection(client_socket, client_address, upstream_socket, target, time.monotonic() + self.timeout,
+                                         (self.new_channel(), self.new_channel()))
+            self.connections.add(connection)
+            result = upstream_socket.connect_ex(address)
+            if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                self.logger.error(f"[ProxyThread][accept]> Cannot connect {client_address} to {target[0]}:{target[1]}: {errno.errorcode.get(result, result)}")
+                self.counters["upstream_errors"] += 1
+                self.upstream_pool.report(target, False)
+                self.close(connection)
+                continue
+            # Клиент не читается, пока не установлено соединение с upstream
+            self.update(connection, upstream_socket, selectors.EVENT_WRITE)
+
+
+    def handle(self, connection, sock, mask):
+        """
+        Метод для обработки готовности одного сокета соединения.
+
+        Args:
+            connection (ProxyConnection): Соединение.
+            sock (socket.socket): Готовый сокет.
+            mask (int): События селектора.
+        """
+        if connection not in self.connections:
+            return
+        try:
+            if not connection.connected:
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error:
+                    self.counters["upstream_errors"] += 1
+                    self.upstream_pool.report(connection.target, False)
+                    raise ConnectionRefusedError(error, errno.errorcode.get(error, str(error)))
+                connection.connected = True
+                self.upstream_pool.report(connection.target, True)
             else:
-                time.sleep(self.timeout_queue)
+                if mask & selectors.EVENT_READ:
+                    self.read(connection, sock)
+                if mask & selectors.EVENT_WRITE:
+                    self.write(connection, sock)
+        except OSError as e:
+            self.logger.debug(f"[ProxyThread][handle]> Connection {connection.client_address} closed: {e}")
+            self.close(connection)
+            return
+        if connection.finished:
+            self.close(connection)
+            return
+        connection.last_active = time.monotonic()
+        self.update_interest(connection)
+
+
+    def read(self, connection, sock):
+        channel = connection.channels[sock]
+        try:
+            count = channel.fill(sock)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            if not isinstance(channel, SpliceChannel) or e.errno != errno.EINVAL or channel.pending:
+                raise
+            # Сокет не поддерживает splice: дальше секция работает через буферы
+            self.logger.warning(f"[ProxyThread][read]> splice is not supported here: {e}, switching to buffered relay")
+            self.relay = 'buffered'
+            channel.close()
+            channel = connection.channels[sock] = BufferedChannel(self.buffer_size)
+            try:
+                count = channel.fill(sock)
+            except (BlockingIOError, InterruptedError):
+                return
+        if not count:
+            connection.eof.add(sock)
+        # Сразу пробуем отдать прочитанное, не дожидаясь следующего витка
+        self.write(connection, connection.peer(sock))
+
+
+    def write(self, connection, sock):
+        # В sock пишутся данные, прочитанные из его пары
+        source = connection.peer(sock)
+        channel = connection.channels[source]
+        if channel.pending:
+            try:
+                channel.drain(sock)
+            except (BlockingIOError, InterruptedError):
+                pass
+        if not channel.pending and source in connection.eof and sock not in connection.write_closed:
+            # Полузакрытие: источник закончил передачу, сообщаем об этом приёмнику
+            connection.write_closed.add(sock)
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+
+    def update_interest(self, connection):
+        """
+        Метод для пересчёта событий, которых ждут сокеты соединения.
+        """
+        for sock in (connection.client, connection.upstream):
+            peer = connection.peer(sock)
+            events = 0
+            # Читаем, только если есть куда складывать (backpressure)
+            if sock not in connection.eof and not connection.channels[sock].full:
+                events |= selectors.EVENT_READ
+            if connection.channels[peer].pending:
+                events |= selectors.EVENT_WRITE
+            self.update(connection, sock, events)
+
+
+    def update(self, connection, sock, events):
+        current = connection.events[sock]
+        if events == current:
+            return
+        if not current:
+            self.selector.register(sock, events, connection)
+        elif not events:
+            self.selector.unregister(sock)
+        else:
+            self.selector.modify(sock, events, connection)
+        connection.events[sock] = events
+
+
+    def close(self, connection):
+        """
+        Метод для закрытия обоих сокетов соединения.
+        """
+        if connection not in self.connections:
+            return
+        self.connections.discard(connection)
+        self.upstream_pool.release(connection.target)
+        for sock in (connection.client, connection.upstream):
+            if connection.events[sock]:
+                self.selector.unregister(sock)
+                connection.events[sock] = 0
+            sock.close()
+            connection.channels[sock].close()
+
+
+    def check_timeouts(self, now):
+        """
+        Метод для закрытия соединений с истёкшим подключением к upstream или простаивающих дольше idle_timeout.
+
+        Заодно возобновляет приостановленный accept и забывает корзины клиентов,
+        успевшие наполниться: полная корзина ничем не отличается от новой.
+        """
+        if self.accept_paused and not self.stopping:
+            self.accept_paused = False
+            self.selector.register(self.input_socket, selectors.EVENT_READ)
+        if self.shared_stats is not None:
+            for index, value in enumerate(self.stats().values()):
+                self.shared_stats[index] = value
+        for host in [host for host, bucket in self.client_buckets.items() if bucket.full(now)]:
+            del self.client_buckets[host]
+        if now >= self.next_resolve:
+            self.upstream_addresses = {}
+            self.next_resolve = now + RESOLVE_INTERVAL
+        for probe in [probe for probe in self.probes.values() if now >= probe.deadline]:
+            self.finish_probe(probe, False)
+        if self.health_interval and now >= self.next_probe and not self.stopping:
+            self.start_probes()
+            self.next_probe = now + self.health_interval
+        for connection in list(self.connections):
+            if not connection.connected and now >= connection.connect_deadline:
+                self.logger.error(f"[ProxyThread][check_timeouts]> Connect to {connection.target[0]}:{connection.target[1]} for {connection.client_address} timed out")
+                self.counters["upstream_errors"] += 1
+                self.upstream_pool.report(connection.target, False)
+                self.close(connection)
+            elif connection.connected and now - connection.last_active >= self.idle_timeout:
+                self.logger.debug(f"[ProxyThread][check_timeouts]> Connection {connection.client_address} idle for {self.idle_timeout}s, closing")
+                self.close(connection)
+
+
+def proxy_worker(config_file, section_name, section_items, upstreams, control, shared_stats):
+    """
+    Точка входа процесса-воркера секции: прокси в главном потоке процесса.
+
+    Args:
+        config_file (str): Путь к trinity.ini, из него воркер настраивает логирование.
+        section_name (str): Имя секции прокси.
+        section_items (dict): Параметры секции на момент запуска воркера.
+        upstreams (list): Текущий состав пула upstream.
+        control (multiprocessing.connection.Connection): Канал команд супервизора.
+        shared_stats (multiprocessing.Array): Общая память для счётчиков.
+    """
+    # Импорт здесь: MainClusterConfigurator сам импортирует этот модуль
+    from MainClusterConfigurator import AppSetting
+    # Ctrl+C получает вся группа процессов, останавливает воркеров супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger = AppSetting(config_file).get_logger()
+    config = configparser.ConfigParser()
+    config.read_dict({section_name: section_items})
+    proxy = ProxyThread(config[section_name], logger, reuse_port=True, control=control, shared_stats=shared_stats)
+    proxy.upstream_pool.set_upstreams(upstreams)
+    proxy.run()
+
+
+class ProxyWorker:
+    """Процесс-воркер секции глазами супервизора."""
+
+    def __init__(self, process, control, shared_stats):
+        self.process = process
+        self.control = control
+        self.shared_stats = shared_stats
+        self.started = time.monotonic()
+        self.failures = 0
+        self.restart_at = None
+
+
+class ProxyWorkerGroup(threading.Thread):
+    """
+    Супервизор процессов-воркеров одной секции прокси.
+
+    Каждый воркер слушает proxy_port с SO_REUSEPORT, ядро распределяет
+    соединения между ними, так что секция не упирается в GIL одного
+    процесса. Упавший воркер перезапускается; если он не прожил и
+    restart_window секунд, задержка перед перезапуском удваивается до
+    max_restart_delay. Пул upstream в режиме cluster ведёт супервизор и
+    рассылает состав воркерам по каналу команд.
+
+    Args:
+        app_setting: Экземпляр класса настроек приложения.
+        config_section (configparser.SectionProxy): Секция конфигурации прокси.
+        logger (logging.Logger): Логгер.
+        setup_nodes (JSONFileManager, optional): Досье для режима upstream = cluster.
+        workers (int): Число процессов.
+    """
+    restart_window = 10.0
+    max_restart_delay = 30.0
+
+    def __init__(self, app_setting, config_section, logger, setup_nodes, workers):
+        super().__init__(name=f"proxy-supervisor-{config_section.name}", daemon=True)
+        self.app_setting = app_setting
+        self.config_section = config_section
+        self.logger = logger
+        self.workers_count = workers
+        # spawn, а не fork: родитель многопоточный, fork унёс бы в воркер захваченные блокировки
+        self.context = multiprocessing.get_context("spawn")
+        self.upstream_pool = build_upstream_pool(config_section, logger, setup_nodes)
+        self.upstream_pool.listeners.append(self.broadcast_upstreams)
+        self.workers = []
+        self.retired = Counter()
+        self._lock = threading.Lock()
+        self.running = True
+
+    def spawn(self, index=None):
+        control, child_control = self.context.Pipe()
+        shared_stats = self.context.Array('q', len(STAT_NAMES), lock=False)
+        process = self.context.Process(
+            target=proxy_worker,
+            args=(self.app_setting.config_file, self.config_section.name, dict(self.config_section),
+                  self.upstream_pool.upstreams, child_control, shared_stats),
+            name=f"trinity-proxy-{self.config_section.name}",
+            daemon=True,
+        )
+        process.start()
+        child_control.close()
+        worker = ProxyWorker(process, control, shared_stats)
+        with self._lock:
+            if index is None:
+                self.workers.append(worker)
+            else:
+                worker.failures = self.workers[index].failures
+                self.workers[index] = worker
+        self.logger.info(f"[ProxyWorkerGroup][spawn]> Worker pid {process.pid} of section [{self.config_section.name}] started")
+
+    def run(self):
+        for _ in range(self.workers_count):
+            self.spawn()
+        while self.running:
+            alive = [worker.process.sentinel for worker in self.workers if worker.restart_at is None]
+            multiprocessing.connection.wait(alive, timeout=1)
+            if not self.running:
+                # Остановленные воркеры завершаются сами, перезапускать их не нужно
+                break
+            now = time.monotonic()
+            for index, worker in enumerate(list(self.workers)):
+                if worker.restart_at is None and worker.process.exitcode is not None:
+                    self.retire(worker)
+                    worker.failures = worker.failures + 1 if now - worker.started < self.restart_window else 0
+                    delay = min(2 ** worker.failures - 1, self.max_restart_delay)
+                    worker.restart_at = now + delay
+                    self.logger.error(f"[ProxyWorkerGroup][run]> Worker pid {worker.process.pid} of section [{self.config_section.name}] exited with code {worker.process.exitcode}, restarting in {delay}s")
+                if worker.restart_at is not None and now >= worker.restart_at and self.running:
+                    self.spawn(index)
+
+    def retire(self, worker):
+        # Счётчики умершего воркера остаются в статистике секции
+        with self._lock:
+            for name, value in zip(STAT_NAMES, worker.shared_stats):
+                if name != "connections":
+                    self.retired[name] += value
+        worker.control.close()
+
+    def broadcast(self, command, value):
+        with self._lock:
+            for worker in self.workers:
+                if worker.restart_at is None:
+                    try:
+                        worker.control.send((command, value))
+                    except OSError:
+                        pass
+
+    def broadcast_upstreams(self, upstreams):
+        self.broadcast("upstreams", upstreams)
+
+    def retune(self, config_section):
+        """
+        Метод для применения параметров из RETUNABLE_OPTIONS во всех воркерах.
+
+        Перезапущенные позже воркеры получают уже новую секцию.
+        """
+        self.upstream_pool.configure(
+            config_section.get('balance', 'round_robin'),
+            int(config_section.get('failure_threshold', '3')),
+            float(config_section.get('open_timeout', '10')),
+        )
+        self.config_section = config_section
+        self.broadcast("config", dict(config_section))
+
+    def stop(self):
+        """
+        Метод для остановки секции: воркеры закрывают порт и завершаются после своих соединений.
+        """
+        self.running = False
+        self.upstream_pool.close()
+        self.broadcast("stop", None)
+
+    def stats(self):
+        """
+        Метод для получения счётчиков секции, суммированных по воркерам.
+        """
+        with self._lock:
+            stats = {name: self.retired[name] for name in STAT_NAMES}
+            for worker in self.workers:
+                if worker.restart_at is None:
+                    for name, value in zip(STAT_NAMES, worker.shared_stats):
+                        stats[name] += value
+        stats["workers"] = sum(1 for worker in self.workers if worker.process.is_alive())
+        return stats
 
 
 class CoreRroxy:
     """Класс для управления прокси-серверами."""
-    def __init__(self, app_setting):
+    def __init__(self, app_setting, setup_nodes=None):
         """
         Инициализация класса.
 
         Args:
             app_setting: Экземпляр класса настроек приложения.
+            setup_nodes: Экземпляр JSONFileManager, источник upstream для секций с upstream = cluster.
         """
         self.app_setting = app_setting
+        self.setup_nodes = setup_nodes
         self.logger = self.app_setting.get_logger()
-        
+        self.proxy_threads = {}
+        # main и reload из потока сигналов меняют proxy_threads
+        self._lock = threading.Lock()
+        self.started = False
+
+    def proxy_sections(self):
+        # Секция прокси - секция, в имени которой есть хотя бы одна цифра
+        return [section for section in self.app_setting.config.sections() if any(char.isdigit() for char in section)]
+
+    def start_section(self, section):
+        """
+        Метод для запуска одной секции прокси, вызывается под _lock.
+        """
+        config_section = self.app_setting.config[section]
+        # workers > 0 - секция в отдельных процессах с SO_REUSEPORT, 0 - поток этого процесса
+        workers = int(config_section.get('workers', '0'))
+        if workers and not hasattr(socket, 'SO_REUSEPORT'):
+            self.logger.warning(f"[CoreRroxy][start_section]> SO_REUSEPORT is not supported, section [{section}] runs in-process")
+            workers = 0
+        if workers:
+            proxy_thread = ProxyWorkerGroup(self.app_setting, config_section, self.logger, self.setup_nodes, workers)
+        else:
+            proxy_thread = ProxyThread(config_section, self.logger, self.setup_nodes)
+        self.proxy_threads[section] = proxy_thread
+        proxy_thread.start()
+
     def main(self):
         """
         Основной метод для запуска прокси-серверов.
         """
         self.logger.info("[CoreRroxy][main]> Initializing Proxy...")
-        queue_lock = threading.Lock()
-
-        proxy_threads = []
-        for section in self.app_setting.config.sections():
-            # Проверяем, что имя секции содержит хотя бы одну цифру
-            if any(char.isdigit() for char in section):
-                proxy_thread = ProxyThread(self.app_setting.config[section], queue_lock, self.logger)
-                proxy_threads.append(proxy_thread)
-                proxy_thread.start()
-
-        for proxy_thread in proxy_threads:
-            proxy_thread.process_queue()
+
+        with self._lock:
+            self.started = True
+            for section in self.proxy_sections():
+                self.start_section(section)
+
+        # Секции, запущенные при перечитывании конфигурации, тоже дожидаемся
+        while True:
+            with self._lock:
+                proxy_threads = [proxy_thread for proxy_thread in self.proxy_threads.values() if proxy_thread.is_alive()]
+            if not proxy_threads:
+                break
+            for proxy_thread in proxy_threads:
+                proxy_thread.join()
+
+    def reload(self, changes):
+        """
+        Применяет перечитанную конфигурацию к секциям прокси.
+
+        Новые секции запускаются, удалённые останавливаются, секции, в
+        которых изменились только RETUNABLE_OPTIONS, перенастраиваются на
+        ходу, остальные изменённые перезапускаются. Остановленная секция
+        сразу освобождает порт и дожидается своих соединений, так что
+        открытые соединения не обрываются. Нетронутые секции не трогаются.
+
+        Args:
+            changes (dict): Имя секции -> множество изменённых параметров (AppSetting.reload).
+        """
+        with self._lock:
+            # До main секции ещё не запущены, main сам прочтёт новую конфигурацию
+            if not self.started:
+                return
+            sections = set(self.proxy_sections())
+            for section in list(self.proxy_threads):
+                if section not in sections:
+                    self.logger.info(f"[CoreRroxy][reload]> Section [{section}] removed, stopping")
+                    self.proxy_threads.pop(section).stop()
+            for section in sorted(sections):
+                try:
+                    if section not in self.proxy_threads:
+                        self.logger.info(f"[CoreRroxy][reload]> Section [{section}] added, starting")
+                        self.start_section(section)
+                    elif not changes.get(section):
+                        continue
+                    elif changes[section] <= RETUNABLE_OPTIONS:
+                        self.proxy_threads[section].retune(self.app_setting.config[section])
+                        self.logger.info(f"[CoreRroxy][reload]> Section [{section}] retuned: {', '.join(sorted(changes[section]))}")
+                    else:
+                        self.logger.info(f"[CoreRroxy][reload]> Section [{section}] changed {', '.join(sorted(changes[section] - RETUNABLE_OPTIONS))}, restarting")
+                        self.proxy_threads.pop(section).stop()
+                        self.start_section(section)
+                except (ValueError, KeyError, OSError) as e:
+                    self.logger.error(f"[CoreRroxy][reload]> Cannot apply section [{section}]: {e}")
+
+    def stats(self):
+        """
+        Счётчики допуска и соединений всех секций.
+
+        Returns:
+            dict: Имя секции -> ProxyThread.stats().
+        """
+        return {section: proxy_thread.stats() for section, proxy_thread in list(self.proxy_threads.items())}
@@ -1,7 +1,14 @@
+import selectors
+import socket
 import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
 from RPCDossierMethods import RPCDossierMethods        
+from ClusterWireProtocol import WireServer
+from RpcCodec import codec
 from CoreRpcScheduler import RpcScheduler
 from queue import Queue
 
@@ -10,9 +17,217 @@ class RequestHandler(SimpleXMLRPCRequestHandler):
     """Custom request handler for XML-RPC server."""
     rpc_paths = ('/RPC2',)
 
+class CodecXMLRPCServer(SimpleXMLRPCServer):
+    """SimpleXMLRPCServer that marshals responses with the shared codec (int64 as <i8>)."""
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        try:
+            params, method = codec.loads(data)
+            if dispatch_method is not None:
+                response = dispatch_method(method, params)
+            else:
+                response = self._dispatch(method, params)
+            response = codec.dumps((response,), methodresponse=True, allow_none=self.allow_none)
+        except xmlrpc.client.Fault as fault:
+            response = codec.dumps(fault, allow_none=self.allow_none)
+        except BaseException as exc:
+            response = codec.dumps(xmlrpc.client.Fault(1, f"{type(exc)}:{exc}"), allow_none=self.allow_none)
+        return response.encode(self.encoding, 'xmlcharrefreplace')
+
+
+# Ответ на соединение, для которого нет места в очереди пула
+BUSY_RESPONSE = b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class KeepAliveConnection:
+    """An accepted connection with its request handler, kept between requests."""
+
+    def __init__(self, request, client_address):
+        self.request = request
+        self.client_address = client_address
+        self.handler = None
+        self.parked_at = 0.0
+
+
+class PooledXMLRPCServer(CodecXMLRPCServer):
+    """
+    XML-RPC server that handles requests in a bounded pool of worker threads.
+
+    A worker task serves exactly one request. Between requests a keep-alive
+    connection is parked in a selector and goes back to the pool only when
+    it becomes readable, so idle peer connections do not hold workers.
+    Parked connections are closed after keep_alive_timeout, and the oldest
+    one is closed when more than max_keep_alive are parked. At most
+    workers + queue_size tasks may be pending; a connection that finds the
+    queue full gets 503 and is closed instead of waiting behind it.
+    """
+    daemon_threads = True
+
+    def __init__(self, addr, workers: int, backlog: int, queue_size: int = 64,
+                 keep_alive_timeout: float = 30.0, max_keep_alive: int = 256, **kwargs):
+        """
+        Initialize PooledXMLRPCServer.
+
+        Args:
+            addr (tuple): Host and port to listen on.
+            workers (int): Number of worker threads.
+            backlog (int): Listen backlog of the server socket.
+            queue_size (int): Requests that may wait for a free worker.
+            keep_alive_timeout (float): Idle time after which a parked connection is closed.
+            max_keep_alive (int): Maximum number of parked connections.
+            **kwargs: Passed to CodecXMLRPCServer.
+        """
+        # request_queue_size читается в server_activate() при вызове listen()
+        self.request_queue_size = backlog
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpc-worker")
+        self.max_pending = workers + queue_size
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive = max_keep_alive
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        # Соединения между запросами: регистрирует их только поток parking через _parked_queue
+        self._selector = selectors.DefaultSelector()
+        self._parked = {}
+        self._parked_queue = []
+        self._parked_lock = threading.Lock()
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._wakeup_write.setblocking(False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self._parking_running = True
+        # Обработчик должен обслуживать по одному запросу: обычный обработчик дополняется PooledRequestHandler
+        handler = kwargs.get("requestHandler", PooledRequestHandler)
+        if not issubclass(handler, PooledRequestHandler):
+            handler = type(handler.__name__, (PooledRequestHandler, handler), {})
+        kwargs["requestHandler"] = handler
+        super().__init__(addr, **kwargs)
+        threading.Thread(target=self._parking_loop, name="rpc-keepalive", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        """Hand the accepted connection over to the worker pool."""
+        self._submit(KeepAliveConnection(request, client_address))
+
+    def _submit(self, connection) -> None:
+        with self._pending_lock:
+            full = self._pending >= self.max_pending
+            if not full:
+                self._pending += 1
+        if full:
+            # Пул занят: быстрый отказ вместо ожидания, которое пир принял бы за молчание узла
+            try:
+                connection.request.settimeout(0)
+                connection.request.send(BUSY_RESPONSE)
+            except OSError:
+                pass
+            self._close(connection)
+            return
+        self.executor.submit(self._serve_one, connection)
+
+    def _serve_one(self, connection) -> None:
+        try:
+            if connection.handler is None:
+                connection.handler = self.RequestHandlerClass(connection.request, connection.client_address, self)
+            handler = connection.handler
+            handler.close_connection = True
+            handler.handle_one_request()
+            if handler.close_connection:
+                self._close(connection)
+            elif self._has_pending_data(connection):
+                # Следующий запрос уже пришёл: в очередь пула, не дожидаясь селектора
+                self._submit(connection)
+            else:
+                self._park(connection)
+        except Exception:
+            self.handle_error(connection.request, connection.client_address)
+            self._close(connection)
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+
+    @staticmethod
+    def _has_pending_data(connection) -> bool:
+        # rfile буферизован: он мог уже прочитать начало следующего запроса, которого селектор не увидит
+        sock = connection.request
+        sock.settimeout(0)
+        try:
+            return bool(connection.handler.rfile.peek(1))
+        finally:
+            sock.settimeout(connection.handler.timeout)
+
+    def _park(self, connection) -> None:
+        connection.parked_at = time.monotonic()
+        with self._parked_lock:
+            self._parked_queue.append(connection)
+        try:
+            self._wakeup_write.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _parking_loop(self) -> None:
+        while self._parking_running:
+            try:
+                events = self._selector.select(timeout=1)
+            except OSError:
+                return
+            now = time.monotonic()
+            for key, _ in events:
+                if key.fileobj is self._wakeup_read:
+                    try:
+                        while self._wakeup_read.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                connection = self._parked.pop(key.fileobj)
+                self._selector.unregister(key.fileobj)
+                self._submit(connection)
+            with self._parked_lock:
+                parked, self._parked_queue = self._parked_queue, []
+            for connection in parked:
+                self._parked[connection.request] = connection
+                self._selector.register(connection.request, selectors.EVENT_READ)
+            # Словарь упорядочен по времени парковки: сначала самые давние
+            expired = [connection for connection in self._parked.values() if now - connection.parked_at >= self.keep_alive_timeout]
+            overflow = len(self._parked) - len(expired) - self.max_keep_alive
+            if overflow > 0:
+                expired += [connection for connection in self._parked.values() if now - connection.parked_at < self.keep_alive_timeout][:overflow]
+            for connection in expired:
+                del self._parked[connection.request]
+                self._selector.unregister(connection.request)
+                self._close(connection)
+
+    def _close(self, connection) -> None:
+        if connection.handler is not None:
+            try:
+                connection.handler.finish()
+            except OSError:
+                pass
+        self.shutdown_request(connection.request)
+
+    def server_close(self):
+        super().server_close()
+        self._parking_running = False
+        self.executor.shutdown(wait=False)
+
+
+class PooledRequestHandler(RequestHandler):
+    """
+    Request handler driven by PooledXMLRPCServer one request at a time.
+
+    The constructor only sets up the streams; the server calls
+    handle_one_request() for every request and finish() on close.
+    """
+
+    def __init__(self, request, client_address, server):
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.setup()
+
+
 class RPCInterface:
     """Class representing the RPC interface."""
-    def __init__(self, rpc_host: str, rpc_port: int, app_setting: 'AppSetting', setup_nodes: 'JSONFileManager', event_queue):
+    def __init__(self, rpc_host: str, rpc_port: int, app_setting: 'AppSetting', setup_nodes: 'JSONFileManager', event_queue, membership=None, services=None, proxy=None):
         """
         Initialize the RPCInterface.
 
@@ -21,45 +236,101 @@ class RPCInterface:
             rpc_port (int): Port number for the RPC server.
             app_setting (AppSetting): Instance of the AppSetting class.
             setup_nodes (JSONFileManager): Instance of the JSONFileManager class.
+            membership (GossipMembership, optional): Membership of the scheduler in swim mode.
+            services (ServiceStateTracker, optional): Service state table of the scheduler.
+            proxy (CoreRroxy, optional): Proxy whose counters get_proxy_stats returns.
         """
         self.rpc_host = rpc_host
         self.rpc_port = rpc_port
         self.app_setting = app_setting
         self.logger = self.app_setting.get_logger()
         self.setup_nodes = setup_nodes
-        self.server = SimpleXMLRPCServer((rpc_host, rpc_port), requestHandler=RequestHandler, allow_none=False)
+        self.server_mode = self.app_setting.get_config('RPCInterface', 'server_mode', fallback='pooled')
+        keep_alive = self.app_setting.config.getboolean('RPCInterface', 'keep_alive', fallback=True)
+        request_timeout = float(self.app_setting.get_config('RPCInterface', 'request_timeout', fallback='10'))
+        # Отдельный подкласс, чтобы настройки не меняли глобальный RequestHandler
+        handler = type("RequestHandler", (RequestHandler,), {
+            "protocol_version": "HTTP/1.1" if keep_alive else "HTTP/1.0",
+            "timeout": request_timeout,
+        })
+        if self.server_mode == "pooled":
+            self.server = PooledXMLRPCServer(
+                (rpc_host, rpc_port),
+                workers=int(self.app_setting.get_config('RPCInterface', 'workers', fallback='16')),
+                backlog=int(self.app_setting.get_config('RPCInterface', 'backlog', fallback='64')),
+                queue_size=int(self.app_setting.get_config('RPCInterface', 'queue_size', fallback='64')),
+                keep_alive_timeout=float(self.app_setting.get_config('RPCInterface', 'keep_alive_timeout', fallback='30')),
+                max_keep_alive=int(self.app_setting.get_config('RPCInterface', 'max_keep_alive', fallback='256')),
+                requestHandler=handler,
+                allow_none=False,
+                logRequests=False,
+            )
+        else:
+            self.server = CodecXMLRPCServer((rpc_host, rpc_port), requestHandler=handler, allow_none=False)
         
         # Create an instance of RPCDossierMethods
-        rpc_methods = RPCDossierMethods(self.app_setting, self.setup_nodes, event_queue)
+        rpc_methods = RPCDossierMethods(self.app_setting, self.setup_nodes, event_queue, membership, services, proxy)
 
         # Register methods as remote procedures
         self.server.register_instance(rpc_methods)
 
+        # Бинарный протокол для трафика между узлами на отдельном порту, те же методы
+        self.wire_port = self.app_setting.get_config('RPCInterface', 'wire_port', fallback='')
+        self.wire_server = None
+        if self.wire_port:
+            self.wire_server = WireServer(
+                (rpc_host, int(self.wire_port)),
+                rpc_methods,
+                self.logger,
+                idle_timeout=float(self.app_setting.get_config('RPCInterface', 'wire_idle_timeout', fallback='120')),
+            )
+
     def run(self):
         """Start the RPC interface server."""
-        self.logger.info(f"[RPCInterface][run]> RPC Interface listening on {self.rpc_host}:{self.rpc_port}")
+        self.logger.info(f"[RPCInterface][run]> RPC Interface ({self.server_mode}) listening on {self.rpc_host}:{self.rpc_port}")
+        if self.wire_server is not None:
+            self.logger.info(f"[RPCInterface][run]> Binary cluster protocol listening on {self.rpc_host}:{self.wire_port}")
+            threading.Thread(target=self.wire_server.serve_forever, name="wire-server", daemon=True).start()
         self.server.serve_forever()
 
 class CoreRpc:
     """Class representing the core RPC functionality."""
-    def __init__(self, app_setting: 'AppSetting', setup_nodes: 'JSONFileManager'):
+    def __init__(self, app_setting: 'AppSetting', setup_nodes: 'JSONFileManager', proxy=None):
         """
         Initialize CoreRpc.
 
         Args:
             app_setting (AppSetting): Instance of the AppSetting class.
             setup_nodes (JSONFileManager): Instance of the JSONFileManager class.
+            proxy (CoreRroxy, optional): Proxy of this node.
         """
         self.setup_nodes = setup_nodes
+        self.proxy = proxy
         self.app_setting = app_setting
         self.rpc_host = str(self.app_setting.get_config('RPCInterface', 'rpc_host'))
         self.rpc_port = int(self.app_setting.get_config('RPCInterface', 'rpc_port'))
         self.event_queue = Queue()
         
+    def reload(self, changes):
+        """
+        Apply a reloaded configuration.
+
+        The key is read per request and applies at once; the listener keeps
+        its address and server mode until restart. Scheduler intervals are
+        handed to the scheduler thread through the event queue.
+
+        Args:
+            changes (dict): Section -> set of changed options (AppSetting.reload).
+        """
+        restart = changes.get('RPCInterface', set()) - {'key'}
+        if restart:
+            self.app_setting.get_logger().warning(f"[CoreRpc][reload]> Changed {', '.join(sorted(restart))} in [RPCInterface] take effect after restart")
+        self.event_queue.put(("config_reload", changes))
+
     def run(self):
         """Start the RPC listener and scheduler."""
         self.rpc_scheduler = RpcScheduler(self.app_setting, self.setup_nodes, self.event_queue)
-        self.rpc_listener = RPCInterface(self.rpc_host, self.rpc_port, self.app_setting, self.setup_nodes, self.event_queue)
+        self.rpc_listener = RPCInterface(self.rpc_host, self.rpc_port, self.app_setting, self.setup_nodes, self.event_queue, self.rpc_scheduler.membership, self.rpc_scheduler.services, self.proxy)
 
         rpc_listener_thread = threading.Thread(target=self.rpc_scheduler.loop_handler)
         rpc_scheduler_thread = threading.Thread(target=self.rpc_listener.run)
@@ -1,11 +1,29 @@
-import threading
+import heapq
 import time
 import xmlrpc.client
 import shortuuid
 import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from NodeJSONCofigurator import NodeBuilder
+from AsyncRpcTransport import AsyncRpcClient, AsyncRpcLoop
+from RPCConnectionPool import RpcConnectionPool
+from GossipMembership import GossipMembership
+from FailureDetector import PhiAccrualFailureDetector
+from ClusterWireProtocol import WireClient, wire_capabilities, negotiate_wire_port
+from NodeInventory import NodeInventory
+from ServiceStateTracker import ServiceStateTracker
 
 
+REGISTRATION_STATES = ("unknown", "registration")
+HEARTBEAT_STATES = ("active", "down", "Connection refused")
+# Параметры [Scheduler], которые apply_config не меняет: от них зависят уже созданные пулы, потоки и окна
+RESTART_OPTIONS = frozenset((
+    "heartbeat_timeout", "heartbeat_workers", "background_workers", "heartbeat_transport", "pool_max_per_host",
+    "pool_idle_timeout", "membership", "phi_window", "gossip_indirect_probes",
+))
+
 
 class RpcScheduler:
     def __init__(self, app_setting: 'AppSetting', setup_nodes, event_queue):
@@ -13,153 +31,532 @@ class RpcScheduler:
         self.setup_nodes = setup_nodes
         self.app_setting = app_setting
         self.logger = self.app_setting.get_logger()
+        self.heartbeat_interval = float(self.app_setting.get_config('Scheduler', 'heartbeat_interval', fallback='5'))
+        self.registration_interval = float(self.app_setting.get_config('Scheduler', 'registration_interval', fallback='10'))
+        self.resync_interval = float(self.app_setting.get_config('Scheduler', 'resync_interval', fallback='30'))
+        self.heartbeat_timeout = float(self.app_setting.get_config('Scheduler', 'heartbeat_timeout', fallback='3'))
+        self.heartbeat_workers = int(self.app_setting.get_config('Scheduler', 'heartbeat_workers', fallback='32'))
+        # Постоянные соединения к узлам для всех исходящих вызовов xmlrpc.client
+        self.rpc_pool = RpcConnectionPool(
+            self.logger,
+            timeout=self.heartbeat_timeout,
+            max_per_host=int(self.app_setting.get_config('Scheduler', 'pool_max_per_host', fallback='2')),
+            idle_timeout=float(self.app_setting.get_config('Scheduler', 'pool_idle_timeout', fallback='60')),
+        )
+        # Бинарный протокол для узлов, согласовавших его при регистрации
+        self.wire_client = WireClient(
+            self.logger,
+            timeout=self.heartbeat_timeout,
+            idle_timeout=float(self.app_setting.get_config('Scheduler', 'pool_idle_timeout', fallback='60')),
+        )
+        self.heartbeat_transport = self.app_setting.get_config('Scheduler', 'heartbeat_transport', fallback='threads')
+        if self.heartbeat_transport == "asyncio":
+            # Все пинги одного опроса выполняются на одном event loop поверх keep-alive соединений
+            self.async_loop = AsyncRpcLoop("heartbeat-loop")
+            self.async_client = AsyncRpcClient(self.logger, self.heartbeat_timeout)
+        else:
+            self.async_client = None
+        # Пул потоков для опроса в режиме threads и для кругов gossip: проверки живости
+        # не должны стоять в очереди за синхронизацией и инвентаризацией
+        self.executor = ThreadPoolExecutor(max_workers=self.heartbeat_workers, thread_name_prefix="heartbeat")
+        # Пул для синхронизации досье с пирами и инвентаризации своего узла
+        self.background_executor = ThreadPoolExecutor(
+            max_workers=int(self.app_setting.get_config('Scheduler', 'background_workers', fallback='4')),
+            thread_name_prefix="background",
+        )
+        self.sync_interval = float(self.app_setting.get_config('Scheduler', 'sync_interval', fallback='30'))
+        self.rpc_key = self.app_setting.get_config('RPCInterface', 'key')
+        # Состояние синхронизации с пирами: node_id -> (epoch, seq) последней сводки
+        self._sync_state = {}
+        self._next_sync = {}
+        self._sync_inflight = set()
+        # Куча дедлайнов (deadline, node_id) и актуальный дедлайн каждого узла.
+        # Устаревшие записи кучи не удаляются, а пропускаются при извлечении.
+        self._deadlines = []
+        self._node_deadlines = {}
+        self._next_resync = 0.0
+        # swim - живость зарегистрированных узлов определяет GossipMembership,
+        # heartbeat - каждый узел пингуется напрямую
+        self.membership_mode = self.app_setting.get_config('Scheduler', 'membership', fallback='heartbeat')
+        if self.membership_mode == "swim":
+            gossip_interval = float(self.app_setting.get_config('Scheduler', 'gossip_interval', fallback='1'))
+            self.membership = GossipMembership(self.app_setting, self.setup_nodes, self.heartbeat_timeout, gossip_interval)
+            self._scheduled_states = REGISTRATION_STATES
+        else:
+            self.membership = None
+            self._scheduled_states = REGISTRATION_STATES + HEARTBEAT_STATES
+        # Узел в режиме heartbeat признаётся недоступным, только когда phi превысит порог
+        self.failure_detector = PhiAccrualFailureDetector(
+            threshold=float(self.app_setting.get_config('Scheduler', 'phi_threshold', fallback='8')),
+            window=int(self.app_setting.get_config('Scheduler', 'phi_window', fallback='100')),
+            min_std=float(self.app_setting.get_config('Scheduler', 'phi_min_std', fallback='1')),
+            acceptable_pause=float(self.app_setting.get_config('Scheduler', 'phi_acceptable_pause', fallback=str(self.heartbeat_interval))),
+            first_interval=self.heartbeat_interval,
+        )
+        self._next_gossip = 0.0
+        self._gossip_future = None
+        # Таблица состояний юнитов systemd, из неё же инвентаризация берёт список сервисов
+        self.services = None
+        if self.app_setting.config.getboolean('Services', 'track', fallback=True):
+            self.services = ServiceStateTracker(self.app_setting)
+        # Инвентаризация своего узла: первый сбор сразу после старта, дальше по расписанию
+        self.inventory = NodeInventory(self.app_setting, self.setup_nodes, self.services)
+        self.inventory_interval = float(self.app_setting.get_config('Scheduler', 'inventory_interval', fallback='300'))
+        self._next_inventory = 0.0
+        self._inventory_future = None
+        self.setup_nodes.subscribe(self._on_status_change)
+
 
-        
     def loop_handler(self):
         self.logger.debug("[RpcScheduler][loop_handler]> Starting RPC loop handler...")
+        if self.services is not None:
+            self.services.start()
         while True:
-            node_ret_code, nodes = self.setup_nodes.load_json_nodes_config("nodes")
-            if int(node_ret_code) != 0:
-                self.logger.error(f"[RpcScheduler][loop_handler]>{nodes}")
-                break
-
-            self.status_node_check(nodes)
-            
+            now = time.monotonic()
+            if now >= self._next_resync:
+                self._sync_schedule(now)
+
+            if self.membership is not None and now >= self._next_gossip:
+                self._start_gossip_round(now)
+            if now >= self._next_inventory:
+                self._start_inventory_refresh(now)
+
+            timeout = min(self._next_resync, self._next_inventory) - now
+            if self.membership is not None:
+                timeout = min(timeout, self._next_gossip - now)
+            if self._deadlines:
+                timeout = min(timeout, self._deadlines[0][0] - now)
             try:
-                # Извлечь событие из очереди без блокировки
-                event = self.event_queue.get_nowait()
-                # Обработать событие
-                print("Handling event:", event)
+                # Ждём событие от RPC не дольше, чем до ближайшего дедлайна
+                event = self.event_queue.get(timeout=max(timeout, 0))
+                self.handle_event(event)
             except queue.Empty:
-                # Если очередь пуста, продолжить выполнение основного цикла
                 pass
 
+            self._run_due_nodes()
+
+
+    def _on_status_change(self, node_id: str, old, new, timestamp: float) -> None:
+        # Вызывается из потока, изменившего досье - расписание правит только поток планировщика
+        self.event_queue.put(("status_change", node_id, old, new))
+
+
+    def handle_event(self, event) -> None:
+        """Обработка события, поставленного в очередь RPC интерфейсом или лентой изменений досье."""
+        self.logger.debug(f"[RpcScheduler][handle_event]> Handling event: {event}")
+        if event == "status_node_check":
+            self._sync_schedule(time.monotonic())
+        elif event == "inventory_refresh":
+            self._start_inventory_refresh(time.monotonic())
+        elif isinstance(event, tuple) and event[0] == "config_reload":
+            self.apply_config(event[1])
+        elif isinstance(event, tuple) and event[0] == "status_change":
+            _, node_id, old, new = event
+            if new in self._scheduled_states:
+                if node_id not in self._node_deadlines:
+                    now = time.monotonic()
+                    self.failure_detector.seed(node_id, now)
+                    self._schedule(node_id, now)
+            else:
+                self._node_deadlines.pop(node_id, None)
+                self.failure_detector.remove(node_id)
+        else:
+            self.logger.warning(f"[RpcScheduler][handle_event]> Unknown event: {event}")
+
+
+    def apply_config(self, changes) -> None:
+        """
+        Перечитывает интервалы и пороги из перечитанной конфигурации.
+
+        Вызывается только потоком планировщика. Уже назначенные проверки
+        узлов остаются на своих дедлайнах, новые интервалы действуют со
+        следующей проверки; плановые задачи с укороченным интервалом
+        переносятся ближе.
+
+        Args:
+            changes (dict): Имя секции -> множество изменённых параметров (AppSetting.reload).
+        """
+        restart = changes.get('Scheduler', set()) & RESTART_OPTIONS
+        if restart:
+            self.logger.warning(f"[RpcScheduler][apply_config]> Changed {', '.join(sorted(restart))} take effect after restart")
+        try:
+            heartbeat_interval = float(self.app_setting.get_config('Scheduler', 'heartbeat_interval', fallback='5'))
+            registration_interval = float(self.app_setting.get_config('Scheduler', 'registration_interval', fallback='10'))
+            resync_interval = float(self.app_setting.get_config('Scheduler', 'resync_interval', fallback='30'))
+            sync_interval = float(self.app_setting.get_config('Scheduler', 'sync_interval', fallback='30'))
+            inventory_interval = float(self.app_setting.get_config('Scheduler', 'inventory_interval', fallback='300'))
+            phi_threshold = float(self.app_setting.get_config('Scheduler', 'phi_threshold', fallback='8'))
+            phi_min_std = float(self.app_setting.get_config('Scheduler', 'phi_min_std', fallback='1'))
+            phi_acceptable_pause = float(self.app_setting.get_config('Scheduler', 'phi_acceptable_pause', fallback=str(heartbeat_interval)))
+        except ValueError as e:
+            self.logger.error(f"[RpcScheduler][apply_config]> Invalid [Scheduler] settings, keeping current: {e}")
+            return
+        self.heartbeat_interval = heartbeat_interval
+        self.registration_interval = registration_interval
+        self.resync_interval = resync_interval
+        self.sync_interval = sync_interval
+        self.inventory_interval = inventory_interval
+        self.failure_detector.threshold = phi_threshold
+        self.failure_detector.min_std = phi_min_std
+        self.failure_detector.acceptable_pause = phi_acceptable_pause
+        self.rpc_key = self.app_setting.get_config('RPCInterface', 'key')
+        now = time.monotonic()
+        self._next_resync = min(self._next_resync, now + self.resync_interval)
+        self._next_inventory = min(self._next_inventory, now + self.inventory_interval)
+        if self.membership is not None:
+            self.membership.apply_config()
+            self._next_gossip = min(self._next_gossip, now + self.membership.protocol_period)
+        if self.services is not None:
+            self.services.apply_config()
+        self.logger.info(f"[RpcScheduler][apply_config]> Scheduler settings reloaded")
+
+
+    def _schedule(self, node_id: str, deadline: float) -> None:
+        self._node_deadlines[node_id] = deadline
+        heapq.heappush(self._deadlines, (deadline, node_id))
+
+
+    def _sync_schedule(self, now: float) -> None:
+        """Сверяет расписание с досье: новые узлы ставятся на проверку сразу, удалённые забываются."""
+        node_ids = self.setup_nodes.get_node_ids_by_status(*self._scheduled_states)
+        for node_id in node_ids - self._node_deadlines.keys():
+            # Без истории phi бесконечен и первый же пропуск ответа после перезапуска валил бы узел
+            self.failure_detector.seed(node_id, now)
+            self._schedule(node_id, now)
+        for node_id in self._node_deadlines.keys() - node_ids:
+            del self._node_deadlines[node_id]
+            self.failure_detector.remove(node_id)
+        self._next_resync = now + self.resync_interval
+        # Куча разрастается устаревшими записями - перестраиваем её при сверке
+        if len(self._deadlines) > 2 * len(self._node_deadlines):
+            self._deadlines = [(deadline, node_id) for node_id, deadline in self._node_deadlines.items()]
+            heapq.heapify(self._deadlines)
+
+
+    def _pop_due_nodes(self, now: float) -> list:
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, node_id = heapq.heappop(self._deadlines)
+            if self._node_deadlines.get(node_id) == deadline:
+                due.append(node_id)
+        return due
+
+
+    def _run_due_nodes(self) -> None:
+        due_ids = self._pop_due_nodes(time.monotonic())
+        if not due_ids:
+            return
+        nodes = []
+        for node_id in due_ids:
+            node = self.setup_nodes._get_node_by_id(None, node_id)
+            if node is None:
+                del self._node_deadlines[node_id]
+            else:
+                nodes.append(NodeBuilder(**node))
+        self.status_node_check(nodes)
+        now = time.monotonic()
+        for node in nodes:
+            if node.id not in self._node_deadlines:
+                continue
+            current = self.setup_nodes._get_node_by_id(None, node.id)
+            if current is None:
+                # Узел перерегистрирован под другим id - подхватываем его при ближайшей сверке
+                del self._node_deadlines[node.id]
+                self._next_resync = now
+            elif current.get("active") in REGISTRATION_STATES:
+                self._schedule(node.id, now + self.registration_interval)
+            elif current.get("active") not in self._scheduled_states:
+                # Зарегистрированный узел переходит под контроль GossipMembership
+                del self._node_deadlines[node.id]
+            else:
+                self._schedule(node.id, now + self.heartbeat_interval)
+
+
+    def _peer_call(self, host: str, port: int, host_id: str, method: str, *params):
+        """Вызов метода узла: по бинарному протоколу, если узел его согласовал, иначе через XML-RPC."""
+        node = self.setup_nodes._get_node_by_id(None, host_id)
+        wire_port = node.get("wire_port") if node is not None else None
+        if wire_port:
+            try:
+                return self.wire_client.call(host, wire_port, method, *params)
+            except ConnectionRefusedError:
+                # Бинарный порт закрыт (узел перезапущен без него) - XML-RPC порт ещё может отвечать
+                self.logger.debug(f"[EventSender][peer_call][{host_id}]> Wire port {wire_port} refused, falling back to XML-RPC")
+        return self.rpc_pool.call(host, port, method, *params)
+
+    def _reg_answer(self, res, host_id: str):
+        self.logger.info(f"[EventSender][send_reg_for_node][{host_id}]> ANSWER: {res}")
+        # Ответ приходит либо как {"ACK": ...}, либо завёрнутым в _prepare_response
+        if isinstance(res, dict) and isinstance(res.get("data"), dict):
+            res = res["data"]
+        if isinstance(res, dict) and "ACK" in res:
+            self.logger.info(f"[EventSender][send_Registration][{host_id}]> Registration Event response!")
+            ack = dict(res["ACK"])
+            wire_port = negotiate_wire_port(self.app_setting, res.get("CAPS"))
+            if wire_port:
+                ack["wire_port"] = wire_port
+            else:
+                ack.pop("wire_port", None)
+            return "ACK", ack
+        return "status", "registration"
+
+    def _ping_answer(self, res, host_id: str) -> str:
+        if res == "Pong":
+            self.logger.info(f"[EventSender][send_Ping][{host_id}]> Ping Event response!")
+            return "active"
+        self.logger.warning(f"[EventSender][send_Ping][{host_id}]> Unexpected ping answer: {res}")
+        return "down"
+
+
+    def send_reg_for_node(self, host: str, port: int, data, host_id: str):
+        """
+        Отправляет узлу запрос регистрации.
 
-    def send_reg_for_node(self, host: str, port: int, data, host_id: str) -> None:
+        Returns:
+            tuple: ("ACK", данные узла) при успешной регистрации, иначе ("status", новый статус узла).
+        """
         self.logger.info(f"[EventSender][send_Registration][{host_id}]> Registration Event sent!")
         try:
-            # Функция для преобразования чисел в строки во всей структуре данных
-            def convert_to_str(value):
-                if isinstance(value, dict):
-                    return {k: convert_to_str(v) for k, v in value.items()}
-                elif isinstance(value, list):
-                    return [convert_to_str(v) for v in value]
-                elif isinstance(value, int):
-                    return str(value)
-                else:
-                    return value
-
-            # Преобразование всех чисел в строки в переменной data
-            data_str = convert_to_str(data)
-            self.logger.debug(f"[EventSender][convert_to_str]> data_str - {data_str}")
-            proxy = xmlrpc.client.ServerProxy(f'http://{host}:{port}')
-            res = proxy.remote_registration(data_str)
-            self.logger.info(f"[EventSender][send_reg_for_node][{host_id}]> ANSWER: {res}")
-            self.setup_nodes.update_node_by_id(host_id, {"active": "registration"})
-
-            if "ACK" in res:
-                reg_data = res["ACK"]
-                self.setup_nodes.remove_node_from_config(host_id)
-                self.setup_nodes.add_node_to_config(reg_data)
-                self.logger.info(f"[EventSender][send_Registration][{host_id}]> Registration Event response!")
-                self.setup_nodes.update_node_by_id(host_id, {"active": "active"})
+            return self._reg_answer(self.rpc_pool.call(host, port, "remote_registration", data), host_id)
         except ConnectionRefusedError:
             self.logger.error(f"[EventSender][send_Registration][{host_id}] Registration - Connection refused!")
-            time.sleep(5)
         except Exception as e:
             self.logger.error(f"[EventSender][send_Registration] Error sending Registration to node {host_id}: {e}")
-            time.sleep(7)
+        return "status", "registration"
 
-    def send_ping_for_node(self, host: str, port: int, host_id: str) -> None:
+    def send_ping_for_node(self, host: str, port: int, host_id: str) -> str:
+        """
+        Отправляет узлу ping.
+
+        Returns:
+            str: Новый статус узла.
+        """
         self.logger.info(f"[EventSender][send_Ping][{host_id}]> Ping Event sent!")
         try:
-            proxy = xmlrpc.client.ServerProxy(f'http://{host}:{port}')
-            res = proxy.ping()
-            if res == "Pong":
-                self.logger.info(f"[EventSender][send_Ping][{host_id}]> Ping Event response!")
-            time.sleep(2)
+            return self._ping_answer(self._peer_call(host, port, host_id, "ping"), host_id)
         except ConnectionRefusedError:
             self.logger.error(f"[EventSender][send_Ping][{host_id}] Ping - Connection refused!")
-            self.setup_nodes.update_node_by_id(host_id, {"active": "Connection refused"})
-            time.sleep(5)
+            return "Connection refused"
         except Exception as e:
             self.logger.error(f"[EventSender][send_Ping] Error sending Ping to node {host_id}: {e}")
-            self.setup_nodes.update_node_by_id(host_id, {"active": "down"})
-            time.sleep(10)
+            return "down"
 
 
-    def synchronisation(self, host: str, port: int, host_id: str) -> None:
-        def convert_to_str(value):
-                if isinstance(value, dict):
-                    return {k: convert_to_str(v) for k, v in value.items()}
-                elif isinstance(value, list):
-                    return [convert_to_str(v) for v in value]
-                elif isinstance(value, int):
-                    return str(value)
-                else:
-                    return value
-        time.sleep(10)
-        self.logger.info(f"[EventSender][synchronisation][{host_id}]> Start synchronisation!")
+    async def async_send_reg_for_node(self, host: str, port: int, data, host_id: str):
+        """Асинхронный вариант send_reg_for_node поверх AsyncRpcClient."""
+        self.logger.info(f"[EventSender][send_Registration][{host_id}]> Registration Event sent!")
         try:
+            res = await self.async_client.call(host, port, "remote_registration", data)
+            return self._reg_answer(res, host_id)
+        except ConnectionRefusedError:
+            self.logger.error(f"[EventSender][send_Registration][{host_id}] Registration - Connection refused!")
+        except Exception as e:
+            self.logger.error(f"[EventSender][send_Registration] Error sending Registration to node {host_id}: {e!r}")
+        return "status", "registration"
 
-            proxy = xmlrpc.client.ServerProxy(f'http://{host}:{port}')
-            data = self.setup_nodes._load_config()
-            data_str = convert_to_str(data)
-            res = proxy.synchronis(data_str)
-            if res == "Pong":
-                self.logger.info(f"[EventSender][send_Ping][{host_id}]> Sync Event response!")
+    async def async_send_ping_for_node(self, host: str, port: int, host_id: str) -> str:
+        """Асинхронный вариант send_ping_for_node поверх AsyncRpcClient."""
+        self.logger.info(f"[EventSender][send_Ping][{host_id}]> Ping Event sent!")
+        try:
+            return self._ping_answer(await self.async_client.call(host, port, "ping"), host_id)
         except ConnectionRefusedError:
             self.logger.error(f"[EventSender][send_Ping][{host_id}] Ping - Connection refused!")
-            self.setup_nodes.update_node_by_id(host_id, {"active": "Connection refused"})
+            return "Connection refused"
+        except Exception as e:
+            self.logger.error(f"[EventSender][send_Ping] Error sending Ping to node {host_id}: {e!r}")
+            return "down"
+
+    async def _async_sweep(self, jobs):
+        coroutines = []
+        for node, data in jobs:
+            if data is None:
+                coroutines.append(self.async_send_ping_for_node(node.host, node.port, node.id))
+            else:
+                coroutines.append(self.async_send_reg_for_node(node.host, node.port, data, node.id))
+        return await asyncio.gather(*coroutines)
+
 
+    def synchronisation(self, host: str, port: int, host_id: str) -> None:
+        """
+        Дельта-синхронизация досье с узлом.
+
+        Запрашивает у пира сводку ревизий записей, изменённых после прошлой
+        сводки, и забирает только записи, которые у пира новее локальных.
+        """
+        event_id: str = shortuuid.uuid()
+        self.logger.debug(f"[EventSender][synchronisation][{host_id}]> Start synchronisation!")
+        try:
+            epoch, since = self._sync_state.get(host_id, ("", 0))
+            res = self._peer_call(host, port, host_id, "sync_summary", self.rpc_key, epoch, since)
+            summary = res.get("data") if isinstance(res, dict) else None
+            if not isinstance(summary, dict) or "records" not in summary:
+                self.logger.warning(f"[EventSender][synchronisation][{host_id}]> Invalid sync summary: {res}")
+                return
+            missing = self.setup_nodes.sync_missing(summary["records"])
+            records = []
+            if missing:
+                res = self._peer_call(host, port, host_id, "sync_pull", self.rpc_key, missing)
+                records = res.get("data") or []
+            self.setup_nodes.merge_records(event_id, records, summary.get("tombstones", {}))
+            self._sync_state[host_id] = (summary["epoch"], int(summary["seq"]))
+            self.logger.debug(f"[EventSender][synchronisation][{host_id}]> {len(summary['records'])} changed records, {len(records)} pulled")
+        except xmlrpc.client.Fault as fault:
+            # Узел старой версии без sync_summary - синхронизация с ним невозможна
+            self.logger.debug(f"[EventSender][synchronisation][{host_id}]> Peer does not support delta sync: {fault}")
         except Exception as e:
-            self.logger.error(f"[EventSender][send_Ping] Error sending Ping to node {host_id}: {e}")
-            self.setup_nodes.update_node_by_id(host_id, {"active": "down"})
+            self.logger.error(f"[EventSender][synchronisation] Error synchronising with node {host_id}: {e}")
+        finally:
+            self._sync_inflight.discard(host_id)
 
 
+    def _start_synchronisation(self, nodes) -> None:
+        now = time.monotonic()
+        for node in nodes:
+            if node.id in self._sync_inflight or now < self._next_sync.get(node.id, 0):
+                continue
+            self._next_sync[node.id] = now + self.sync_interval
+            self._sync_inflight.add(node.id)
+            self.background_executor.submit(self.synchronisation, node.host, node.port, node.id)
 
 
+    def _start_gossip_round(self, now: float) -> None:
+        self._next_gossip = now + self.membership.protocol_period
+        # Круг не запускается, пока не завершён предыдущий (косвенный probe может длиться дольше периода)
+        if self._gossip_future is not None and not self._gossip_future.done():
+            return
+        self._gossip_future = self.executor.submit(self._gossip_round)
 
 
+    def _start_inventory_refresh(self, now: float) -> None:
+        self._next_inventory = now + self.inventory_interval
+        if self._inventory_future is not None and not self._inventory_future.done():
+            return
+        # Сбор идёт в пуле: cpuinfo при пустом кэше занимает секунды
+        self._inventory_future = self.background_executor.submit(self._inventory_refresh)
 
-    def status_node_check(self, nodes):
-        """Метод проверки статуса и маршрута хоста"""
-       
-        for node in nodes:
-            self.event_id: str = shortuuid.uuid()
-            #node_route = node.route
-            if node.active == "unknown" or node.active == "registration":
 
-                self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Node has status {node.active}!")
-                self.logger.info(f"[EventSender][status_node_check][{node.id}]> The registration process has begun!")
-                
-                self.ret_code, self.self_data = self.setup_nodes.just_load_json(self.event_id, "self", "full")
-                if int(self.ret_code) != 0:
-                    self.logger.error(f"[RpcScheduler]> Error load_json_nodes_config: {self.self_data}")    
-                
-                data = {"REG": self.self_data[0]}
-                
-                heartbeat_thread = threading.Thread(target=self.send_reg_for_node, args=(node.host, node.port, data, node.id))
-                heartbeat_thread.start()
-                heartbeat_thread.join()
+    def _inventory_refresh(self) -> None:
+        try:
+            self.inventory.refresh(shortuuid.uuid())
+        except Exception as e:
+            self.logger.error(f"[RpcScheduler][inventory_refresh]> Error refreshing inventory: {e}")
 
-            elif node.active == "active" or node.active == "down" or node.active == "Connection refused":
-                #sync_thread = threading.Thread(target=self.synchronisation, args=(node.host, node.port, node.id))
-                #sync_thread.start()
-                #sync_thread.join()
 
-                heartbeat_thread = threading.Thread(target=self.send_ping_for_node, args=(node.host, node.port, node.id))
-                heartbeat_thread.start()
-                heartbeat_thread.join()
+    def _gossip_round(self) -> None:
+        try:
+            member = self.membership.protocol_round()
+        except Exception as e:
+            self.logger.error(f"[RpcScheduler][gossip_round]> Error in protocol round: {e}")
+            return
+        if member is not None:
+            self._start_synchronisation([member])
 
-                
 
+    def status_node_check(self, nodes):
+        """
+        Метод проверки статуса и маршрута хоста.
+
+        Опрос узлов выполняется параллельно (в пуле self.executor или на event
+        loop AsyncRpcClient), результаты применяются к досье одним пакетом
+        после завершения опроса. Узел, до опроса которого очередь не дошла,
+        пропускается без изменения статуса и проверяется в следующий раз.
+        """
+        event_id: str = shortuuid.uuid()
+        # Задания опроса: (узел, данные REG) для регистрации или (узел, None) для ping
+        jobs = []
+        self_data = None
+        for node in nodes:
+            #node_route = node.route
+            if node.active in REGISTRATION_STATES:
+                self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Node has status {node.active}!")
+                self.logger.info(f"[EventSender][status_node_check][{node.id}]> The registration process has begun!")
 
+                if self_data is None:
+                    ret_code, self_data = self.setup_nodes.just_load_json(event_id, "self", "full")
+                    if int(ret_code) != 0:
+                        self.logger.error(f"[RpcScheduler]> Error load_json_nodes_config: {self_data}")
+                        self_data = None
+                        continue
+                reg_request = {"REG": self_data[0]}
+                capabilities = wire_capabilities(self.app_setting)
+                if capabilities:
+                    reg_request["CAPS"] = capabilities
+                jobs.append((node, reg_request))
+
+            elif node.active in HEARTBEAT_STATES:
+                jobs.append((node, None))
 
             elif node.active == "disable":
                 pass
             else:
                 self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Unknown 'active' parameter: {node.active}!")
 
-
-
+        if not jobs:
+            return
+
+        if self.async_client is not None:
+            results = self.async_loop.run(self._async_sweep(jobs))
+        else:
+            results = self._threaded_sweep(jobs)
+
+        updates = {}
+        registrations = []
+        reachable = []
+        now = time.monotonic()
+        for (node, data), result in zip(jobs, results):
+            if result is None:
+                continue
+            if data is not None:
+                kind, value = result
+                if kind == "ACK":
+                    # Узел после регистрации становится active: его история начинается с этого ответа
+                    self.failure_detector.heartbeat(node.id, now)
+                    registrations.append((node, value))
+                    continue
+                result = value
+            elif result == "active":
+                self.failure_detector.heartbeat(node.id, now)
+                reachable.append(node)
+            elif node.active == "active":
+                phi = self.failure_detector.phi(node.id, now)
+                if phi < self.failure_detector.threshold:
+                    # Единичный пропуск ответа - узел остаётся active до превышения порога
+                    self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Ping failed ({result}), phi={phi:.2f} below threshold")
+                    continue
+                self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Node is {result}, phi={phi:.2f}")
+                self.failure_detector.remove(node.id)
+            if result != node.active:
+                updates[node.id] = {"active": result}
+
+        if updates:
+            self.setup_nodes.update_nodes_by_id(event_id, updates)
+        for node, reg_data in registrations:
+            # Адрес узла в его собственном досье - 127.0.0.1, сохраняем тот, по которому он доступен нам
+            reg_data.update({"host": node.host, "port": node.port, "active": "active"})
+            self.setup_nodes.replace_node(event_id, node.id, reg_data)
+        # Синхронизация идёт в фоне и не задерживает следующий опрос
+        self._start_synchronisation(reachable)
+
+
+    def _threaded_sweep(self, jobs) -> list:
+        futures = []
+        for node, data in jobs:
+            if data is None:
+                futures.append(self.executor.submit(self.send_ping_for_node, node.host, node.port, node.id))
+            else:
+                futures.append(self.executor.submit(self.send_reg_for_node, node.host, node.port, data, node.id))
+
+        # Таймаут сокета ограничивает каждый вызов, общий таймаут страхует от зависших потоков
+        _, not_done = wait(futures, timeout=self.heartbeat_timeout * 2)
+        results = []
+        for future, (node, data) in zip(futures, jobs):
+            if future not in not_done:
+                results.append(future.result())
+            elif future.cancel():
+                # Вызов так и не начался: это нехватка потоков, а не молчание узла
+                self.logger.warning(f"[EventSender][status_node_check][{node.id}]> Check did not start within {self.heartbeat_timeout * 2}s, skipped")
+                results.append(None)
+            else:
+                self.logger.error(f"[EventSender][status_node_check][{node.id}]> No answer within {self.heartbeat_timeout * 2}s")
+                results.append(("status", "registration") if data is not None else "down")
+        return results
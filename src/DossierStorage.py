@@ -0,0 +1,298 @@
+import os
+import json
+import atexit
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+
+def _find_record(nodes: List[Dict[str, Any]], node_id: str) -> Optional[Dict[str, Any]]:
+    return next((node for node in nodes if node.get("id") == node_id), None)
+
+
+def apply_record(data: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """
+    Apply one journal record to the dossier.
+
+    Records are idempotent (add and replace upsert by id), so replaying a
+    journal that was already folded into the snapshot is harmless.
+
+    Args:
+        data (dict): The dossier to modify in place.
+        record (dict): Journal record written by JSONFileManager.
+    """
+    op = record["op"]
+    if op == "batch":
+        for item in record["records"]:
+            apply_record(data, item)
+        return
+    nodes = data.setdefault(record.get("group", "nodes"), [])
+    if record.get("tombstone"):
+        data.setdefault("tombstones", {})[record["id"]] = record["tombstone"]
+    if op in ("add", "replace"):
+        if op == "replace" and record["id"] != record["node"].get("id"):
+            old = _find_record(nodes, record["id"])
+            if old is not None:
+                nodes.remove(old)
+        data.get("tombstones", {}).pop(record["node"].get("id"), None)
+        existing = _find_record(nodes, record["node"].get("id"))
+        if existing is not None:
+            existing.update(record["node"])
+        else:
+            nodes.append(record["node"])
+    elif op == "remove":
+        nodes[:] = [node for node in nodes if node.get("id") != record["id"]]
+    elif op == "update":
+        node = _find_record(nodes, record["id"])
+        if node is not None:
+            node.update(record["values"])
+    elif op == "update_many":
+        by_id = {node.get("id"): node for node in nodes}
+        for node_id, values in record["updates"].items():
+            if node_id in by_id:
+                by_id[node_id].update(values)
+    else:
+        raise ValueError(f"Unknown journal operation '{op}'")
+
+
+class SnapshotStorage:
+    """
+    Storage of the dossier as a single JSON snapshot file.
+
+    Writes go to a temporary file in the same directory which then replaces
+    the snapshot with os.replace(), so readers and crashes never see a
+    truncated file. A single writer lock orders the writes. Saves that arrive
+    within write_interval are coalesced into one write of the latest state.
+    """
+
+    def __init__(self, file_path: str, logger, data_lock, fsync: bool = False, write_interval: float = 0.0):
+        """
+        Initialize SnapshotStorage.
+
+        Args:
+            file_path (str): Path of the snapshot file.
+            logger: Logger object for logging messages.
+            data_lock: Lock that protects the in-memory dossier while it is serialized.
+            fsync (bool): Flush the file and its directory to disk on every write.
+            write_interval (float): Coalescing interval in seconds, 0 writes through immediately.
+        """
+        self.file_path = file_path
+        self.logger = logger
+        self.data_lock = data_lock
+        self.fsync = fsync
+        self.write_interval = write_interval
+        self.signature = None
+        self._state_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._data = None
+        self._generation = 0
+        self._written_generation = 0
+        self._timer = None
+        atexit.register(self.flush)
+
+    def stat_signature(self):
+        """Сигнатура файла досье (inode, mtime, size) для обнаружения внешних правок."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    @property
+    def pending(self) -> bool:
+        """True while a saved state has not reached the disk yet."""
+        return self._generation != self._written_generation
+
+    def changed_on_disk(self) -> bool:
+        """
+        Check whether the snapshot was modified by someone else.
+
+        While own writes are pending the in-memory state is authoritative.
+        """
+        if self.pending:
+            return False
+        return self.stat_signature() != self.signature
+
+    def load(self) -> Dict[str, Any]:
+        """Read the snapshot from disk."""
+        signature = self.stat_signature()
+        with open(self.file_path, 'r') as config_file:
+            data = json.load(config_file)
+        with self._state_lock:
+            self.signature = signature
+        return data
+
+    def save(self, data: Dict[str, Any], record: Dict[str, Any] = None) -> None:
+        """
+        Schedule the dossier for writing. Must be called under data_lock.
+
+        Args:
+            data (dict): The in-memory dossier.
+            record (dict, optional): Journal record of the change, unused by snapshot storage.
+        """
+        with self._state_lock:
+            self._data = data
+            self._generation += 1
+            if self.write_interval > 0 and self._timer is None:
+                self._timer = threading.Timer(self.write_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.write_interval <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the latest saved state to disk if it is not written yet."""
+        with self.data_lock:
+            with self._state_lock:
+                self._timer = None
+                generation = self._generation
+                if generation == self._written_generation:
+                    return
+                data = self._data
+            payload = json.dumps(data, indent=4)
+
+        with self._write_lock:
+            # Более свежее состояние уже записано другим потоком
+            if generation <= self._written_generation:
+                return
+            try:
+                self._write_atomic(payload)
+            except OSError as error:
+                self.logger.error(f"[SnapshotStorage][flush]> Error writing dossier {self.file_path}: {error}")
+                if self.write_interval <= 0:
+                    raise
+                # Повторяем попытку на следующем интервале
+                with self._state_lock:
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.write_interval, self.flush)
+                        self._timer.daemon = True
+                        self._timer.start()
+                return
+            with self._state_lock:
+                self._written_generation = generation
+                self.signature = self.stat_signature()
+
+    def _write_atomic(self, payload: str) -> None:
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".trinity.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(payload)
+                if self.fsync:
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+            if os.path.exists(self.file_path):
+                os.chmod(tmp_path, os.stat(self.file_path).st_mode & 0o777)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        if self.fsync:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self.logger.debug(f"[SnapshotStorage][_write_atomic]> Dossier written to {self.file_path}")
+
+
+class WriteAheadLogStorage(SnapshotStorage):
+    """
+    Snapshot plus append-only journal of dossier mutations.
+
+    Every mutation appends one compact JSON line to "<snapshot>.wal", so its
+    I/O cost does not depend on the dossier size. After compact_records
+    records the journal is folded into a new snapshot and truncated. Loading
+    replays the journal on top of the snapshot, which also recovers the
+    changes made before a crash.
+    """
+
+    def __init__(self, file_path: str, logger, data_lock, fsync: bool = False, compact_records: int = 1000):
+        """
+        Initialize WriteAheadLogStorage.
+
+        Args:
+            file_path (str): Path of the snapshot file.
+            logger: Logger object for logging messages.
+            data_lock: Lock that protects the in-memory dossier.
+            fsync (bool): fsync the journal after every record and the snapshot on compaction.
+            compact_records (int): Number of journal records that triggers compaction.
+        """
+        super().__init__(file_path, logger, data_lock, fsync=fsync, write_interval=0)
+        self.wal_path = f"{file_path}.wal"
+        self.compact_records = compact_records
+        self._wal_file = None
+        self._wal_records = 0
+
+    def load(self) -> Dict[str, Any]:
+        """Read the snapshot and replay the journal on top of it."""
+        data = super().load()
+        replayed = 0
+        torn = False
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, 'r') as wal_file:
+                for line in wal_file:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная запись в конце журнала после аварии
+                        torn = True
+                        break
+                    apply_record(data, record)
+                    replayed += 1
+        self._data = data
+        if replayed or torn:
+            self.logger.info(f"[WriteAheadLogStorage][load]> Replayed {replayed} journal records from {self.wal_path}")
+            self.compact()
+        return data
+
+    def save(self, data: Dict[str, Any], record: Dict[str, Any] = None) -> None:
+        """
+        Append the change to the journal. Must be called under data_lock.
+
+        Args:
+            data (dict): The in-memory dossier.
+            record (dict, optional): Journal record, without it a new snapshot is written.
+        """
+        self._data = data
+        if record is None or self._wal_records >= self.compact_records:
+            self.compact()
+            return
+        if self._wal_file is None:
+            self._wal_file = open(self.wal_path, 'a')
+        self._wal_file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._wal_file.flush()
+        if self.fsync:
+            os.fsync(self._wal_file.fileno())
+        self._wal_records += 1
+
+    def flush(self) -> None:
+        """Fold the journal into the snapshot."""
+        if self._wal_records:
+            self.compact()
+
+    def compact(self) -> None:
+        """Write a new snapshot of the current state and truncate the journal."""
+        with self.data_lock:
+            if self._data is None:
+                return
+            payload = json.dumps(self._data, indent=4)
+            with self._write_lock:
+                self._write_atomic(payload)
+                with self._state_lock:
+                    self.signature = self.stat_signature()
+            if self._wal_file is not None:
+                self._wal_file.close()
+                self._wal_file = None
+            with open(self.wal_path, 'w'):
+                pass
+            self._wal_records = 0
+        self.logger.debug(f"[WriteAheadLogStorage][compact]> Journal folded into {self.file_path}")
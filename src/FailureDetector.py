@@ -0,0 +1,129 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+
+class HeartbeatHistory:
+    """Кольцевой буфер интервалов между heartbeat одного узла с накопленными суммами."""
+
+    def __init__(self, window: int, first_interval: float):
+        """
+        Initialize HeartbeatHistory.
+
+        Args:
+            window (int): Number of intervals kept.
+            first_interval (float): Expected interval used before real samples exist.
+        """
+        self.window = window
+        self.intervals = [0.0] * window
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.last = None
+        # Начальная оценка: два интервала с разбросом в четверть интервала
+        self.add(first_interval - first_interval / 4)
+        self.add(first_interval + first_interval / 4)
+
+    def add(self, interval: float) -> None:
+        if self.count == self.window:
+            old = self.intervals[self.position]
+            self.total -= old
+            self.total_squares -= old * old
+        else:
+            self.count += 1
+        self.intervals[self.position] = interval
+        self.position = (self.position + 1) % self.window
+        self.total += interval
+        self.total_squares += interval * interval
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+    @property
+    def std(self) -> float:
+        mean = self.mean
+        return math.sqrt(max(self.total_squares / self.count - mean * mean, 0.0))
+
+
+class PhiAccrualFailureDetector:
+    """
+    Phi accrual failure detector (Hayashibara et al.).
+
+    Instead of a binary up/down verdict the detector gives a suspicion level
+    phi = -log10(P(the next heartbeat arrives later than now)), estimated
+    from the normal distribution of the recent inter-arrival times of the
+    node. phi 1 means a 10% chance of a false suspicion, phi 8 about 1e-8.
+    """
+
+    def __init__(self, threshold: float = 8.0, window: int = 100, min_std: float = 0.5,
+                 acceptable_pause: float = 0.0, first_interval: float = 1.0):
+        """
+        Initialize PhiAccrualFailureDetector.
+
+        Args:
+            threshold (float): phi above which a node is considered down.
+            window (int): Number of inter-arrival times kept per node.
+            min_std (float): Lower bound of the standard deviation, protects against too regular heartbeats.
+            acceptable_pause (float): Pause in seconds added to the mean interval.
+            first_interval (float): Expected interval for a node without history.
+        """
+        self.threshold = threshold
+        self.window = window
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self.first_interval = first_interval
+        self._lock = threading.Lock()
+        self._history: Dict[str, HeartbeatHistory] = {}
+
+    def heartbeat(self, node_id: str, now: Optional[float] = None) -> None:
+        """Регистрирует успешный ответ узла."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            history = self._history.get(node_id)
+            if history is None:
+                history = self._history[node_id] = HeartbeatHistory(self.window, self.first_interval)
+            elif history.last is not None:
+                history.add(now - history.last)
+            history.last = now
+
+    def seed(self, node_id: str, now: Optional[float] = None) -> None:
+        """Начинает историю узла с момента, когда он был замечен, если истории ещё нет."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if node_id not in self._history:
+                history = self._history[node_id] = HeartbeatHistory(self.window, self.first_interval)
+                history.last = now
+
+    def phi(self, node_id: str, now: Optional[float] = None) -> float:
+        """
+        Suspicion level of the node.
+
+        Returns:
+            float: phi, or infinity if no heartbeat of the node was seen.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            history = self._history.get(node_id)
+            if history is None or history.last is None:
+                return math.inf
+            elapsed = now - history.last
+            mean = history.mean + self.acceptable_pause
+            std = max(history.std, self.min_std)
+        # Логистическая аппроксимация функции нормального распределения
+        # y ограничен, чтобы exp() не переполнялся и не обнулялся (phi при этом ~0 или ~250)
+        y = min(max((elapsed - mean) / std, -20.0), 20.0)
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def is_available(self, node_id: str, now: Optional[float] = None) -> bool:
+        return self.phi(node_id, now) < self.threshold
+
+    def remove(self, node_id: str) -> None:
+        """Забывает историю узла (узел удалён или признан недоступным)."""
+        with self._lock:
+            self._history.pop(node_id, None)
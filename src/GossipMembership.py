@@ -0,0 +1,352 @@
+import math
+import random
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Any, Dict, List, Optional
+
+from RPCConnectionPool import RpcConnectionPool
+
+
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+
+# Состояние участника -> значение параметра 'active' в досье (suspect досье не меняет)
+DOSSIER_STATUS = {ALIVE: "active", DEAD: "down"}
+MEMBER_STATES = ("active", "down", "Connection refused")
+
+
+class GossipMember:
+    """Состояние одного участника группы с точки зрения локального узла."""
+
+    def __init__(self, node_id: str, host: str, port, state: str, incarnation: int = 0):
+        self.id = node_id
+        self.host = host
+        self.port = port
+        self.state = state
+        self.incarnation = incarnation
+        self.suspect_deadline = None
+
+
+class GossipMembership:
+    """
+    SWIM-style membership and failure detection over the dossier nodes.
+
+    Every protocol period the node probes one member taken from a shuffled
+    round-robin list. A member that does not answer is probed indirectly
+    through indirect_probes other members, and only if none of them reaches
+    it the member becomes suspect. A suspect that does not refute the
+    suspicion within the suspicion timeout is declared dead. Membership
+    updates ride on the probes and their answers, so every node sends a
+    constant number of messages per period regardless of the cluster size.
+    """
+
+    def __init__(self, app_setting: 'AppSetting', setup_nodes, probe_timeout: float, protocol_period: float):
+        """
+        Initialize GossipMembership.
+
+        Args:
+            app_setting (AppSetting): Instance of the AppSetting class.
+            setup_nodes (JSONFileManager): Instance of the JSONFileManager class.
+            probe_timeout (float): Timeout of a direct probe.
+            protocol_period (float): Interval between two probes.
+        """
+        self.app_setting = app_setting
+        self.setup_nodes = setup_nodes
+        self.logger = self.app_setting.get_logger()
+        self.rpc_key = self.app_setting.get_config('RPCInterface', 'key')
+        self.probe_timeout = probe_timeout
+        self.protocol_period = protocol_period
+        self.indirect_probes = int(self.app_setting.get_config('Scheduler', 'gossip_indirect_probes', fallback='3'))
+        self.suspicion_mult = float(self.app_setting.get_config('Scheduler', 'gossip_suspicion_mult', fallback='4'))
+        self.retransmit_mult = int(self.app_setting.get_config('Scheduler', 'gossip_retransmit_mult', fallback='3'))
+        self.max_updates = int(self.app_setting.get_config('Scheduler', 'gossip_max_updates', fallback='16'))
+        pool_max_per_host = int(self.app_setting.get_config('Scheduler', 'pool_max_per_host', fallback='2'))
+        pool_idle_timeout = float(self.app_setting.get_config('Scheduler', 'pool_idle_timeout', fallback='60'))
+        self.probe_pool = RpcConnectionPool(self.logger, probe_timeout, pool_max_per_host, pool_idle_timeout)
+        # Косвенный запрос ждёт, пока посредник сам опросит цель
+        self.indirect_pool = RpcConnectionPool(self.logger, probe_timeout * 2, pool_max_per_host, pool_idle_timeout)
+        self.executor = ThreadPoolExecutor(max_workers=max(self.indirect_probes, 1), thread_name_prefix="gossip")
+        self._lock = threading.Lock()
+        self.members: Dict[str, GossipMember] = {}
+        self.incarnation = 0
+        # node_id -> [обновление, сколько раз уже отправлено]
+        self._broadcasts: Dict[str, List[Any]] = {}
+        self._probe_order: List[str] = []
+
+    def apply_config(self) -> None:
+        """
+        Re-read the key, the protocol period and the gossip multipliers after a config reload.
+
+        Probe pools and the indirect probe executor keep their settings until restart.
+        """
+        try:
+            protocol_period = float(self.app_setting.get_config('Scheduler', 'gossip_interval', fallback='1'))
+            suspicion_mult = float(self.app_setting.get_config('Scheduler', 'gossip_suspicion_mult', fallback='4'))
+            retransmit_mult = int(self.app_setting.get_config('Scheduler', 'gossip_retransmit_mult', fallback='3'))
+            max_updates = int(self.app_setting.get_config('Scheduler', 'gossip_max_updates', fallback='16'))
+        except ValueError as error:
+            self.logger.error(f"[GossipMembership][apply_config]> Invalid gossip settings, keeping current: {error}")
+            return
+        with self._lock:
+            self.rpc_key = self.app_setting.get_config('RPCInterface', 'key')
+            self.protocol_period = protocol_period
+            self.suspicion_mult = suspicion_mult
+            self.retransmit_mult = retransmit_mult
+            self.max_updates = max_updates
+
+    @property
+    def self_id(self) -> str:
+        return self.setup_nodes._self_id()
+
+    def refresh_members(self) -> None:
+        """Сверяет участников с досье: зарегистрированные узлы входят в группу, остальные исключаются."""
+        nodes = {}
+        for node_id in self.setup_nodes.get_node_ids_by_status(*MEMBER_STATES):
+            node = self.setup_nodes._get_node_by_id(None, node_id)
+            if node is not None:
+                nodes[node_id] = node
+        with self._lock:
+            for node_id in self.members.keys() - nodes.keys():
+                del self.members[node_id]
+                self._broadcasts.pop(node_id, None)
+            for node_id, node in nodes.items():
+                member = self.members.get(node_id)
+                if member is None:
+                    state = ALIVE if node.get("active") == "active" else DEAD
+                    self.members[node_id] = GossipMember(node_id, node.get("host"), node.get("port"), state)
+                else:
+                    member.host, member.port = node.get("host"), node.get("port")
+
+    def _retransmit_limit(self) -> int:
+        return self.retransmit_mult * max(1, math.ceil(math.log10(len(self.members) + 2)))
+
+    def _suspicion_timeout(self) -> float:
+        return self.suspicion_mult * max(1.0, math.log10(len(self.members) + 1)) * self.protocol_period
+
+    def _broadcast(self, node_id: str, state: str, incarnation: int) -> None:
+        # Новое обновление об узле вытесняет старое
+        self._broadcasts[node_id] = [[node_id, state, incarnation], 0]
+
+    def _take_updates(self, target_id: Optional[str] = None) -> List[List[Any]]:
+        """Выбирает обновления для отправки, реже отправленные - первыми. Вызывается под _lock."""
+        limit = self._retransmit_limit()
+        selected = sorted(self._broadcasts.values(), key=lambda item: item[1])[:self.max_updates]
+        updates = []
+        for item in selected:
+            updates.append(item[0])
+            item[1] += 1
+            if item[1] >= limit:
+                del self._broadcasts[item[0][0]]
+        # Цель, считающаяся suspect или dead, должна узнать об этом, чтобы опровергнуть
+        member = self.members.get(target_id)
+        if member is not None and member.state != ALIVE and all(update[0] != target_id for update in updates):
+            updates.append([member.id, member.state, member.incarnation])
+        return updates
+
+    def _apply_update(self, node_id: str, state: str, incarnation: int, changes: Dict[str, str]) -> None:
+        """Применяет одно обновление по правилам SWIM. Вызывается под _lock."""
+        if node_id == self.self_id:
+            if state != ALIVE and incarnation >= self.incarnation:
+                # Опровергаем подозрение более новой инкарнацией
+                self.incarnation = incarnation + 1
+                self.logger.info(f"[GossipMembership][refute]> Refuting {state} with incarnation {self.incarnation}")
+                self._broadcast(node_id, ALIVE, self.incarnation)
+            return
+        member = self.members.get(node_id)
+        if member is None:
+            return
+        if state == ALIVE:
+            accept = incarnation > member.incarnation or (member.state == ALIVE and incarnation == member.incarnation)
+        elif state == SUSPECT:
+            accept = (member.state == ALIVE and incarnation >= member.incarnation) or (member.state == SUSPECT and incarnation > member.incarnation)
+        elif state == DEAD:
+            accept = member.state != DEAD and incarnation >= member.incarnation
+        else:
+            return
+        if not accept or (state == member.state and incarnation == member.incarnation):
+            return
+        self._set_state(member, state, incarnation, changes)
+
+    def _set_state(self, member: GossipMember, state: str, incarnation: int, changes: Dict[str, str]) -> None:
+        if state != member.state:
+            self.logger.info(f"[GossipMembership][{state}]> Node {member.id} ({member.host}:{member.port}) is {state}, incarnation {incarnation}")
+        member.state = state
+        member.incarnation = incarnation
+        member.suspect_deadline = time.monotonic() + self._suspicion_timeout() if state == SUSPECT else None
+        self._broadcast(member.id, state, incarnation)
+        if state in DOSSIER_STATUS:
+            changes[member.id] = DOSSIER_STATUS[state]
+
+    def _merge(self, updates, changes: Dict[str, str]) -> None:
+        for update in updates or []:
+            try:
+                node_id, state, incarnation = update
+                self._apply_update(str(node_id), str(state), int(incarnation), changes)
+            except (TypeError, ValueError) as error:
+                self.logger.warning(f"[GossipMembership][merge]> Invalid update {update}: {error}")
+
+    def _apply_dossier_changes(self, changes: Dict[str, str]) -> None:
+        """Переносит подтверждённые переходы alive/dead в досье одной записью."""
+        updates = {}
+        for node_id, status in changes.items():
+            node = self.setup_nodes._get_node_by_id(None, node_id)
+            if node is not None and node.get("active") in MEMBER_STATES and node.get("active") != status:
+                updates[node_id] = {"active": status}
+        if updates:
+            self.setup_nodes.update_nodes_by_id("gossip", updates)
+
+    def handle_ping(self, sender_id: str, updates, incarnation: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Answer a direct probe.
+
+        Args:
+            sender_id (str): ID of the probing node.
+            updates (list): Piggybacked membership updates.
+            incarnation (int, optional): Incarnation the sender reports for itself.
+
+        Returns:
+            dict: Own incarnation and updates to piggyback on the answer.
+        """
+        changes = {}
+        with self._lock:
+            self._merge(updates, changes)
+            # Входящий probe - это alive отправителя с его собственной инкарнацией: подозрение
+            # снимается, только если он уже опроверг его более новой инкарнацией
+            if incarnation is not None:
+                self._apply_update(sender_id, ALIVE, incarnation, changes)
+            answer = {"incarnation": self.incarnation, "updates": self._take_updates(sender_id)}
+        self._apply_dossier_changes(changes)
+        return answer
+
+    def handle_ping_req(self, sender_id: str, target_id: str, host: str, port: int, updates) -> Dict[str, Any]:
+        """
+        Probe target on behalf of sender_id.
+
+        Args:
+            sender_id (str): ID of the node that asks for the probe.
+            target_id (str): ID of the node to probe.
+            host (str): Address of the target as seen by the sender.
+            port (int): Port of the target.
+            updates (list): Piggybacked membership updates.
+
+        Returns:
+            dict: Result of the probe and updates to piggyback on the answer.
+        """
+        changes = {}
+        with self._lock:
+            self._merge(updates, changes)
+        self._apply_dossier_changes(changes)
+        incarnation = self._probe(target_id, host, port)
+        with self._lock:
+            # incarnation - то, что сообщила о себе цель, а не инкарнация посредника
+            return {"ack": incarnation is not None, "incarnation": incarnation or 0, "updates": self._take_updates(sender_id)}
+
+    def _probe(self, target_id: str, host: str, port) -> Optional[int]:
+        """Прямой probe. Возвращает инкарнацию цели или None, если ответа нет."""
+        with self._lock:
+            updates = self._take_updates(target_id)
+        try:
+            answer = self.probe_pool.call(host, port, "gossip_ping", self.rpc_key, self.self_id, updates, self.incarnation)
+        except xmlrpc.client.Fault:
+            # Узел старой версии без gossip_ping: ответ на вызов подтверждает, что он жив
+            return 0
+        except Exception as error:
+            self.logger.debug(f"[GossipMembership][probe][{target_id}]> No answer from {host}:{port}: {error}")
+            return None
+        return self._handle_answer(target_id, answer)
+
+    def _handle_answer(self, target_id: str, answer) -> Optional[int]:
+        data = answer.get("data") if isinstance(answer, dict) else None
+        if not isinstance(data, dict):
+            self.logger.warning(f"[GossipMembership][probe][{target_id}]> Unexpected answer: {answer}")
+            return None
+        changes = {}
+        with self._lock:
+            self._merge(data.get("updates"), changes)
+        self._apply_dossier_changes(changes)
+        if "ack" in data and not data["ack"]:
+            return None
+        return int(data.get("incarnation", 0))
+
+    def _probe_indirect(self, target: GossipMember) -> Optional[int]:
+        with self._lock:
+            helpers = [member for member in self.members.values() if member.state == ALIVE and member.id != target.id]
+            helpers = random.sample(helpers, min(self.indirect_probes, len(helpers)))
+        if not helpers:
+            return None
+
+        def ping_req(helper: GossipMember) -> Optional[int]:
+            with self._lock:
+                updates = self._take_updates(helper.id)
+            try:
+                answer = self.indirect_pool.call(helper.host, helper.port, "gossip_ping_req", self.rpc_key,
+                                                 self.self_id, target.id, str(target.host), int(target.port), updates)
+            except Exception as error:
+                self.logger.debug(f"[GossipMembership][ping_req][{helper.id}]> Indirect probe of {target.id} failed: {error}")
+                return None
+            return self._handle_answer(helper.id, answer)
+
+        futures = [self.executor.submit(ping_req, helper) for helper in helpers]
+        try:
+            for future in as_completed(futures, timeout=self.probe_timeout * 2):
+                incarnation = future.result()
+                if incarnation is not None:
+                    return incarnation
+        except FutureTimeoutError:
+            pass
+        return None
+
+    def _next_target(self) -> Optional[GossipMember]:
+        with self._lock:
+            while self._probe_order:
+                member = self.members.get(self._probe_order.pop())
+                if member is not None:
+                    return member
+            # Новый круг: каждый участник опрашивается ровно один раз за круг
+            self._probe_order = list(self.members)
+            random.shuffle(self._probe_order)
+            return self.members.get(self._probe_order.pop()) if self._probe_order else None
+
+    def _expire_suspects(self, changes: Dict[str, str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for member in self.members.values():
+                if member.state == SUSPECT and member.suspect_deadline <= now:
+                    self._set_state(member, DEAD, member.incarnation, changes)
+
+    def protocol_round(self) -> Optional[GossipMember]:
+        """
+        Run one protocol period: expire suspicions and probe one member.
+
+        Returns:
+            GossipMember: The probed member if it answered, otherwise None.
+        """
+        self.refresh_members()
+        changes = {}
+        self._expire_suspects(changes)
+        target = self._next_target()
+        result = None
+        if target is not None:
+            incarnation = self._probe(target.id, target.host, target.port)
+            if incarnation is None and target.state != DEAD:
+                # Мёртвых участников опрашиваем только напрямую - иначе каждый круг стоил бы k лишних запросов
+                incarnation = self._probe_indirect(target)
+            with self._lock:
+                if incarnation is not None:
+                    # Инкарнацию повышает только сам участник: ack с прежней инкарнацией не снимает
+                    # suspect/dead, цель получила это состояние в probe и опровергнет его сама
+                    self._apply_update(target.id, ALIVE, incarnation, changes)
+                    result = target
+                elif target.state == ALIVE:
+                    self._set_state(target, SUSPECT, target.incarnation, changes)
+        self._apply_dossier_changes(changes)
+        return result
+
+    def close(self) -> None:
+        """Close pooled connections and stop the indirect probe workers."""
+        self.executor.shutdown(wait=False)
+        self.probe_pool.close()
+        self.indirect_pool.close()
@@ -21,6 +21,7 @@ class AppSetting:
         setup_logging: Configures the logger.
         get_config: Retrieves a value from the configuration file.
         get_logger: Retrieves the logger object.
+        reload: Re-reads the configuration file and returns what changed.
     """
 
     def __init__(self, config_file: str = '../config/trinity.ini'):
@@ -30,6 +31,7 @@ class AppSetting:
         Args:
             config_file (str, optional): Path to the configuration file.
         """
+        self.config_file = config_file
         self.config = configparser.ConfigParser()
         self.config.read(config_file)
         self.log_file = self.config.get('Logging', 'log_file')
@@ -51,18 +53,62 @@ class AppSetting:
         self.logger.addHandler(console_handler)
         self.logger.debug("[AppSetting][setup_logging]> Initializing daemon settings...")
 
-    def get_config(self, section: str, option: str) -> str:
+    def get_config(self, section: str, option: str, fallback: str = None) -> str:
         """
         Retrieves a value from the configuration file.
 
         Args:
             section (str): The section in the configuration file.
             option (str): The option in the specified section.
+            fallback (str, optional): Value returned when the option is missing.
 
         Returns:
             str: The value associated with the specified option.
         """
-        return self.config.get(section, option)
+        if fallback is None:
+            return self.config.get(section, option)
+        return self.config.get(section, option, fallback=fallback)
+
+    def reload(self):
+        """
+        Re-reads the configuration file and swaps it in.
+
+        The new file is parsed completely before it replaces the current
+        configuration, so a broken file leaves the running one in place.
+        log_level applies immediately, log_file only after a restart.
+
+        Returns:
+            dict: Section -> set of added, removed or changed options (an
+            added or removed section lists all its options), or None if
+            the file could not be read.
+        """
+        config = configparser.ConfigParser()
+        try:
+            if not config.read(self.config_file):
+                self.logger.error(f"[AppSetting][reload]> Cannot read {self.config_file}, keeping current configuration")
+                return None
+        except configparser.Error as e:
+            self.logger.error(f"[AppSetting][reload]> Cannot parse {self.config_file}, keeping current configuration: {e}")
+            return None
+        changes = {}
+        for section in set(self.config.sections()) | set(config.sections()):
+            old = dict(self.config[section]) if self.config.has_section(section) else {}
+            new = dict(config[section]) if config.has_section(section) else {}
+            changed = {option for option in old.keys() | new.keys() if old.get(option) != new.get(option)}
+            if changed or self.config.has_section(section) != config.has_section(section):
+                changes[section] = changed
+        self.config = config
+        log_level = self.config.get('Logging', 'log_level', fallback=self.log_level)
+        if log_level != self.log_level:
+            try:
+                self.logger.setLevel(log_level)
+                self.log_level = log_level
+            except ValueError as e:
+                self.logger.error(f"[AppSetting][reload]> Invalid log_level: {e}")
+        if self.config.get('Logging', 'log_file', fallback=self.log_file) != self.log_file:
+            self.logger.warning("[AppSetting][reload]> log_file change takes effect after restart")
+        self.logger.info(f"[AppSetting][reload]> Configuration reloaded, changed sections: {', '.join(sorted(changes)) or 'none'}")
+        return changes
 
     def get_logger(self) -> logging.Logger:
         """
@@ -80,6 +126,7 @@ class InitCluster:
     Methods:
         __init__: Initializes the InitCluster object.
         init_cluster_worker: Starts the cluster initialization process.
+        reload_config: Re-reads the configuration and applies it to the running services.
     """
 
     def __init__(self):
@@ -90,6 +137,20 @@ class InitCluster:
         self.logger = self.app_setting.get_logger()
         self.json_node_config = self.app_setting.get_config('Nodes', 'json_file')
         self.setup_nodes = JSONFileManager(self.json_node_config, self.app_setting)
+        self.core_proxy = None
+        self.rpc_interface = None
+
+    def reload_config(self) -> None:
+        """
+        Re-reads the configuration and applies it to the running services (SIGHUP).
+        """
+        changes = self.app_setting.reload()
+        if changes is None:
+            return
+        if self.rpc_interface is not None:
+            self.rpc_interface.reload(changes)
+        if self.core_proxy is not None:
+            self.core_proxy.reload(changes)
 
     def init_cluster_worker(self) -> None:
         """
@@ -98,17 +159,18 @@ class InitCluster:
         self.logger.info("[InitCluster]> Initializing daemon...")
 
         # Создание и регистрация обработчика сигналов
-        signal_handler = SignalHandler(self.logger)
+        signal_handler = SignalHandler(self.logger, self.reload_config)
         signal_handler.register_signal_handlers()
         
         self.rpc_host = str(self.app_setting.get_config('RPCInterface', 'rpc_host'))
         self.rpc_port = int(self.app_setting.get_config('RPCInterface', 'rpc_port'))
-        self.rpc_interface = CoreRpc(self.app_setting, self.setup_nodes)
+        # Прокси создаётся заранее, чтобы RPC интерфейс отдавал его счётчики
+        self.core_proxy = CoreRroxy(self.app_setting, self.setup_nodes)
+        self.rpc_interface = CoreRpc(self.app_setting, self.setup_nodes, self.core_proxy)
         rpc_interface_thread = threading.Thread(target=self.rpc_interface.run)
         rpc_interface_thread.start()
         rpc_interface_thread.join()
 
-        self.core_proxy = CoreRroxy(self.app_setting)
         core_proxy_thread = threading.Thread(target=self.core_proxy.main)
         core_proxy_thread.start()
         core_proxy_thread.join()
@@ -0,0 +1,181 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import cpuinfo
+import psutil
+
+from RpcCodec import FrozenDict
+
+
+# Факты, неизменные до перезагрузки: собираются один раз за загрузку и кэшируются на диске
+STATIC_FACTS = ("cpu",)
+# Факты, которые обновляются по расписанию или по запросу
+VOLATILE_FACTS = ("hostname", "memory", "services")
+
+
+class NodeInventory:
+    """
+    Inventory of the self node.
+
+    Collectors run in parallel. Static facts (cpuinfo, which spawns a
+    subprocess and takes seconds) are collected once per boot and cached
+    on disk keyed by the kernel boot id; volatile facts are refreshed on
+    a schedule or on demand and written into the dossier's self record
+    only when they changed.
+    """
+
+    def __init__(self, app_setting: 'AppSetting', setup_nodes=None, services=None):
+        """
+        Initialize NodeInventory.
+
+        Args:
+            app_setting (AppSetting): Instance of the AppSetting class.
+            setup_nodes (JSONFileManager, optional): Dossier to keep the self record current in.
+            services (ServiceStateTracker, optional): Live unit table, spares the systemctl call.
+        """
+        self.app_setting = app_setting
+        self.logger = self.app_setting.get_logger()
+        self.setup_nodes = setup_nodes
+        self.services = services
+        json_file = self.app_setting.get_config('Nodes', 'json_file')
+        self.cache_file = self.app_setting.get_config('Nodes', 'inventory_cache', fallback=f"{json_file}.inventory")
+        self.collectors = {
+            "cpu": self._get_cpu_info,
+            "hostname": platform.node,
+            "memory": self._get_memory_info,
+            "services": self._get_services,
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def boot_id() -> str:
+        """Идентификатор текущей загрузки ядра (меняется при каждой перезагрузке)."""
+        try:
+            with open('/proc/sys/kernel/random/boot_id', 'r') as boot_file:
+                return boot_file.read().strip()
+        except OSError:
+            return f"boot-{int(psutil.boot_time())}"
+
+    def _get_services(self):
+        if self.services is not None:
+            unit_names = self.services.unit_names()
+            if unit_names is not None:
+                return unit_names
+        try:
+            services_output = subprocess.check_output(['systemctl', '--no-page', '--no-legend', '--plain', '--all', '--full', 'list-units']).decode('utf-8')
+            services = []
+            for line in services_output.splitlines():
+                service_name = line.split()[0]
+                services.append(service_name)
+            return services
+        except (subprocess.CalledProcessError, OSError) as error:
+            self.logger.error(f"Failed to get systemd services: {error}")
+            return []
+
+    def _get_cpu_info(self):
+        return cpuinfo.get_cpu_info()
+
+    def _get_memory_info(self):
+        return {
+            "total_physical_memory": psutil.virtual_memory().total,
+            "total_swap_memory": psutil.swap_memory().total,
+        }
+
+    def collect(self, names: Iterable[str]) -> Dict[str, Any]:
+        """
+        Run the given collectors in parallel.
+
+        Args:
+            names (iterable): Names of the collectors.
+
+        Returns:
+            dict: Fact name -> value for the collectors that succeeded.
+        """
+        names = list(names)
+        facts = {}
+        with ThreadPoolExecutor(max_workers=max(len(names), 1), thread_name_prefix="inventory") as executor:
+            futures = {name: executor.submit(self.collectors[name]) for name in names}
+            for name, future in futures.items():
+                try:
+                    facts[name] = future.result()
+                except Exception as error:
+                    self.logger.error(f"[NodeInventory][collect]> Collector '{name}' failed: {error}")
+        return self._freeze(facts)
+
+    @staticmethod
+    def _freeze(facts: Dict[str, Any]) -> Dict[str, Any]:
+        """Факты-словари заменяются целиком и не меняются на месте: кодек кэширует их закодированную форму."""
+        return {name: FrozenDict(value) if isinstance(value, dict) else value for name, value in facts.items()}
+
+    def cached_static(self) -> Optional[Dict[str, Any]]:
+        """Статические факты из кэша, если он сделан в текущую загрузку, иначе None."""
+        try:
+            with open(self.cache_file, 'r') as cache:
+                data = json.load(cache)
+        except (OSError, ValueError):
+            return None
+        if data.get("boot_id") != self.boot_id() or not all(name in data.get("facts", {}) for name in STATIC_FACTS):
+            return None
+        return self._freeze(data["facts"])
+
+    def _store_static(self, facts: Dict[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".inventory.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump({"boot_id": self.boot_id(), "facts": facts}, tmp_file)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as error:
+            self.logger.warning(f"[NodeInventory][_store_static]> Cannot write inventory cache {self.cache_file}: {error}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def initial_facts(self) -> Dict[str, Any]:
+        """
+        Facts for a new self record without waiting for cpuinfo.
+
+        Static facts come from the boot cache; without a valid cache they
+        are left empty and filled in by the first refresh().
+        """
+        facts = self.collect(VOLATILE_FACTS)
+        facts.update(self.cached_static() or {name: {} for name in STATIC_FACTS})
+        return facts
+
+    def refresh(self, event_id: str = "inventory", names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Collect facts and write the changed ones into the dossier's self record.
+
+        Args:
+            event_id (str): Event ID for logging.
+            names (iterable, optional): Collectors to run, by default the volatile ones
+                plus the static ones when the boot cache is missing or stale.
+
+        Returns:
+            dict: Collected facts.
+        """
+        # Параллельный refresh по расписанию и по запросу только повторил бы сбор
+        with self._lock:
+            static = self.cached_static()
+            if names is None:
+                names = list(VOLATILE_FACTS) + ([] if static is not None else list(STATIC_FACTS))
+            facts = self.collect(names)
+            collected_static = {name: facts[name] for name in STATIC_FACTS if name in facts}
+            if collected_static:
+                self._store_static(dict(static or {}, **collected_static))
+            elif static is not None:
+                facts.update(static)
+            if self.setup_nodes is not None:
+                self.setup_nodes._load_config()
+                self_id = self.setup_nodes._self_id()
+                if self_id:
+                    self.setup_nodes.update_node_by_id(event_id, self_id, group="self", updated_values=facts)
+            self.logger.debug(f"[NodeInventory][refresh][{event_id}]> Collected {sorted(facts)}")
+            return facts
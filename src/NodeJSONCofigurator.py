@@ -1,10 +1,15 @@
-import json
+import time
 import logging
 import inspect
 import threading
-from typing import Tuple, List, Any, Dict
+from collections import deque
+from typing import Tuple, List, Any, Dict, Callable
+
+import shortuuid
 
 from SelfParser import SelfController
+from DossierStorage import SnapshotStorage, WriteAheadLogStorage
+from RpcCodec import FrozenDict
 
 
 
@@ -21,72 +26,244 @@ class NodeBuilder:
 
 
 
+class DossierIndex:
+    """
+    Вторичные индексы по группе "nodes" досье.
+
+    Хранит ссылки на те же словари, что лежат в config_data["nodes"], поэтому
+    изменение узла через индекс сразу видно в досье.
+    """
+    def __init__(self):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_addr: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.by_status: Dict[str, set] = {}
+
+    @staticmethod
+    def _addr_key(host, port) -> Tuple[str, str]:
+        # Порт в досье встречается и числом, и строкой (старые версии приводили числа к строкам)
+        return str(host), str(port)
+
+    def rebuild(self, nodes: List[Dict[str, Any]]) -> None:
+        self.by_id.clear()
+        self.by_addr.clear()
+        self.by_status.clear()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Dict[str, Any]) -> None:
+        node_id = node.get("id")
+        self.by_id[node_id] = node
+        if "host" in node and "port" in node:
+            self.by_addr[self._addr_key(node["host"], node["port"])] = node
+        self.by_status.setdefault(node.get("active"), set()).add(node_id)
+
+    def discard(self, node: Dict[str, Any]) -> None:
+        node_id = node.get("id")
+        if self.by_id.get(node_id) is node:
+            del self.by_id[node_id]
+        if "host" in node and "port" in node:
+            addr_key = self._addr_key(node["host"], node["port"])
+            if self.by_addr.get(addr_key) is node:
+                del self.by_addr[addr_key]
+        status_ids = self.by_status.get(node.get("active"))
+        if status_ids is not None:
+            status_ids.discard(node_id)
+            if not status_ids:
+                del self.by_status[node.get("active")]
+
+
+# Поля записи узла, которые отражают взгляд конкретного узла и не реплицируются
+SYNC_LOCAL_FIELDS = ("active", "wire_port")
+
+
 class JSONFileManager:
     def __init__(self, file_path: str, app_setting):
         self.file_path = file_path
         self.app_setting = app_setting
         self.logger = self.app_setting.get_logger()
+        # Резидентная копия досье, запись на диск выполняет self.storage
+        self._lock = threading.RLock()
+        self._config_data = None
+        self._index = DossierIndex()
+        fsync = self.app_setting.config.getboolean('Nodes', 'fsync', fallback=False)
+        if self.app_setting.get_config('Nodes', 'storage_mode', fallback='snapshot') == "wal":
+            self.storage = WriteAheadLogStorage(
+                file_path,
+                self.logger,
+                self._lock,
+                fsync=fsync,
+                compact_records=int(self.app_setting.get_config('Nodes', 'wal_compact_records', fallback='1000')),
+            )
+        else:
+            self.storage = SnapshotStorage(
+                file_path,
+                self.logger,
+                self._lock,
+                fsync=fsync,
+                write_interval=float(self.app_setting.get_config('Nodes', 'write_interval', fallback='0')),
+            )
+        # Лента смен статуса узлов: подписчики и последние изменения с порядковыми номерами
+        self._subscribers: List[Callable] = []
+        self._change_seq = 0
+        self.changes = deque(maxlen=int(self.app_setting.get_config('Nodes', 'change_feed_size', fallback='1000')))
+        # Синхронизация: часы Лэмпорта для ревизий записей и локальная последовательность
+        # изменений (node_id -> seq), по которой пиры запрашивают только дельту
+        self._clock = 0
+        self._sync_epoch = ""
+        self._sync_seq = 0
+        self._seq_by_id: Dict[str, int] = {}
 
     def _load_config(self) -> Dict[str, Any]:
-        try:
-            with open(self.file_path, 'r') as config_file:
-                return json.load(config_file)
-        except FileNotFoundError:
-            self.logger.warning(f"[JSONFileManager][_load_config]> '{self.app_setting.get_config('Nodes', 'json_file')}' doesnt not exist! Create new file!")
-            self.self_controller = SelfController(self.app_setting)
-            self.self_controller = self.self_controller.init_json_file()
-        else:
+        # Живое досье: только для методов класса и только под self._lock,
+        # наружу отдаются копии записей (_copy_records)
+        with self._lock:
+            if self._config_data is not None and not self.storage.changed_on_disk():
+                return self._config_data
+            if not self.storage.exists():
+                self.logger.warning(f"[JSONFileManager][_load_config]> '{self.app_setting.get_config('Nodes', 'json_file')}' doesnt not exist! Create new file!")
+                self.self_controller = SelfController(self.app_setting)
+                self.self_controller.init_json_file()
+            self._config_data = self.storage.load()
+            self._index.rebuild(self._config_data.get("nodes", []))
+            self._rebuild_sync_state()
             self.logger.debug("[JSONFileManager][_load_config]> Load config dossier successfully!")
+            return self._config_data
+
+
+    def _write_config(self, data: dict[str, Any], record: Dict[str, Any] = None) -> None:
+        """
+        Сохраняет досье.
+
+        Args:
+            data (dict): Досье целиком.
+            record (dict, optional): Описание изменения для журнала (WAL), без него пишется снимок.
+        """
+        with self._lock:
+            if data is not self._config_data:
+                self._index.rebuild(data.get("nodes", []))
+                record = None
+                self._config_data = data
+                self._rebuild_sync_state()
+            self.storage.save(data, record)
+
+    def flush(self) -> None:
+        """Записывает на диск изменения, ожидающие в интервале объединения записей."""
+        self.storage.flush()
 
+    def subscribe(self, callback: Callable) -> None:
+        """
+        Подписка на смену статуса узлов.
 
-    def _write_config(self, data: dict[str, Any]) -> None:
-        with open(self.file_path, 'w') as config_file:
-            json.dump(data, config_file, indent=4)
+        Args:
+            callback: Вызывается как callback(node_id, old, new, timestamp). old равен None
+                для добавленного узла, new - для удалённого.
+        """
+        self._subscribers.append(callback)
 
+    def unsubscribe(self, callback: Callable) -> None:
+        self._subscribers.remove(callback)
+
+    def changes_since(self, seq: int) -> List[Tuple[int, str, Any, Any, float]]:
+        """Возвращает изменения ленты с порядковым номером больше seq."""
+        with self._lock:
+            return [change for change in self.changes if change[0] > seq]
+
+    def _record_change(self, transitions: list, node_id: str, old, new) -> None:
+        # Вызывается под self._lock, подписчики уведомляются после его освобождения
+        if old != new:
+            self._change_seq += 1
+            change = (self._change_seq, node_id, old, new, time.time())
+            self.changes.append(change)
+            transitions.append(change)
+
+    def _notify(self, transitions: list) -> None:
+        for _, node_id, old, new, timestamp in transitions:
+            for callback in list(self._subscribers):
+                try:
+                    callback(node_id, old, new, timestamp)
+                except Exception as e:
+                    self.logger.error(f"[JSONFileManager][_notify]> Subscriber {callback} failed on {node_id}: {e}")
+
+    @staticmethod
+    def _changed_values(node: Dict[str, Any], updated_values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Оставляет только значения, которые действительно меняют узел.
+
+        Замороженный факт (FrozenDict) заменяет равный ему обычный словарь,
+        загруженный с диска, иначе кэш фрагментов RpcCodec его не узнает.
+        """
+        return {key: value for key, value in updated_values.items()
+                if key not in node or node[key] != value or type(value) is FrozenDict and type(node[key]) is not FrozenDict}
+
+
+    @staticmethod
+    def _copy_records(records, keys=None) -> List[Dict[str, Any]]:
+        """
+        Копии записей для отдачи наружу, вызывается под self._lock.
+
+        Копия поверхностная: вложенные значения (инвентаризация) не меняются
+        на месте, а заменяются целиком, поэтому их можно разделять, и кэш
+        фрагментов RpcCodec по-прежнему их узнаёт.
+        """
+        if keys is None:
+            return [dict(record) for record in records]
+        return [{key: record[key] for key in keys if key in record} for record in records]
 
     def _get_node_by_id(self, event_id, node_id: str) -> Dict[str, Any]:
-        config_data = self._load_config()
-        nodes = config_data.get("nodes", [])
-        return next((node for node in nodes if node.get("id") == node_id), None)
+        with self._lock:
+            self._load_config()
+            node = self._index.by_id.get(node_id)
+            return dict(node) if node is not None else None
+
+    def get_node_by_addr(self, host: str, port) -> Dict[str, Any]:
+        """Возвращает копию узла по паре (host, port) или None."""
+        with self._lock:
+            self._load_config()
+            node = self._index.by_addr.get(DossierIndex._addr_key(host, port))
+            return dict(node) if node is not None else None
+
+    def get_node_ids_by_status(self, *statuses: str) -> set:
+        """Возвращает множество id узлов, чей параметр 'active' входит в statuses."""
+        with self._lock:
+            self._load_config()
+            result = set()
+            for status in statuses:
+                result |= self._index.by_status.get(status, set())
+            return result
+
+    def load_json_nodes_by_status(self, *statuses: str) -> Tuple[int, List[NodeBuilder]]:
+        try:
+            with self._lock:
+                node_ids = self.get_node_ids_by_status(*statuses)
+                result = [NodeBuilder(**self._index.by_id[node_id]) for node_id in node_ids]
+            return 0, result
+        except Exception as e:
+            error_text = f"[JSONFileManager][load_json_nodes_by_status]> Error loading nodes with status {statuses}: {e}"
+            return 1, error_text
 
     def just_load_json(self, event_id, data_type="nodes", format_data="partial") -> Dict[int, str]:
         try:
-            node_partial_data = {}
-            config = self._load_config().get(data_type, [])
-            self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> INPUT: data_type - {data_type}, format_data - {format_data}, config - {config}")
-            result = []
-            if format_data == "partial":
-                for node_data in config:
-                    
-                    for key in ["id", "host", "port", "type", "active", "route"]:
-                        if key in node_data:
-                            node_partial_data[key] = node_data[key]
-                    result.append(node_partial_data)
-
-                self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> OUTPUT: node_partial_data - {node_partial_data}")
-                return 0, result
-            elif format_data == "full":
-                self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> OUTPUT: config - {config}")
-                return 0, config
-            elif isinstance(format_data, list):
-                for node_data in config:
-                    for key in list(format_data):
-                        if key in node_data:
-                            node_partial_data[key] = node_data[key]
-                    result.append(node_partial_data)
-                self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> OUTPUT: node_custom_data - {node_partial_data}")
-                return 0, result
-            else:
-                return 1, f"[JSONFileManager][just_load_json][{event_id}]> Invalid format_data parameter"
+            self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> INPUT: data_type - {data_type}, format_data - {format_data}")
+            with self._lock:
+                config = self._load_config().get(data_type, [])
+                if format_data == "partial":
+                    result = self._copy_records(config, ["id", "host", "port", "type", "active", "route"])
+                elif format_data == "full":
+                    result = self._copy_records(config)
+                elif isinstance(format_data, list):
+                    result = self._copy_records(config, list(format_data))
+                else:
+                    return 1, f"[JSONFileManager][just_load_json][{event_id}]> Invalid format_data parameter"
+            self.logger.debug(f"[JSONFileManager][just_load_json][{event_id}]> OUTPUT: {result}")
+            return 0, result
         except Exception as e:
             error_text = f"[JSONFileManager][just_load_json][{event_id}]> Error with key '{data_type}' '{format_data}': {e}"
             return 1, error_text
 
     def load_json_nodes_config(self, data_type) -> Tuple[int, List[NodeBuilder]]:
         try:
-            config_data = self._load_config()
-            
-            result = NodeBuilder._build_data_node(config_data)
+            with self._lock:
+                result = NodeBuilder._build_data_node(self._load_config())
             return 0, result
         except Exception as e:
             error_text = f"[JSONFileManager][load_json_nodes_config]> Error loading configuration: {e}"
@@ -94,10 +271,17 @@ class JSONFileManager:
 
 
     def add_node_to_config(self, host_info: dict[str, Any]):
+        """
+        Добавляет узел в досье. Повторная регистрация уже известного узла
+        обновляет его запись, а не добавляет вторую с тем же id.
+        """
         try:
-            config_data = self._load_config()
-            config_data.setdefault("nodes", []).append(host_info)
-            self._write_config(config_data)
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                host_info = self._upsert_node(config_data, host_info.get("id"), host_info, transitions)
+                self._write_config(config_data, {"op": "add", "group": "nodes", "node": host_info})
+            self._notify(transitions)
             return 0
         except Exception as e:
             logging.error(f"Error adding node to configuration: {e}")
@@ -106,10 +290,19 @@ class JSONFileManager:
 
     def remove_node_from_config(self, node_id: str):
         try:
-            config_data = self._load_config()
-            nodes = config_data.get("nodes", [])
-            nodes[:] = [node for node in nodes if node.get("id") != node_id]
-            self._write_config(config_data)
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                node = self._index.by_id.get(node_id)
+                if node is None:
+                    self.logger.debug(f"[JSONFileManager][remove_node_from_config]> Node id:{node_id} not found, nothing to remove.")
+                    return 0
+                config_data["nodes"].remove(node)
+                self._index.discard(node)
+                tombstone = self._add_tombstone(node_id)
+                self._write_config(config_data, {"op": "remove", "group": "nodes", "id": node_id, "tombstone": tombstone})
+                self._record_change(transitions, node_id, node.get("active"), None)
+            self._notify(transitions)
             logging.info(f"Node with id {node_id} removed from configuration successfully.")
             return 0
         except Exception as e:
@@ -117,6 +310,55 @@ class JSONFileManager:
             return 1
 
 
+    def _upsert_node(self, config_data: Dict[str, Any], node_id: str, node_info: Dict[str, Any], transitions: list) -> Dict[str, Any]:
+        """
+        Обновляет запись с id из node_info или добавляет её, вызывается под self._lock.
+
+        Returns:
+            dict: Запись узла в досье с новой ревизией.
+        """
+        new_id = node_info.get("id")
+        existing = self._index.by_id.get(new_id)
+        if existing is not None:
+            self._index.discard(existing)
+            old_status = existing.get("active")
+            existing.update(node_info)
+            self._index.add(existing)
+            self._record_change(transitions, new_id, old_status, existing.get("active"))
+            node_info = existing
+        else:
+            config_data.setdefault("nodes", []).append(node_info)
+            self._index.add(node_info)
+            self._record_change(transitions, new_id, None, node_info.get("active"))
+        self._bump_revision(node_info)
+        return node_info
+
+    def replace_node(self, event_id: str, node_id: str, node_info: Dict[str, Any]):
+        """
+        Заменяет узел node_id записью node_info (например, после ACK регистрации).
+        Если узел с id из node_info уже есть в досье, он обновляется, а не дублируется.
+        """
+        try:
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                tombstone = None
+                old_node = self._index.by_id.get(node_id)
+                if old_node is not None and node_id != node_info.get("id"):
+                    config_data["nodes"].remove(old_node)
+                    self._index.discard(old_node)
+                    tombstone = self._add_tombstone(node_id)
+                    self._record_change(transitions, node_id, old_node.get("active"), None)
+                node_info = self._upsert_node(config_data, node_id, node_info, transitions)
+                self._write_config(config_data, {"op": "replace", "group": "nodes", "id": node_id, "node": node_info, "tombstone": tombstone})
+            self._notify(transitions)
+            self.logger.info(f"[JSONFileManager][replace_node][{event_id}]> Node id:{node_id} replaced by id:{node_info.get('id')}.")
+            return 0
+        except Exception as e:
+            self.logger.error(f"[JSONFileManager][replace_node][{event_id}]> Error replacing node {node_id}: {e}")
+            return 1
+
+
     def find_json_dossier(self,event_id: str, group: str = "nodes", format_data="partial", node_id=None):
         self.logger.debug(f"[JSONFileManager][find_json_dossier][{event_id}] -> group - {group}, format_data - {format_data}, node_id - {node_id}")
         try:
@@ -132,16 +374,237 @@ class JSONFileManager:
     def update_node_by_id(self, event_id: str, node_id: str, group="nodes", updated_values: Dict = {}):
         self.logger.debug(f"[JSONFileManager][update_node_by_id]> INPUT event_id:{event_id}, node_id:{node_id}, group:{group}, updated_values:{updated_values} type_val:{type(updated_values)}")
         try:
-            config_data = self._load_config()
-            nodes = config_data.get(group, [])
-            for i, node in enumerate(nodes):
-                if node.get("id") == node_id:
-                    # Проверяем, что updated_values содержит обновления
-                    if updated_values:
-                        nodes[i].update(updated_values)
-                    break
-            self._write_config(config_data)
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                if group == "nodes":
+                    node = self._index.by_id.get(node_id)
+                else:
+                    node = next((node for node in config_data.get(group, []) if node.get("id") == node_id), None)
+                if node is None:
+                    self.logger.warning(f"[JSONFileManager][update_node_by_id][{event_id}]> Node id:{node_id} not found in group '{group}'.")
+                    return 0, ""
+                # Проверяем, что updated_values содержит обновления
+                changed = self._changed_values(node, updated_values or {})
+                if not changed:
+                    self.logger.debug(f"[JSONFileManager][update_node_by_id][{event_id}]> Node id:{node_id} unchanged, skip write.")
+                    return 0, ""
+                old_status = node.get("active")
+                if group == "nodes":
+                    self._index.discard(node)
+                    node.update(changed)
+                    self._index.add(node)
+                    self._record_change(transitions, node_id, old_status, node.get("active"))
+                    if any(key not in SYNC_LOCAL_FIELDS for key in changed):
+                        changed.update(self._bump_revision(node))
+                else:
+                    node.update(changed)
+                self._write_config(config_data, {"op": "update", "group": group, "id": node_id, "values": changed})
+            self._notify(transitions)
             self.logger.info(f"[JSONFileManager][update_node_by_id][{event_id}]> Node id:{node_id} updated successfully.")
             return 0, ""
         except Exception as e:
             self.logger.error(f"[JSONFileManager][update_node_by_id][{event_id}]> Error updating {node_id} in group '{group}': {e}")
+            return 1, str(e)
+
+
+    def update_nodes_by_id(self, event_id: str, updates: Dict[str, Dict[str, Any]]):
+        """
+        Пакетное обновление узлов группы "nodes" с одной записью досье на диск.
+
+        Args:
+            event_id (str): Идентификатор события.
+            updates (dict): Словарь node_id -> обновляемые значения.
+        """
+        self.logger.debug(f"[JSONFileManager][update_nodes_by_id][{event_id}]> INPUT updates:{updates}")
+        try:
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                applied = {}
+                for node_id, updated_values in updates.items():
+                    node = self._index.by_id.get(node_id)
+                    if node is None or not updated_values:
+                        continue
+                    changed = self._changed_values(node, updated_values)
+                    if not changed:
+                        continue
+                    old_status = node.get("active")
+                    self._index.discard(node)
+                    node.update(changed)
+                    self._index.add(node)
+                    self._record_change(transitions, node_id, old_status, node.get("active"))
+                    if any(key not in SYNC_LOCAL_FIELDS for key in changed):
+                        changed.update(self._bump_revision(node))
+                    applied[node_id] = changed
+                if not applied:
+                    return 0, ""
+                self._write_config(config_data, {"op": "update_many", "group": "nodes", "updates": applied})
+            self._notify(transitions)
+            self.logger.info(f"[JSONFileManager][update_nodes_by_id][{event_id}]> {len(applied)} nodes updated successfully.")
+            return 0, ""
+        except Exception as e:
+            self.logger.error(f"[JSONFileManager][update_nodes_by_id][{event_id}]> Error updating nodes: {e}")
+            return 1, str(e)
+
+
+    def _self_id(self) -> str:
+        self_nodes = self._config_data.get("self", []) if self._config_data else []
+        return self_nodes[0].get("id", "") if self_nodes else ""
+
+    @staticmethod
+    def _version(record) -> Tuple[int, str]:
+        """Версия записи для last-writer-wins: (ревизия, id узла-автора)."""
+        return int(record.get("rev", 0)), str(record.get("origin", ""))
+
+    def _rebuild_sync_state(self) -> None:
+        # Последовательность изменений живёт только в памяти: после перечитывания досье
+        # меняется эпоха, и пиры запрашивают полную сводку заново
+        self._sync_epoch = shortuuid.uuid()
+        self._sync_seq = 1
+        revisions = [int(node.get("rev", 0)) for node in self._config_data.get("nodes", [])]
+        revisions += [int(version[0]) for version in self._config_data.get("tombstones", {}).values()]
+        self._clock = max(revisions, default=0)
+        self._seq_by_id = {node_id: 1 for node_id in self._index.by_id}
+        self._seq_by_id.update({node_id: 1 for node_id in self._config_data.get("tombstones", {})})
+
+    def _next_seq(self, node_id: str) -> None:
+        self._sync_seq += 1
+        self._seq_by_id[node_id] = self._sync_seq
+
+    def _bump_revision(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """Присваивает записи узла новую ревизию (под self._lock) и возвращает её поля."""
+        self._clock += 1
+        stamp = {"rev": self._clock, "origin": self._self_id()}
+        node.update(stamp)
+        self._config_data.get("tombstones", {}).pop(node.get("id"), None)
+        self._next_seq(node.get("id"))
+        return stamp
+
+    def _add_tombstone(self, node_id: str) -> List[Any]:
+        self._clock += 1
+        tombstone = [self._clock, self._self_id()]
+        self._config_data.setdefault("tombstones", {})[node_id] = tombstone
+        self._next_seq(node_id)
+        return tombstone
+
+
+    def sync_summary(self, epoch: str = "", since: int = 0) -> Dict[str, Any]:
+        """
+        Сводка ревизий записей, изменённых после since.
+
+        Args:
+            epoch (str): Эпоха, полученная в прошлой сводке. При несовпадении отдаётся полная сводка.
+            since (int): Последний seq из прошлой сводки.
+
+        Returns:
+            dict: epoch, seq, records (id -> [rev, origin]) и tombstones (id -> [rev, origin]).
+        """
+        with self._lock:
+            self._load_config()
+            if epoch != self._sync_epoch:
+                since = 0
+            tombstones = self._config_data.get("tombstones", {})
+            result = {"epoch": self._sync_epoch, "seq": self._sync_seq, "self_id": self._self_id(), "records": {}, "tombstones": {}}
+            for node_id, seq in self._seq_by_id.items():
+                if seq <= since:
+                    continue
+                node = self._index.by_id.get(node_id)
+                if node is not None:
+                    result["records"][node_id] = list(self._version(node))
+                elif node_id in tombstones:
+                    result["tombstones"][node_id] = list(tombstones[node_id])
+            return result
+
+    def sync_missing(self, records: Dict[str, List[Any]]) -> List[str]:
+        """Возвращает id записей, у которых версия пира новее локальной."""
+        with self._lock:
+            self._load_config()
+            self_id = self._self_id()
+            tombstones = self._config_data.get("tombstones", {})
+            missing = []
+            for node_id, version in records.items():
+                if node_id == self_id:
+                    continue
+                remote = (int(version[0]), str(version[1]))
+                node = self._index.by_id.get(node_id)
+                if node is not None and self._version(node) >= remote:
+                    continue
+                if node_id in tombstones and self._version({"rev": tombstones[node_id][0], "origin": tombstones[node_id][1]}) >= remote:
+                    continue
+                missing.append(node_id)
+            return missing
+
+    def sync_records(self, node_ids: List[str]) -> List[Dict[str, Any]]:
+        """Возвращает записи узлов для отправки пиру."""
+        with self._lock:
+            self._load_config()
+            return self._copy_records(self._index.by_id[node_id] for node_id in node_ids if node_id in self._index.by_id)
+
+    def merge_records(self, event_id: str, records: List[Dict[str, Any]], tombstones: Dict[str, List[Any]]):
+        """
+        Применяет записи и надгробия пира по правилу last-writer-wins.
+
+        Локальные поля (SYNC_LOCAL_FIELDS) не перезаписываются, новые узлы
+        получают статус "unknown" и проходят регистрацию обычным порядком.
+        """
+        try:
+            transitions = []
+            with self._lock:
+                config_data = self._load_config()
+                self_id = self._self_id()
+                nodes = config_data.setdefault("nodes", [])
+                local_tombstones = config_data.setdefault("tombstones", {})
+                journal = []
+                for record in records:
+                    node_id = record.get("id")
+                    if not node_id or node_id == self_id:
+                        continue
+                    remote = self._version(record)
+                    node = self._index.by_id.get(node_id)
+                    if node is not None and self._version(node) >= remote:
+                        continue
+                    if node_id in local_tombstones and self._version({"rev": local_tombstones[node_id][0], "origin": local_tombstones[node_id][1]}) >= remote:
+                        continue
+                    self._clock = max(self._clock, remote[0])
+                    replicated = {key: value for key, value in record.items() if key not in SYNC_LOCAL_FIELDS}
+                    replicated["rev"] = remote[0]
+                    local_tombstones.pop(node_id, None)
+                    if node is not None:
+                        self._index.discard(node)
+                        node.update(replicated)
+                        self._index.add(node)
+                        journal.append({"op": "update", "group": "nodes", "id": node_id, "values": replicated})
+                    else:
+                        node = dict(replicated, active="unknown")
+                        nodes.append(node)
+                        self._index.add(node)
+                        self._record_change(transitions, node_id, None, "unknown")
+                        journal.append({"op": "add", "group": "nodes", "node": node})
+                    self._next_seq(node_id)
+                for node_id, version in tombstones.items():
+                    remote = (int(version[0]), str(version[1]))
+                    if node_id == self_id:
+                        continue
+                    node = self._index.by_id.get(node_id)
+                    if node is not None and self._version(node) >= remote:
+                        continue
+                    if node_id in local_tombstones and self._version({"rev": local_tombstones[node_id][0], "origin": local_tombstones[node_id][1]}) >= remote:
+                        continue
+                    self._clock = max(self._clock, remote[0])
+                    if node is not None:
+                        nodes.remove(node)
+                        self._index.discard(node)
+                        self._record_change(transitions, node_id, node.get("active"), None)
+                    local_tombstones[node_id] = list(remote)
+                    journal.append({"op": "remove", "group": "nodes", "id": node_id, "tombstone": list(remote)})
+                    self._next_seq(node_id)
+                if journal:
+                    self._write_config(config_data, {"op": "batch", "records": journal})
+            self._notify(transitions)
+            if journal:
+                self.logger.info(f"[JSONFileManager][merge_records][{event_id}]> Merged {len(journal)} records from peer.")
+            return 0, len(journal)
+        except Exception as e:
+            self.logger.error(f"[JSONFileManager][merge_records][{event_id}]> Error merging records: {e}")
+            return 1, str(e)
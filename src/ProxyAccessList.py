@@ -0,0 +1,123 @@
+import bisect
+import ipaddress
+import socket
+from typing import Iterable, List
+
+
+def parse_entries(value: str) -> List[str]:
+    """
+    Разбирает значение allow_hosts/deny_hosts.
+
+    Записи разделяются запятыми: адрес или сеть CIDR, IPv4 или IPv6.
+    Запись вида @/path/to/file подставляет записи из файла, по одной на
+    строку, текст после # считается комментарием.
+    """
+    entries = []
+    for item in value.split(','):
+        item = item.strip()
+        if item.startswith('@'):
+            with open(item[1:], 'r') as list_file:
+                for line in list_file:
+                    line = line.split('#', 1)[0].strip()
+                    if line:
+                        entries.append(line)
+        elif item:
+            entries.append(item)
+    return entries
+
+
+# ::ffff:0:0/96 - IPv4 адреса, принятые сокетом IPv6
+_IPV4_MAPPED_PREFIX = 0xffff << 32
+
+
+def address_key(host: str):
+    """
+    Адрес в виде (версия, целое число) или None для неадреса.
+
+    inet_pton заметно быстрее ipaddress.ip_address, а проверка
+    выполняется на каждый accept.
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, host), 'big')
+    except OSError:
+        pass
+    try:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, host.split('%', 1)[0]), 'big')
+    except (OSError, ValueError):
+        return None
+    if value >> 32 == 0xffff:
+        return 4, value - _IPV4_MAPPED_PREFIX
+    return 6, value
+
+
+class AddressMatcher:
+    """
+    Множество адресов и сетей, собранное в отсортированные непересекающиеся
+    диапазоны целых чисел отдельно для IPv4 и IPv6.
+
+    Проверка адреса - один двоичный поиск, O(log n) от числа диапазонов
+    независимо от того, сколько записей было в списке.
+    """
+
+    def __init__(self, entries: Iterable[str]):
+        """
+        Args:
+            entries (iterable): Адреса и сети CIDR, ValueError при неверной записи.
+        """
+        ranges = {4: [], 6: []}
+        self.size = 0
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError as error:
+                raise ValueError(f"Invalid address or network {entry!r}: {error}")
+            ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+            self.size += 1
+        self._starts = {}
+        self._ends = {}
+        for version, items in ranges.items():
+            merged = []
+            for start, end in sorted(items):
+                # Соседние и вложенные сети сливаются в один диапазон
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[version] = [start for start, _ in merged]
+            self._ends[version] = [end for _, end in merged]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, host: str) -> bool:
+        key = address_key(host)
+        if key is None:
+            return False
+        version, value = key
+        starts = self._starts[version]
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= self._ends[version][index]
+
+
+class AccessList:
+    """
+    Правила допуска клиентов секции прокси.
+
+    Клиент допускается, если allow пуст или содержит его адрес, и deny его
+    адреса не содержит. Объект неизменяем: при перечитывании конфигурации
+    строится новый и подменяется одной операцией присваивания.
+    """
+
+    def __init__(self, allow_hosts: str = "", deny_hosts: str = ""):
+        """
+        Args:
+            allow_hosts (str): Значение allow_hosts секции.
+            deny_hosts (str): Значение deny_hosts секции.
+        """
+        self.allow = AddressMatcher(parse_entries(allow_hosts))
+        self.deny = AddressMatcher(parse_entries(deny_hosts))
+
+    def is_allowed(self, host: str) -> bool:
+        if self.allow.size and host not in self.allow:
+            return False
+        return host not in self.deny
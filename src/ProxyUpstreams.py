@@ -0,0 +1,254 @@
+import bisect
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+BALANCE_STRATEGIES = ("round_robin", "least_conn", "consistent_hash")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class CircuitBreaker:
+    """
+    Автомат closed -> open -> half_open одного upstream.
+
+    failure_threshold неудач подряд размыкают цепь: upstream не выдаётся
+    клиентам open_timeout секунд. Затем пропускается одно пробное
+    соединение (half_open): успех замыкает цепь, неудача снова размыкает.
+    Неудачная активная проверка разомкнутой цепи продлевает её, так что
+    пока проверки падают, клиенты на upstream не попадают. Пробное
+    соединение, о котором не пришёл результат, через open_timeout
+    уступает место следующему.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, open_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.open_timeout = open_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.changed_at = 0.0
+
+    def allow(self, now: float) -> bool:
+        """Можно ли отдать upstream клиенту; в half_open занимает пробное соединение."""
+        if self.state == self.CLOSED:
+            return True
+        if now - self.changed_at < self.open_timeout:
+            return False
+        self.state = self.HALF_OPEN
+        self.changed_at = now
+        return True
+
+    def success(self, now: float) -> None:
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.changed_at = now
+
+    def failure(self, now: float) -> None:
+        self.failures += 1
+        if self.state != self.CLOSED or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.changed_at = now
+
+
+class UpstreamPool:
+    """
+    Пул upstream одной секции прокси с выбором по стратегии балансировки.
+
+    В пул входят статические адреса секции и, если передано досье, все
+    узлы со статусом "active" на порту секции. Состав пула обновляется по
+    ленте смены статусов досье, без опроса.
+
+    Стратегии:
+        round_robin - по кругу;
+        least_conn - upstream с наименьшим числом открытых соединений;
+        consistent_hash - по IP клиента на кольце с виртуальными узлами,
+            при смене состава пула переезжает только доля клиентов.
+
+    Для каждого upstream ведётся CircuitBreaker по результатам реальных
+    подключений и активных проверок (report); upstream с разомкнутой цепью
+    пропускается, следующий по стратегии получает его клиентов.
+    """
+
+    def __init__(self, logger, port: int, strategy: str = "round_robin", static: Iterable[Tuple[str, int]] = (),
+                 setup_nodes=None, replicas: int = 100, failure_threshold: int = 3, open_timeout: float = 10.0):
+        """
+        Args:
+            logger: Логгер.
+            port (int): Порт upstream на узлах кластера.
+            strategy (str): Одна из BALANCE_STRATEGIES.
+            static (iterable): Адреса (host, port), которые входят в пул всегда.
+            setup_nodes (JSONFileManager, optional): Досье, из которого берутся активные узлы.
+            replicas (int): Число виртуальных узлов на upstream для consistent_hash.
+            failure_threshold (int): Неудач подряд, после которых цепь upstream размыкается.
+            open_timeout (float): Время в разомкнутом состоянии до пробного соединения.
+        """
+        if strategy not in BALANCE_STRATEGIES:
+            raise ValueError(f"Unknown balance strategy {strategy!r}, expected one of {BALANCE_STRATEGIES}")
+        self.logger = logger
+        self.port = port
+        self.strategy = strategy
+        self.static = [(str(host), int(static_port)) for host, static_port in static]
+        self.setup_nodes = setup_nodes
+        self.replicas = replicas
+        self.failure_threshold = failure_threshold
+        self.open_timeout = open_timeout
+        self.breakers: Dict[Tuple[str, int], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        # Пересборки из разных потоков досье не должны применяться в обратном порядке
+        self._rebuild_lock = threading.Lock()
+        self.upstreams: List[Tuple[str, int]] = []
+        self.active_connections: Dict[Tuple[str, int], int] = {}
+        self._next = 0
+        self._ring: List[int] = []
+        self._ring_upstreams: List[Tuple[str, int]] = []
+        # Вызываются как listener(upstreams) после каждой смены состава
+        self.listeners: List[Callable] = []
+        self.rebuild()
+        if self.setup_nodes is not None:
+            self.setup_nodes.subscribe(self._on_status_change)
+
+    def _on_status_change(self, node_id: str, old, new, timestamp: float) -> None:
+        if "active" in (old, new):
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """Пересобирает состав пула из статических адресов и активных узлов досье."""
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        upstreams = list(self.static)
+        if self.setup_nodes is not None:
+            return_code, nodes = self.setup_nodes.load_json_nodes_by_status("active")
+            if return_code != 0:
+                self.logger.error(f"[UpstreamPool][rebuild]> {nodes}")
+                return
+            upstreams += sorted((str(node.host), self.port) for node in nodes if getattr(node, "host", None))
+        if self.set_upstreams(upstreams):
+            for listener in list(self.listeners):
+                listener(self.upstreams)
+
+    def configure(self, strategy: str, failure_threshold: int, open_timeout: float) -> None:
+        """
+        Меняет стратегию и параметры цепей без пересборки пула.
+
+        Состояние цепей сохраняется, новые пороги действуют с их следующего
+        перехода. Открытые соединения остаются на своих upstream.
+        """
+        if strategy not in BALANCE_STRATEGIES:
+            raise ValueError(f"Unknown balance strategy {strategy!r}, expected one of {BALANCE_STRATEGIES}")
+        with self._lock:
+            self.strategy = strategy
+            self.failure_threshold = failure_threshold
+            self.open_timeout = open_timeout
+            for breaker in self.breakers.values():
+                breaker.failure_threshold = failure_threshold
+                breaker.open_timeout = open_timeout
+
+    def set_upstreams(self, upstreams: Iterable[Tuple[str, int]]) -> bool:
+        """
+        Заменяет состав пула.
+
+        Returns:
+            bool: True, если состав изменился.
+        """
+        upstreams = list(dict.fromkeys((str(host), int(port)) for host, port in upstreams))
+        ring = sorted((_hash(f"{host}:{port}#{replica}"), (host, port)) for host, port in upstreams for replica in range(self.replicas))
+        with self._lock:
+            changed = upstreams != self.upstreams
+            if changed:
+                self.logger.info(f"[UpstreamPool][set_upstreams]> Upstreams on port {self.port}: {upstreams}")
+            self.upstreams = upstreams
+            self.breakers = {upstream: self.breakers.get(upstream) or CircuitBreaker(self.failure_threshold, self.open_timeout) for upstream in upstreams}
+            self._ring = [point for point, _ in ring]
+            self._ring_upstreams = [upstream for _, upstream in ring]
+        return changed
+
+    def acquire(self, client_host: str) -> Optional[Tuple[str, int]]:
+        """
+        Выбирает upstream для нового соединения клиента и учитывает его как открытое.
+
+        Returns:
+            tuple: (host, port) или None, если пул пуст или цепи всех upstream разомкнуты.
+        """
+        now = time.monotonic()
+        with self._lock:
+            count = len(self.upstreams)
+            if not count:
+                return None
+            for upstream in self._candidates(client_host, count):
+                if self.breakers[upstream].allow(now):
+                    self.active_connections[upstream] = self.active_connections.get(upstream, 0) + 1
+                    return upstream
+            return None
+
+    def _candidates(self, client_host: str, count: int):
+        # Upstream в порядке предпочтения стратегии, вызывается под _lock
+        if self.strategy == "consistent_hash":
+            # Дальше по кольцу: при разомкнутой цепи клиент переезжает на соседа, а не куда попало
+            index = bisect.bisect(self._ring, _hash(client_host))
+            seen = set()
+            for offset in range(len(self._ring)):
+                upstream = self._ring_upstreams[(index + offset) % len(self._ring)]
+                if upstream not in seen:
+                    seen.add(upstream)
+                    yield upstream
+                    if len(seen) == count:
+                        return
+            return
+        # Обход начинается со сдвига round robin, чтобы равные по нагрузке чередовались
+        start = self._next % count
+        self._next += 1
+        order = self.upstreams[start:] + self.upstreams[:start]
+        if self.strategy == "least_conn":
+            order.sort(key=lambda item: self.active_connections.get(item, 0))
+        yield from order
+
+    def report(self, upstream: Tuple[str, int], ok: bool) -> None:
+        """
+        Учитывает результат подключения к upstream или его проверки.
+
+        Args:
+            upstream (tuple): (host, port).
+            ok (bool): Подключение удалось.
+        """
+        now = time.monotonic()
+        with self._lock:
+            breaker = self.breakers.get(upstream)
+            if breaker is None:
+                return
+            state = breaker.state
+            if ok:
+                breaker.success(now)
+            else:
+                breaker.failure(now)
+        if breaker.state != state:
+            log = self.logger.info if breaker.state == CircuitBreaker.CLOSED else self.logger.warning
+            log(f"[UpstreamPool][report]> Upstream {upstream[0]}:{upstream[1]} circuit {state} -> {breaker.state}")
+
+    def health(self) -> Dict[str, str]:
+        """Состояние цепи каждого upstream: "host:port" -> closed/open/half_open."""
+        with self._lock:
+            return {f"{host}:{port}": breaker.state for (host, port), breaker in self.breakers.items()}
+
+    def release(self, upstream: Tuple[str, int]) -> None:
+        """Учитывает закрытие соединения с upstream."""
+        with self._lock:
+            count = self.active_connections.get(upstream, 0) - 1
+            if count > 0:
+                self.active_connections[upstream] = count
+            else:
+                self.active_connections.pop(upstream, None)
+
+    def close(self) -> None:
+        self.listeners.clear()
+        if self.setup_nodes is not None:
+            self.setup_nodes.unsubscribe(self._on_status_change)
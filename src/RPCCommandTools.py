@@ -1,4 +1,5 @@
 import re
+from datetime import datetime
 
 class RPCTools:
     def __init__(self, app_setting):
@@ -23,8 +24,8 @@ class RPCTools:
         Returns:
             bool: True if authorized, False otherwise.
         """
-        self.key = self.app_setting.get_config('RPCInterface', 'key')
-        self.logger.debug(f"[RPCTools][_internal_authorize][{event_id}]> key_node:{key_node}, my_key:{self.key}")
+        key = self.app_setting.get_config('RPCInterface', 'key')
+        self.logger.debug(f"[RPCTools][_internal_authorize][{event_id}]> key_node:{key_node}, my_key:{key}")
         if key_node != "1":
             return True
         return False
@@ -47,25 +48,6 @@ class RPCTools:
         result = {"answer": [answer], "data": data}
         return result
 
-    def _convert_to_str_recursive(self, value):
-        """
-        Recursively convert dictionary values to strings.
-
-        Args:
-            value: The value to convert.
-
-        Returns:
-            Union[str, List[str], Dict[str, str]]: The converted value.
-        """
-        if isinstance(value, dict):
-            return {k: self._convert_to_str_recursive(v) for k, v in value.items()}
-        elif isinstance(value, list):
-            return [self._convert_to_str_recursive(v) for v in value]
-        elif isinstance(value, int):
-            return str(value)
-        else:
-            return value
-
     def _validate_ip_port(self, event_id, host, port):
         """
         Validate IP address and port number.
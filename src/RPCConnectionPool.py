@@ -0,0 +1,230 @@
+import select
+import threading
+import time
+import xmlrpc.client
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from RpcCodec import codec
+
+
+class RPCPoolExhaustedError(Exception):
+    """Exception raised when no connection to a peer becomes free in time."""
+
+    def __init__(self, message="Connection pool exhausted"):
+        """
+        Initialize RPCPoolExhaustedError with a custom error message.
+
+        Args:
+            message (str): The error message to display.
+        """
+        self.message = message
+        super().__init__(self.message)
+
+
+class PooledTransport(xmlrpc.client.Transport):
+    """xmlrpc.client Transport with a socket timeout and idle-time bookkeeping."""
+
+    def __init__(self, timeout: float):
+        """
+        Initialize PooledTransport.
+
+        Args:
+            timeout (float): Socket timeout for connect and every request.
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.last_used = time.monotonic()
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+    def is_healthy(self) -> bool:
+        """
+        Check that the kept-alive socket was not closed by the peer.
+
+        An idle HTTP connection must not be readable: readability means EOF
+        or unsolicited data, both of which make the connection unusable.
+        """
+        if self._connection[1] is None:
+            return True
+        sock = self._connection[1].sock
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+
+class RpcConnectionPool:
+    """
+    Pool of persistent xmlrpc.client transports keyed by (host, port).
+
+    Each transport keeps its HTTP connection open between calls, so a
+    heartbeat to a peer costs one request instead of a TCP handshake and
+    teardown. The pool caps the connections per peer, evicts idle ones and
+    drops transports whose socket was closed by the peer.
+    """
+
+    def __init__(self, logger, timeout: float = 3.0, max_per_host: int = 2, idle_timeout: float = 60.0):
+        """
+        Initialize RpcConnectionPool.
+
+        Args:
+            logger: Logger object for logging messages.
+            timeout (float): Socket timeout of pooled transports.
+            max_per_host (int): Maximum number of connections to one peer.
+            idle_timeout (float): Idle time after which a connection is closed.
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, int], List[PooledTransport]] = {}
+        self._slots: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+        # Сколько вызовов держат или ждут семафор пира: без них и без простаивающих
+        # соединений семафор удаляется, иначе ушедшие узлы копились бы бесконечно
+        self._slot_users: Dict[Tuple[str, int], int] = {}
+        self._last_eviction = time.monotonic()
+
+    def _slot(self, key: Tuple[str, int]) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            self._slot_users[key] = self._slot_users.get(key, 0) + 1
+            return slot
+
+    def _unslot(self, key: Tuple[str, int]) -> None:
+        with self._lock:
+            users = self._slot_users[key] - 1
+            if users:
+                self._slot_users[key] = users
+            else:
+                del self._slot_users[key]
+                if key not in self._idle:
+                    del self._slots[key]
+
+    def _acquire(self, key: Tuple[str, int]) -> PooledTransport:
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                transport = idle.pop()
+                if transport.is_healthy():
+                    return transport
+                self.logger.debug(f"[RpcConnectionPool][_acquire]> Dropping broken connection to {key[0]}:{key[1]}")
+                transport.close()
+        return PooledTransport(self.timeout)
+
+    def _release(self, key: Tuple[str, int], transport: PooledTransport) -> None:
+        transport.last_used = time.monotonic()
+        with self._lock:
+            self._idle.setdefault(key, []).append(transport)
+        self.evict_idle()
+
+    def evict_idle(self) -> None:
+        """Close connections that stayed idle longer than idle_timeout."""
+        now = time.monotonic()
+        if now - self._last_eviction < self.idle_timeout / 2:
+            return
+        expired = []
+        with self._lock:
+            self._last_eviction = now
+            for key in list(self._idle):
+                fresh = []
+                for transport in self._idle[key]:
+                    if now - transport.last_used > self.idle_timeout:
+                        expired.append(transport)
+                    else:
+                        fresh.append(transport)
+                if fresh:
+                    self._idle[key] = fresh
+                else:
+                    del self._idle[key]
+                    if key not in self._slot_users:
+                        del self._slots[key]
+        for transport in expired:
+            transport.close()
+
+    @contextmanager
+    def transport(self, host: str, port: int):
+        """
+        Borrow a pooled transport.
+
+        The connection is returned to the pool when the block exits normally
+        and closed when it raises, because its state is then unknown.
+
+        Args:
+            host (str): Peer host.
+            port (int): Peer port.
+
+        Yields:
+            PooledTransport: Transport connected to the peer.
+        """
+        key = (str(host), int(port))
+        slot = self._slot(key)
+        try:
+            if not slot.acquire(timeout=self.timeout):
+                raise RPCPoolExhaustedError(f"No free connection to {key[0]}:{key[1]} within {self.timeout}s")
+            transport = self._acquire(key)
+            try:
+                yield transport
+            except BaseException:
+                transport.close()
+                raise
+            else:
+                self._release(key, transport)
+            finally:
+                slot.release()
+        finally:
+            self._unslot(key)
+
+    def call(self, host: str, port: int, method: str, *params) -> Any:
+        """
+        Call a remote XML-RPC method over a pooled connection.
+
+        Args:
+            host (str): Peer host.
+            port (int): Peer port.
+            method (str): Remote method name.
+            *params: Method parameters.
+
+        Returns:
+            Any: Unmarshalled result.
+        """
+        # Запрос сериализуется общим кодеком: int64 передаются как <i8>, а не строкой
+        body = codec.dumps(params, method).encode("utf-8", "xmlcharrefreplace")
+        with self.transport(host, port) as transport:
+            response = transport.request(f"{host}:{port}", "/RPC2", body)
+        return response[0] if len(response) == 1 else response
+
+    @contextmanager
+    def proxy(self, host: str, port: int):
+        """
+        Borrow a ServerProxy bound to a pooled transport.
+
+        Args:
+            host (str): Peer host.
+            port (int): Peer port.
+
+        Yields:
+            xmlrpc.client.ServerProxy: Proxy for the peer.
+        """
+        with self.transport(host, port) as transport:
+            yield xmlrpc.client.ServerProxy(f'http://{host}:{port}', transport=transport)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            for key in idle:
+                if key not in self._slot_users:
+                    del self._slots[key]
+        for transports in idle.values():
+            for transport in transports:
+                transport.close()
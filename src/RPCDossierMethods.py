@@ -4,6 +4,8 @@ import shortuuid
 from typing import Optional, Dict, Union, List, Any
 
 from RPCCommandTools import RPCTools
+from ClusterWireProtocol import wire_capabilities, negotiate_wire_port
+from RpcCodec import codec
 
 
 class RPCAuthorizationError(Exception):
@@ -25,19 +27,25 @@ class RPCAuthorizationError(Exception):
 
 
 class RPCDossierMethods:
-    def __init__(self, app_setting, setup_nodes, event_queue):
+    def __init__(self, app_setting, setup_nodes, event_queue, membership=None, services=None, proxy=None):
         """
         Initialize RPCMethods with application settings and node setup.
 
         Args:
             app_setting: Application settings.
             setup_nodes: Node setup.
+            membership: GossipMembership of the scheduler, None in heartbeat mode.
+            services: ServiceStateTracker of the scheduler, None if disabled.
+            proxy: CoreRroxy of this node.
         """
         self.setup_nodes = setup_nodes
         self.app_setting = app_setting
         self.logger = self.app_setting.get_logger()
         self.rpc_tools = RPCTools(app_setting)
         self.event_queue = event_queue
+        self.membership = membership
+        self.services = services
+        self.proxy = proxy
 
 
 
@@ -51,25 +59,33 @@ class RPCDossierMethods:
         Returns:
             dict: A dictionary containing the response data.
         """
-        self.event_id = shortuuid.uuid()
-        self.logger.debug(f"[RPCMethods][remote_registration][{self.event_id}]> UNPUT data:{data}")
+        event_id = shortuuid.uuid()
+        self.logger.debug(f"[RPCMethods][remote_registration][{event_id}]> UNPUT data:{data}")
         if "REG" in data:
             reg_data = data["REG"]
-            self.logger.info(f"[RPCMethods][remote_registration][{self.event_id}]> reg_request_recv - {reg_data}")
-            ret_code, self.self_node = self.setup_nodes.just_load_json(self.event_id, "self", "full")
+            self.logger.info(f"[RPCMethods][remote_registration][{event_id}]> reg_request_recv - {reg_data}")
+            ret_code, self_node = self.setup_nodes.just_load_json(event_id, "self", "full")
             if ret_code == 0:
-                ack_data = {"ACK": self.self_node[0]}
-                self.logger.debug(f"[RPCMethods][remote_registration][{self.event_id}]> ack_data - {ack_data}")
+                ack_data = {"ACK": self_node[0]}
+                capabilities = wire_capabilities(self.app_setting)
+                if capabilities:
+                    ack_data["CAPS"] = capabilities
+                self.logger.debug(f"[RPCMethods][remote_registration][{event_id}]> ack_data - {ack_data}")
             else:
-                return self.rpc_tools._handle_custom_error(self.self_node)
-            event_result = self.setup_nodes.add_node_to_config(self._convert_to_str_recursive(reg_data))
+                return self.rpc_tools._handle_custom_error(event_id, self_node)
+            reg_data = codec.normalize(reg_data)
+            # Узел старой версии не присылает CAPS и общается только через XML-RPC
+            wire_port = negotiate_wire_port(self.app_setting, data.get("CAPS"))
+            if wire_port:
+                reg_data["wire_port"] = wire_port
+            event_result = self.setup_nodes.add_node_to_config(reg_data)
             if event_result == 0:
-                self.logger.info(f"[RPCMethods][just_load_json][{self.event_id}]> Created new host")
+                self.logger.info(f"[RPCMethods][just_load_json][{event_id}]> Created new host")
             else:
-                return self.rpc_tools._handle_custom_error("Error created new host")
-            return self.rpc_tools._prepare_response(0, "Ok", self.rpc_tools._convert_to_str_recursive(ack_data))
+                return self.rpc_tools._handle_custom_error(event_id, "Error created new host")
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", ack_data)
         else:
-            return self.rpc_tools._prepare_response(2, "No registration data found", {})
+            return self.rpc_tools._prepare_response(event_id, 2, "No registration data found", {})
 
     def synchronis(self, data):
         """
@@ -81,13 +97,179 @@ class RPCDossierMethods:
         Returns:
             str: A string indicating success.
         """
-        self.event_id = shortuuid.uuid()
-        self.logger.debug(f"[RPCMethods][synchronis][{self.event_id}]> UNPUT data:{data}")
+        event_id = shortuuid.uuid()
+        self.logger.debug(f"[RPCMethods][synchronis][{event_id}]> UNPUT data:{data}")
         if "SYNC" in data:  
             reg_data = data["SYNC"]
-            self.logger.info(f"[RPCMethods][remote_registration][{self.event_id}]> reg_request_recv - {reg_data}")
+            self.logger.info(f"[RPCMethods][remote_registration][{event_id}]> reg_request_recv - {reg_data}")
         return "Pong"
 
+    def sync_summary(self, key_node: Optional[str] = None, epoch: str = "", since: int = 0) -> Dict[str, Any]:
+        """
+        Get the revision summary of dossier records changed after since.
+
+        Args:
+            key_node (str): The key node for authorization.
+            epoch (str): Epoch from the caller's previous summary.
+            since (int): Sequence number from the caller's previous summary.
+
+        Returns:
+            dict: A dictionary containing the response data.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][sync_summary][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_sync_cmd: key_node:{key_node}, epoch:{epoch}, since:{since}")
+        try:
+            if not isinstance(key_node, str) or not isinstance(epoch, str):
+                raise TypeError("Invalid input type. Expected str.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+            since = int(since)
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            summary = self.setup_nodes.sync_summary(epoch, since)
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", summary)
+
+    def sync_pull(self, key_node: Optional[str] = None, node_ids: List[str] = []) -> Dict[str, Any]:
+        """
+        Get full dossier records for the given node IDs.
+
+        Args:
+            key_node (str): The key node for authorization.
+            node_ids (list): IDs of the records to send.
+
+        Returns:
+            dict: A dictionary containing the response data.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][sync_pull][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_pull_cmd: key_node:{key_node}, node_ids:{node_ids}")
+        try:
+            if not isinstance(key_node, str) or not isinstance(node_ids, list):
+                raise TypeError("Invalid input type. Expected str and list.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            records = self.setup_nodes.sync_records(node_ids)
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", records)
+
+    def gossip_ping(self, key_node: Optional[str] = None, sender_id: str = "", updates: List[List[Any]] = [], incarnation: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Answer a SWIM probe.
+
+        Args:
+            key_node (str): The key node for authorization.
+            sender_id (str): ID of the probing node.
+            updates (list): Piggybacked [node_id, state, incarnation] membership updates.
+            incarnation (int, optional): Own incarnation of the probing node, older nodes do not send it.
+
+        Returns:
+            dict: A dictionary containing the response data with own incarnation and updates.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][gossip_ping][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_gossip_cmd: sender_id:{sender_id}, updates:{updates}")
+        try:
+            if not isinstance(key_node, str) or not isinstance(sender_id, str) or not isinstance(updates, list):
+                raise TypeError("Invalid input type. Expected str, str and list.")
+            if incarnation is not None and (not isinstance(incarnation, int) or isinstance(incarnation, bool)):
+                raise TypeError("Invalid input type. Expected int incarnation.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            if self.membership is None:
+                # Узел в режиме heartbeat отвечает как живой, но в gossip не участвует
+                return self.rpc_tools._prepare_response(event_id, 0, "Ok", {"incarnation": 0, "updates": []})
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", self.membership.handle_ping(sender_id, updates, incarnation))
+
+    def gossip_ping_req(self, key_node: Optional[str] = None, sender_id: str = "", target_id: str = "", host: str = "", port: int = 0, updates: List[List[Any]] = []) -> Dict[str, Any]:
+        """
+        Probe a node on behalf of another node (SWIM indirect probe).
+
+        Args:
+            key_node (str): The key node for authorization.
+            sender_id (str): ID of the node that asks for the probe.
+            target_id (str): ID of the node to probe.
+            host (str): Address of the target.
+            port (int): Port of the target.
+            updates (list): Piggybacked [node_id, state, incarnation] membership updates.
+
+        Returns:
+            dict: A dictionary containing the response data with the probe result.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][gossip_ping_req][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_gossip_req_cmd: sender_id:{sender_id}, target_id:{target_id}, host:{host}, port:{port}")
+        try:
+            if not isinstance(key_node, str) or not isinstance(target_id, str) or not isinstance(updates, list):
+                raise TypeError("Invalid input type. Expected str and list.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+            port = int(port)
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            if self.membership is None:
+                return self.rpc_tools._prepare_response(event_id, 0, "Ok", {"ack": False, "incarnation": 0, "updates": []})
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", self.membership.handle_ping_req(sender_id, target_id, host, port, updates))
+
+    def refresh_inventory(self, key_node: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Request a refresh of the self node inventory.
+
+        The refresh runs in the scheduler, the changed facts appear in the
+        self record of the dossier.
+
+        Args:
+            key_node (str): The key node for authorization.
+
+        Returns:
+            dict: A dictionary containing the response data.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][refresh_inventory][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_inventory_cmd: key_node:{key_node}")
+        try:
+            if not isinstance(key_node, str):
+                raise TypeError("Invalid input type. Expected str.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            self.event_queue.put("inventory_refresh")
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", "Inventory refresh scheduled")
+
     def ping(self):
         """
         Handle ping.
@@ -110,28 +292,126 @@ class RPCDossierMethods:
         Returns:
             dict: A dictionary containing the response data.
         """
-        self.event_id = shortuuid.uuid()
-        self.log_prefix = f"[RPCInterface][get_dossier][{self.event_id}]"
-        self.logger.debug(f"{self.log_prefix}> inc_get_cmd: key_node:{key_node}, group:{group}, format_data:{format_data}, host_id:{node_id}")
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][get_dossier][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_get_cmd: key_node:{key_node}, group:{group}, format_data:{format_data}, host_id:{node_id}")
         try:
             if not group.strip() or (isinstance(format_data, str) and not format_data.strip()) or (isinstance(format_data, list) and not all(isinstance(item, str) for item in format_data)):
                 raise ValueError("Empty input argument detected.")
             if not isinstance(key_node, str) or not isinstance(group, str) or not (isinstance(format_data, str) or isinstance(format_data, list)):
                 raise TypeError("Invalid input type. Expected str.")
-            self.aut_res = self.rpc_tools._internal_authorize(key_node, self.event_id)           
-            if self.aut_res == 1:
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)           
+            if aut_res == 1:
                 raise RPCAuthorizationError("Authorization failed.")
         except RPCAuthorizationError as error:
-            return self.rpc_tools._handle_custom_error(self.event_id, error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except (ValueError, KeyError, TypeError) as error:
-            return self.rpc_tools._handle_custom_error(self.event_id, error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except Exception as ex:
-            return self.rpc_tools._handle_unexpected_error(self.event_id, ex)
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
         else:
-            return_code, response = self.setup_nodes.find_json_dossier(event_id=self.event_id, group=group, format_data=format_data, node_id=node_id)
+            return_code, response = self.setup_nodes.find_json_dossier(event_id=event_id, group=group, format_data=format_data, node_id=node_id)
             event = "status_node_check"
             self.event_queue.put(event)
-            return self._prepare_response(return_code, "Ok", response)
+            return self.rpc_tools._prepare_response(event_id, return_code, "Ok", response)
+
+    def get_status_changes(self, key_node: Optional[str] = None, since: int = 0) -> Dict[str, Any]:
+        """
+        Get node status changes from the dossier change feed.
+
+        Args:
+            key_node (str): The key node for authorization.
+            since (int): Sequence number of the last change already seen by the caller.
+
+        Returns:
+            dict: A dictionary containing the response data with a list of
+            [seq, node_id, old, new, timestamp] changes.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][get_status_changes][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_changes_cmd: key_node:{key_node}, since:{since}")
+        try:
+            if not isinstance(key_node, str):
+                raise TypeError("Invalid input type. Expected str.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+            since = int(since)
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            # None (добавление/удаление узла) не передаётся по XML-RPC без allow_none
+            changes = [[seq, node_id, old or "", new or "", timestamp] for seq, node_id, old, new, timestamp in self.setup_nodes.changes_since(since)]
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", changes)
+
+    def get_services(self, key_node: Optional[str] = None, since: int = 0, units: List[str] = []) -> Dict[str, Any]:
+        """
+        Get systemd unit states of this node from the service state table.
+
+        Args:
+            key_node (str): The key node for authorization.
+            since (int): Sequence number from the previous answer, 0 for all units.
+            units (list): Only these units, all units if empty.
+
+        Returns:
+            dict: A dictionary containing the response data with
+            {"seq": seq, "units": {unit: {"load", "active", "sub"}}}.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][get_services][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_services_cmd: key_node:{key_node}, since:{since}, units:{units}")
+        try:
+            if not isinstance(key_node, str) or not isinstance(units, list) or not all(isinstance(unit, str) for unit in units):
+                raise TypeError("Invalid input type. Expected str and list of str.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+            since = int(since)
+            if self.services is None:
+                raise ValueError("Service state tracking is disabled on this node.")
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", self.services.get_units(since, units))
+
+    def get_proxy_stats(self, key_node: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get admission counters of the proxy sections of this node.
+
+        Args:
+            key_node (str): The key node for authorization.
+
+        Returns:
+            dict: A dictionary containing the response data with
+            {section: {"accepted", "denied", "shed", "rate_limited", ...}}.
+        """
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][get_proxy_stats][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_proxy_stats_cmd: key_node:{key_node}")
+        try:
+            if not isinstance(key_node, str):
+                raise TypeError("Invalid input type. Expected str.")
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)
+            if aut_res == 1:
+                raise RPCAuthorizationError("Authorization failed.")
+            if self.proxy is None:
+                raise ValueError("Proxy is not running on this node.")
+        except RPCAuthorizationError as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.rpc_tools._handle_custom_error(event_id, error)
+        except Exception as ex:
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
+        else:
+            return self.rpc_tools._prepare_response(event_id, 0, "Ok", self.proxy.stats())
 
     def upd_dossier(self, key_node: Optional[str] = None, group: str = "nodes", node_id: str = None, change_data: Dict[str, Any] = {}) -> Dict[str, Any]:
         """
@@ -146,26 +426,27 @@ class RPCDossierMethods:
         Returns:
             dict: A dictionary containing the response data.
         """
-        self.event_id = shortuuid.uuid()
-        self.log_prefix = f"[RPCInterface][upd_dossier][{self.event_id}]"
-        self.logger.debug(f"{self.log_prefix}> inc_upd_cmd: key_node:{key_node}, group:{group}, node_id:{node_id}, change_data:{change_data}")
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][upd_dossier][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_upd_cmd: key_node:{key_node}, group:{group}, node_id:{node_id}, change_data:{change_data}")
         try:
             if not group.strip():
                 raise ValueError("Empty input argument detected.")
             if not isinstance(key_node, str) or not isinstance(group, str):
                 raise TypeError("Invalid input type. Expected str.")
-            self.aut_res = self.rpc_tools._internal_authorize(key_node, self.event_id)           
-            if self.aut_res == 1:
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)           
+            if aut_res == 1:
                 raise RPCAuthorizationError("Authorization failed.")
         except RPCAuthorizationError as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except (ValueError, KeyError, TypeError) as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except Exception as ex:
-            return self.rpc_tools._handle_unexpected_error(ex)
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
         else:
-            return_code, response = self.setup_nodes.update_node_by_id(event_id=self.event_id, node_id=node_id, group=group, updated_values=self.rpc_tools._convert_to_str_recursive(change_data))
-            return self.rpc_tools._prepare_response(return_code, "Ok", response)
+            return_code, response = self.setup_nodes.update_node_by_id(event_id=event_id, node_id=node_id, group=group, updated_values=codec.normalize(change_data))
+            self.event_queue.put("status_node_check")
+            return self.rpc_tools._prepare_response(event_id, return_code, "Ok", response)
 
     def add_dossier(self, key_node: Optional[str] = None, group: str = "nodes", data: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -179,35 +460,36 @@ class RPCDossierMethods:
         Returns:
             dict: A dictionary containing the response data.
         """
-        self.event_id = shortuuid.uuid()
-        self.log_prefix = f"[RPCInterface][add_dossier][{self.event_id}]"
-        self.logger.debug(f"{self.log_prefix}> inc_add_cmd: key_node:{key_node}, group:{group}, data:{data}")
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][add_dossier][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_add_cmd: key_node:{key_node}, group:{group}, data:{data}")
         try:
             if not group.strip():
                 raise ValueError("Empty input argument detected.")
             if not isinstance(key_node, str) or not isinstance(group, str):
                 raise TypeError("Invalid input type. Expected str.")
-            self.aut_res = self._internal_authorize(key_node, self.event_id)           
-            if self.aut_res == 1:
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)           
+            if aut_res == 1:
                 raise RPCAuthorizationError("Authorization failed.")
-            self.data = eval(data)
-            self.rpc_tools._validate_ip_port(self.data["host"], self.data["port"])
-            self.host_id = str(shortuuid.uuid())
-            host_info = {'id': self.host_id, 'host': self.data["host"], 'port': int(self.data["port"]), 'type': 'neighbour', 'active': 'unknown', 'route': ""}
-            self.logger.debug(f"{self.log_prefix} Adding JSON data - {host_info}")
+            data = eval(data)
+            self.rpc_tools._validate_ip_port(event_id, data["host"], data["port"])
+            host_id = str(shortuuid.uuid())
+            host_info = {'id': host_id, 'host': data["host"], 'port': int(data["port"]), 'type': 'neighbour', 'active': 'unknown', 'route': ""}
+            self.logger.debug(f"{log_prefix} Adding JSON data - {host_info}")
             event_result = self.setup_nodes.add_node_to_config(host_info)
             if event_result == 0:
-                self.logger.info(f"{self.log_prefix} Created new host with ID {self.host_id}, DATA - {host_info}")
-                return self.rpc_tools._prepare_response(0, "Ok", host_info)
+                self.logger.info(f"{log_prefix} Created new host with ID {host_id}, DATA - {host_info}")
+                self.event_queue.put("status_node_check")
+                return self.rpc_tools._prepare_response(event_id, 0, "Ok", host_info)
             else:
-                self.logger.error(f"{self.log_prefix} Error created new host with ID {self.host_id}, DATA - {host_info}")
-                return self.rpc_tools._prepare_response(2, f"Error adding node to configuration. \n{host_info}", {})
+                self.logger.error(f"{log_prefix} Error created new host with ID {host_id}, DATA - {host_info}")
+                return self.rpc_tools._prepare_response(event_id, 2, f"Error adding node to configuration. \n{host_info}", {})
         except RPCAuthorizationError as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except (ValueError, KeyError, TypeError) as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except Exception as ex:
-            return self.rpc_tools._handle_unexpected_error(ex)
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
 
     def del_dossier(self, key_node: Optional[str] = None, group: str = "nodes", node_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -221,23 +503,24 @@ class RPCDossierMethods:
         Returns:
             dict: A dictionary containing the response data.
         """
-        self.event_id = shortuuid.uuid()
-        self.log_prefix = f"[RPCInterface][put_dossier][{self.event_id}]"
-        self.logger.debug(f"{self.log_prefix}> inc_put_cmd: key_node:{key_node}, group:{group}, node_id:{node_id}")
+        event_id = shortuuid.uuid()
+        log_prefix = f"[RPCInterface][put_dossier][{event_id}]"
+        self.logger.debug(f"{log_prefix}> inc_put_cmd: key_node:{key_node}, group:{group}, node_id:{node_id}")
         try:
             if not group.strip():
                 raise ValueError("Empty input argument detected.")
             if not isinstance(key_node, str) or not isinstance(group, str):
                 raise TypeError("Invalid input type. Expected str.")
-            self.aut_res = self.rpc_tools._internal_authorize(key_node, self.event_id)           
-            if self.aut_res == 1:
+            aut_res = self.rpc_tools._internal_authorize(key_node, event_id)           
+            if aut_res == 1:
                 raise RPCAuthorizationError("Authorization failed.")
         except RPCAuthorizationError as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except (ValueError, KeyError, TypeError) as error:
-            return self.rpc_tools._handle_custom_error(error)
+            return self.rpc_tools._handle_custom_error(event_id, error)
         except Exception as ex:
-            return self.rpc_tools._handle_unexpected_error(ex)
+            return self.rpc_tools._handle_unexpected_error(event_id, ex)
         else:
-            return_code, response = self.setup_nodes.remove_node_from_config(event_id=self.event_id, node_id=node_id)
-            return self.rpc_tools._prepare_response(return_code, "Ok", response)
+            return_code = self.setup_nodes.remove_node_from_config(node_id)
+            self.event_queue.put("status_node_check")
+            return self.rpc_tools._prepare_response(event_id, return_code, "Ok", {})
@@ -0,0 +1,446 @@
+import struct
+import threading
+import xmlrpc.client
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Tuple
+
+
+INT32_MIN = -(1 << 31)
+INT32_MAX = (1 << 31) - 1
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+_INT64 = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+_LENGTH = struct.Struct(">I")
+_LENGTH_UNPACK = _LENGTH.unpack_from
+_INT64_UNPACK = _INT64.unpack_from
+
+
+class CodecError(ValueError):
+    """Exception raised for values that cannot be encoded or decoded."""
+
+    def __init__(self, message="Invalid value for the codec"):
+        """
+        Initialize CodecError with a custom error message.
+
+        Args:
+            message (str): The error message to display.
+        """
+        self.message = message
+        super().__init__(self.message)
+
+
+def _frozen(self, *args, **kwargs):
+    raise TypeError("FrozenDict is immutable")
+
+
+class FrozenDict(dict):
+    """
+    Immutable dict whose encoded form is cached by the codec.
+
+    The owner marks a value as frozen when it replaces it as a whole instead
+    of changing it in place (e.g. NodeInventory facts), so the encoded
+    fragment can be reused by object identity. Elsewhere it behaves as a
+    plain dict: normalize keeps it, json stores it as an object.
+    """
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class _CacheEnd:
+    """Маркер конца поддерева в стеке кодировщика: всё записанное после start кэшируется."""
+    __slots__ = ("value", "start")
+
+    def __init__(self, value, start: int):
+        self.value = value
+        self.start = start
+
+
+class _Raw(str):
+    """Готовый фрагмент XML в стеке кодировщика."""
+
+
+_NO_KEY = object()
+
+
+class FragmentCache:
+    """
+    LRU-кэш закодированных фрагментов по идентичности исходного объекта.
+
+    variant различает кодирования одного объекта с разными параметрами
+    (allow_none для XML): фрагмент с <nil/> не должен попасть в вызов без allow_none.
+    """
+
+    def __init__(self, size: int = 256):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, value, variant=None):
+        key = (id(value), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Объект хранится в записи, поэтому его id не может достаться другому объекту
+            if entry is None or entry[0] is not value:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, value, fragment, variant=None) -> None:
+        key = (id(value), variant)
+        with self._lock:
+            self._entries[key] = (value, fragment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class ValueCodec:
+    """
+    Shared normalisation and serialization of RPC payloads.
+
+    All walks over the payload are iterative, so the nesting depth is not
+    limited by the recursion limit. Integers keep their type: XML-RPC
+    carries them as <int> or <i8>, the binary protocol as int64. Encoded
+    forms of FrozenDict subtrees (e.g. the hardware info of
+    the self node) are cached and reused.
+    """
+
+    def __init__(self, cache_size: int = 256):
+        """
+        Initialize ValueCodec.
+
+        Args:
+            cache_size (int): Maximum number of cached fragments per format.
+        """
+        self.xml_cache = FragmentCache(cache_size)
+        self.binary_cache = FragmentCache(cache_size)
+
+    def normalize(self, value: Any) -> Any:
+        """
+        Bring a received value to the form stored in the dossier.
+
+        Tuples become lists and dict keys become strings, so the value is
+        JSON-serializable. Containers without such changes are returned as
+        is instead of being copied.
+
+        Args:
+            value: The value to normalize.
+
+        Returns:
+            Any: Normalized value.
+        """
+        containers = (dict, list, tuple)
+        if not isinstance(value, containers):
+            return value
+        root = [value]
+        # Кадр: [контейнер, его элементы, уже обработанные элементы, родительский список, индекс в нём]
+        stack = [[value, list(value.values()) if isinstance(value, dict) else value, [], root, 0]]
+        while stack:
+            frame = stack[-1]
+            container, items, children = frame[0], frame[1], frame[2]
+            index = len(children)
+            descended = False
+            while index < len(items):
+                child = items[index]
+                children.append(child)
+                index += 1
+                if isinstance(child, containers):
+                    stack.append([child, list(child.values()) if isinstance(child, dict) else child, [], children, index - 1])
+                    descended = True
+                    break
+            if descended:
+                continue
+            stack.pop()
+            if isinstance(container, dict):
+                changed = any(type(key) is not str for key in container) or any(a is not b for a, b in zip(children, items))
+                result = {str(key): item for key, item in zip(container, children)} if changed else container
+            else:
+                changed = type(container) is not list or any(a is not b for a, b in zip(children, items))
+                result = children if changed else container
+            frame[3][frame[4]] = result
+        return root[0]
+
+    def _dump_xml(self, value: Any, parts: list, allow_none: bool) -> None:
+        cache = self.xml_cache
+        write = parts.append
+        # Binary и DateTime из xmlrpc.client пишут через out.write()
+        writer = SimpleNamespace(write=write)
+        stack = [value]
+        while stack:
+            item = stack.pop()
+            kind = type(item)
+            if kind is _Raw:
+                write(item)
+            elif kind is str:
+                write("<value><string>")
+                write(xmlrpc.client.escape(item))
+                write("</string></value>\n")
+            elif kind is dict:
+                write("<value><struct>\n")
+                stack.append(_Raw("</struct></value>\n"))
+                for key, member in reversed(list(item.items())):
+                    if type(key) is not str:
+                        raise TypeError("dictionary key must be string")
+                    stack.append(_Raw("</member>\n"))
+                    stack.append(member)
+                    stack.append(_Raw(f"<member>\n<name>{xmlrpc.client.escape(key)}</name>\n"))
+            elif kind is list or kind is tuple:
+                write("<value><array><data>\n")
+                stack.append(_Raw("</data></array></value>\n"))
+                stack.extend(reversed(item))
+            elif kind is bool:
+                write(f"<value><boolean>{int(item)}</boolean></value>\n")
+            elif kind is int:
+                if INT32_MIN <= item <= INT32_MAX:
+                    write(f"<value><int>{item}</int></value>\n")
+                elif INT64_MIN <= item <= INT64_MAX:
+                    write(f"<value><i8>{item}</i8></value>\n")
+                else:
+                    raise OverflowError("int exceeds XML-RPC limits")
+            elif kind is float:
+                write(f"<value><double>{item!r}</double></value>\n")
+            elif kind is FrozenDict:
+                fragment = cache.get(item, allow_none)
+                if fragment is not None:
+                    write(fragment)
+                else:
+                    stack.append(_CacheEnd(item, len(parts)))
+                    stack.append(dict(item))
+            elif kind is _CacheEnd:
+                cache.put(item.value, "".join(parts[item.start:]), allow_none)
+            elif item is None:
+                if not allow_none:
+                    raise TypeError("cannot marshal None unless allow_none is enabled")
+                write("<value><nil/></value>")
+            elif isinstance(item, (bytes, bytearray)):
+                xmlrpc.client.Binary(bytes(item)).encode(writer)
+            elif isinstance(item, datetime):
+                xmlrpc.client.DateTime(item).encode(writer)
+            elif isinstance(item, (xmlrpc.client.Binary, xmlrpc.client.DateTime)):
+                item.encode(writer)
+            elif isinstance(item, bool):
+                stack.append(bool(item))
+            elif isinstance(item, int):
+                stack.append(int(item))
+            elif isinstance(item, str):
+                stack.append(str(item))
+            elif isinstance(item, dict):
+                stack.append(dict(item))
+            elif isinstance(item, (list, tuple)):
+                stack.append(list(item))
+            else:
+                raise TypeError(f"cannot marshal {kind} objects")
+
+    def dumps(self, params, methodname: str = None, methodresponse: bool = False, allow_none: bool = False) -> str:
+        """
+        Marshal an XML-RPC request or response, drop-in for xmlrpc.client.dumps().
+
+        Args:
+            params (tuple or xmlrpc.client.Fault): Parameters or a fault.
+            methodname (str, optional): Method name for a methodCall packet.
+            methodresponse (bool): Create a methodResponse packet.
+            allow_none (bool): Allow None as <nil/>.
+
+        Returns:
+            str: XML document.
+        """
+        parts = ["<?xml version='1.0'?>\n"]
+        write = parts.append
+        if isinstance(params, xmlrpc.client.Fault):
+            write("<methodResponse>\n<fault>\n")
+            self._dump_xml({"faultCode": params.faultCode, "faultString": params.faultString}, parts, allow_none)
+            write("</fault>\n</methodResponse>\n")
+            return "".join(parts)
+        if methodname:
+            write(f"<methodCall>\n<methodName>{xmlrpc.client.escape(methodname)}</methodName>\n")
+        elif methodresponse:
+            write("<methodResponse>\n")
+        write("<params>\n")
+        for param in params:
+            write("<param>\n")
+            self._dump_xml(param, parts, allow_none)
+            write("</param>\n")
+        write("</params>\n")
+        if methodname:
+            write("</methodCall>\n")
+        elif methodresponse:
+            write("</methodResponse>\n")
+        return "".join(parts)
+
+    @staticmethod
+    def loads(data) -> Tuple[tuple, str]:
+        """Unmarshal an XML-RPC packet, <i8> values are returned as int."""
+        return xmlrpc.client.loads(data)
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Encode a value into the compact binary representation.
+
+        Supported types: None, bool, int, float, str, bytes, list, tuple and
+        dict. Integers within int64 are sent as int64, larger ones as signed
+        big-endian bytes.
+
+        Args:
+            value: The value to encode.
+
+        Returns:
+            bytes: Encoded value.
+        """
+        cache = self.binary_cache
+        out = bytearray()
+        stack = [value]
+        while stack:
+            item = stack.pop()
+            kind = type(item)
+            if kind is str:
+                raw = item.encode("utf-8")
+                out += b"s"
+                out += _LENGTH.pack(len(raw))
+                out += raw
+            elif kind is dict:
+                out += b"m"
+                out += _LENGTH.pack(len(item))
+                for key, member in reversed(list(item.items())):
+                    stack.append(member)
+                    stack.append(key)
+            elif kind is list or kind is tuple:
+                out += b"l"
+                out += _LENGTH.pack(len(item))
+                stack.extend(reversed(item))
+            elif kind is int:
+                if INT64_MIN <= item <= INT64_MAX:
+                    out += b"i"
+                    out += _INT64.pack(item)
+                else:
+                    raw = item.to_bytes((item.bit_length() + 8) // 8, "big", signed=True)
+                    out += b"I"
+                    out += _LENGTH.pack(len(raw))
+                    out += raw
+            elif item is None:
+                out += b"N"
+            elif item is True:
+                out += b"T"
+            elif item is False:
+                out += b"F"
+            elif kind is float:
+                out += b"d"
+                out += _FLOAT.pack(item)
+            elif kind is FrozenDict:
+                fragment = cache.get(item)
+                if fragment is not None:
+                    out += fragment
+                else:
+                    stack.append(_CacheEnd(item, len(out)))
+                    stack.append(dict(item))
+            elif kind is _CacheEnd:
+                cache.put(item.value, bytes(out[item.start:]))
+            elif isinstance(item, (bytes, bytearray)):
+                out += b"b"
+                out += _LENGTH.pack(len(item))
+                out += item
+            elif isinstance(item, bool):
+                stack.append(bool(item))
+            elif isinstance(item, int):
+                stack.append(int(item))
+            elif isinstance(item, float):
+                stack.append(float(item))
+            elif isinstance(item, str):
+                stack.append(str(item))
+            elif isinstance(item, dict):
+                stack.append(dict(item))
+            elif isinstance(item, (list, tuple)):
+                stack.append(list(item))
+            else:
+                raise CodecError(f"Cannot encode {kind.__name__} for the wire protocol")
+        return bytes(out)
+
+    @staticmethod
+    def decode(payload: bytes) -> Any:
+        """
+        Decode a value produced by encode().
+
+        Args:
+            payload (bytes): Encoded value.
+
+        Returns:
+            Any: Decoded value.
+        """
+        data = bytes(payload)
+        size = len(data)
+        offset = 0
+        # Кадр незаполненного контейнера: [контейнер, осталось элементов, ключ словаря]
+        stack = []
+        try:
+            while True:
+                tag = data[offset]
+                offset += 1
+                if tag == 0x73:  # s
+                    end = offset + 4 + _LENGTH_UNPACK(data, offset)[0]
+                    if end > size:
+                        raise CodecError("Truncated value")
+                    value = data[offset + 4:end].decode("utf-8")
+                    offset = end
+                elif tag == 0x6D or tag == 0x6C:  # m, l
+                    count = _LENGTH_UNPACK(data, offset)[0]
+                    offset += 4
+                    value = {} if tag == 0x6D else []
+                    if count:
+                        stack.append([value, count, _NO_KEY])
+                        continue
+                elif tag == 0x69:  # i
+                    value = _INT64_UNPACK(data, offset)[0]
+                    offset += 8
+                elif tag == 0x4E:  # N
+                    value = None
+                elif tag == 0x54:  # T
+                    value = True
+                elif tag == 0x46:  # F
+                    value = False
+                elif tag == 0x64:  # d
+                    value = _FLOAT.unpack_from(data, offset)[0]
+                    offset += 8
+                elif tag == 0x62 or tag == 0x49:  # b, I
+                    end = offset + 4 + _LENGTH_UNPACK(data, offset)[0]
+                    if end > size:
+                        raise CodecError("Truncated value")
+                    raw = data[offset + 4:end]
+                    value = raw if tag == 0x62 else int.from_bytes(raw, "big", signed=True)
+                    offset = end
+                else:
+                    raise CodecError(f"Unknown type tag {tag:#x}")
+
+                # Кладём значение в родительский контейнер, закрывая заполненные
+                while stack:
+                    frame = stack[-1]
+                    container = frame[0]
+                    if type(container) is list:
+                        container.append(value)
+                    elif frame[2] is _NO_KEY:
+                        frame[2] = value
+                        break
+                    else:
+                        container[frame[2]] = value
+                        frame[2] = _NO_KEY
+                    frame[1] -= 1
+                    if frame[1]:
+                        break
+                    stack.pop()
+                    value = container
+                else:
+                    if offset != size:
+                        raise CodecError("Trailing data after value")
+                    return value
+        except (IndexError, struct.error, UnicodeDecodeError, TypeError) as error:
+            raise CodecError(f"Truncated or invalid frame: {error}")
+
+
+# Общий экземпляр: кэш фрагментов разделяется всеми вызовами процесса
+codec = ValueCodec()
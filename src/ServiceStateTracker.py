@@ -0,0 +1,253 @@
+import json
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Состояние выгруженного юнита с точки зрения systemd
+UNLOADED_STATE = ("not-found", "inactive", "dead")
+
+
+class ServiceStateTracker:
+    """
+    Live table of systemd units: unit -> (load, active, sub).
+
+    The table is filled from one `systemctl list-units` snapshot and then
+    kept current from the change stream of PID 1 messages in the journal
+    (`journalctl -f -o json _PID=1`): units named in new messages are
+    re-read in batches with one `systemctl show`. Periodic snapshots are
+    diffed against the table as a fallback, often while the stream is
+    down and rarely while it works. Every change gets a sequence number,
+    so peers can ask for the changes since their last query.
+    """
+
+    def __init__(self, app_setting: 'AppSetting'):
+        """
+        Initialize ServiceStateTracker.
+
+        Args:
+            app_setting (AppSetting): Instance of the AppSetting class.
+        """
+        self.app_setting = app_setting
+        self.logger = self.app_setting.get_logger()
+        self.systemctl_path = self.app_setting.get_config('Services', 'systemctl_path', fallback='systemctl')
+        self.journalctl_path = self.app_setting.get_config('Services', 'journalctl_path', fallback='journalctl')
+        self.poll_interval = float(self.app_setting.get_config('Services', 'poll_interval', fallback='30'))
+        self.resync_interval = float(self.app_setting.get_config('Services', 'resync_interval', fallback='300'))
+        self.batch_delay = float(self.app_setting.get_config('Services', 'batch_delay', fallback='0.2'))
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # unit -> [load, active, sub, seq]
+        self.units: Dict[str, List[Any]] = {}
+        self.seq = 0
+        self.snapshots = 0
+        self._pending = set()
+        self._stream_alive = False
+        self._snapshot_due = True
+        self._stream_process = None
+        self._stopped = False
+        self._threads = []
+
+    def start(self) -> None:
+        """Start the worker and, if configured, the journal stream reader."""
+        self._threads = [threading.Thread(target=self._worker, name="services-worker", daemon=True)]
+        if self.journalctl_path:
+            self._threads.append(threading.Thread(target=self._stream_reader, name="services-stream", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify_all()
+        if self._stream_process is not None:
+            self._stream_process.kill()
+
+    def apply_config(self) -> None:
+        """Re-read the polling intervals after a config reload; the next snapshot runs now and schedules the one after with them."""
+        try:
+            poll_interval = float(self.app_setting.get_config('Services', 'poll_interval', fallback='30'))
+            resync_interval = float(self.app_setting.get_config('Services', 'resync_interval', fallback='300'))
+            batch_delay = float(self.app_setting.get_config('Services', 'batch_delay', fallback='0.2'))
+        except ValueError as error:
+            self.logger.error(f"[ServiceStateTracker][apply_config]> Invalid [Services] settings, keeping current: {error}")
+            return
+        with self._wakeup:
+            self.poll_interval = poll_interval
+            self.resync_interval = resync_interval
+            self.batch_delay = batch_delay
+            self._snapshot_due = True
+            self._wakeup.notify_all()
+
+    def _run_systemctl(self, *args: str) -> Optional[str]:
+        try:
+            return subprocess.check_output([self.systemctl_path, *args], stderr=subprocess.DEVNULL).decode('utf-8', 'replace')
+        except (subprocess.CalledProcessError, OSError) as error:
+            self.logger.error(f"[ServiceStateTracker][systemctl]> {self.systemctl_path} {args[0]} failed: {error}")
+            return None
+
+    def _set_unit(self, unit: str, state: Tuple[str, str, str]) -> bool:
+        """Записывает состояние юнита. Вызывается под _lock. Возвращает True, если оно изменилось."""
+        current = self.units.get(unit)
+        if current is not None and tuple(current[:3]) == state:
+            return False
+        if current is None and state == UNLOADED_STATE:
+            return False
+        self.seq += 1
+        self.units[unit] = [*state, self.seq]
+        return True
+
+    def snapshot(self) -> bool:
+        """
+        Read all units with one `systemctl list-units` and diff them against the table.
+
+        Returns:
+            bool: False if systemctl failed.
+        """
+        output = self._run_systemctl('list-units', '--all', '--full', '--plain', '--no-legend', '--no-pager')
+        if output is None:
+            return False
+        seen = {}
+        for line in output.splitlines():
+            fields = line.split(None, 4)
+            if len(fields) >= 4:
+                seen[fields[0]] = (fields[1], fields[2], fields[3])
+        changed = 0
+        with self._lock:
+            for unit, state in seen.items():
+                changed += self._set_unit(unit, state)
+            # Юнит пропал из списка - systemd выгрузил его
+            for unit in self.units.keys() - seen.keys():
+                changed += self._set_unit(unit, UNLOADED_STATE)
+            self.snapshots += 1
+        if changed:
+            self.logger.debug(f"[ServiceStateTracker][snapshot]> {changed} units changed")
+        return True
+
+    def refresh_units(self, units: Iterable[str]) -> None:
+        """
+        Re-read the given units with one `systemctl show`.
+
+        If the batch call fails (e.g. one invalid unit name), every unit is
+        re-read with its own call, so one bad name does not drop the rest.
+        """
+        units = sorted(units)
+        if not units:
+            return
+        output = self._show_units(units)
+        if output is not None:
+            self._apply_show(output)
+            return
+        for unit in units:
+            output = self._show_units([unit])
+            if output is not None:
+                self._apply_show(output, unit)
+
+    def _show_units(self, units: List[str]) -> Optional[str]:
+        return self._run_systemctl('show', '--property=Id,LoadState,ActiveState,SubState', '--', *units)
+
+    def _apply_show(self, output: str, default_unit: Optional[str] = None) -> None:
+        with self._lock:
+            # Блоки свойств разделены пустой строкой. Юнит берётся из Id блока, а не из
+            # позиции: псевдоним возвращает блок под основным именем
+            for block in output.split("\n\n"):
+                properties = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+                unit = properties.get("Id") or default_unit
+                if not unit:
+                    continue
+                state = (properties.get("LoadState", ""), properties.get("ActiveState", ""), properties.get("SubState", ""))
+                self._set_unit(unit, state)
+
+    def _stream_reader(self) -> None:
+        stream_failed = False
+        while not self._stopped:
+            try:
+                self._stream_process = subprocess.Popen(
+                    [self.journalctl_path, '--follow', '--lines=0', '--output=json', '_PID=1'],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                )
+            except OSError as error:
+                # Повторяем попытки молча, чтобы не засорять лог каждые poll_interval
+                log = self.logger.debug if stream_failed else self.logger.warning
+                log(f"[ServiceStateTracker][stream]> Cannot start {self.journalctl_path}: {error}, polling only")
+                stream_failed = True
+                self._stream_wait()
+                continue
+            self._stream_alive = True
+            stream_failed = False
+            self.logger.info(f"[ServiceStateTracker][stream]> Following unit changes from the journal")
+            for line in self._stream_process.stdout:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                unit = entry.get("UNIT") if isinstance(entry, dict) else None
+                if isinstance(unit, str) and unit:
+                    with self._wakeup:
+                        self._pending.add(unit)
+                        self._wakeup.notify()
+            self._stream_process.wait()
+            self._stream_alive = False
+            if not self._stopped:
+                self.logger.warning(f"[ServiceStateTracker][stream]> Journal stream ended with code {self._stream_process.returncode}, polling every {self.poll_interval}s")
+                # Изменения, пропущенные за время перезапуска потока, подберёт снимок
+                with self._wakeup:
+                    self._snapshot_due = True
+                    self._wakeup.notify()
+                self._stream_wait()
+
+    def _stream_wait(self) -> None:
+        with self._wakeup:
+            self._wakeup.wait_for(lambda: self._stopped, timeout=self.poll_interval)
+
+    def _worker(self) -> None:
+        next_snapshot = 0.0
+        while True:
+            with self._wakeup:
+                timeout = next_snapshot - time.monotonic()
+                if not self._pending and not self._snapshot_due and timeout > 0:
+                    self._wakeup.wait(timeout)
+                if self._stopped:
+                    return
+                pending_now = bool(self._pending)
+                if self._snapshot_due:
+                    self._snapshot_due = False
+                    next_snapshot = 0.0
+            if pending_now:
+                # Пачка сообщений об одном перезапуске превращается в один вызов systemctl show
+                time.sleep(self.batch_delay)
+                with self._lock:
+                    pending, self._pending = self._pending, set()
+                self.refresh_units(pending)
+            if time.monotonic() >= next_snapshot:
+                self.snapshot()
+                interval = self.resync_interval if self._stream_alive else self.poll_interval
+                next_snapshot = time.monotonic() + interval
+
+    def get_units(self, since: int = 0, units: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        States of the units changed after since.
+
+        Args:
+            since (int): Sequence number from the previous answer, 0 for all units.
+            units (iterable, optional): Only these units.
+
+        Returns:
+            dict: {"seq": current sequence, "units": {unit: {"load", "active", "sub"}}}.
+        """
+        with self._lock:
+            names = self.units.keys() if not units else [unit for unit in units if unit in self.units]
+            result = {}
+            for unit in names:
+                load, active, sub, seq = self.units[unit]
+                if seq > since:
+                    result[unit] = {"load": load, "active": active, "sub": sub}
+            return {"seq": self.seq, "units": result}
+
+    def unit_names(self) -> Optional[List[str]]:
+        """Имена загруженных юнитов или None, пока таблица не заполнена первым снимком."""
+        with self._lock:
+            if not self.snapshots:
+                return None
+            return sorted(unit for unit, state in self.units.items() if state[0] != UNLOADED_STATE[0])
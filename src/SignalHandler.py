@@ -1,17 +1,21 @@
 import signal
 import sys
+import threading
 
 class SignalHandler:
     """Class for handling operating system signals"""
 
-    def __init__(self, logger):
+    def __init__(self, logger, reload_callback=None):
         """
         Initialize SignalHandler with a logger.
 
         Args:
             logger: Logger object for logging messages.
+            reload_callback (callable, optional): Called on SIGHUP to reload the configuration.
         """
         self.logger = logger
+        self.reload_callback = reload_callback
+        self._reload_requested = threading.Event()
 
 
     def register_signal_handlers(self):
@@ -20,6 +24,24 @@ class SignalHandler:
         signal.signal(signal.SIGTERM, self.signal_handler)
         signal.signal(signal.SIGHUP, self.signal_handler_hup)  # Register handler for SIGHUP
         signal.signal(signal.SIGUSR1, self.signal_handler_usr1)  # Register handler for SIGUSR1
+        if self.reload_callback is not None:
+            threading.Thread(target=self.reload_worker, name="config-reload", daemon=True).start()
+
+
+    def reload_worker(self):
+        """
+        Run reload_callback once per SIGHUP burst.
+
+        The reload takes locks and joins threads, so it runs here rather than
+        in the signal handler, which interrupts an arbitrary frame of the main thread.
+        """
+        while True:
+            self._reload_requested.wait()
+            self._reload_requested.clear()
+            try:
+                self.reload_callback()
+            except Exception as e:
+                self.logger.error(f"[SignalHandler][reload_worker]> Configuration reload failed: {e}")
 
 
     def signal_handler(self, signum, frame):
@@ -43,7 +65,8 @@ class SignalHandler:
             signum: Signal number.
             frame: Current stack frame.
         """
-        self.logger.info("[SignalHandler][signal_handler_hup]> Received SIGHUP signal, restarting services...")
+        self.logger.info("[SignalHandler][signal_handler_hup]> Received SIGHUP signal, reloading configuration...")
+        self._reload_requested.set()
 
 
     def signal_handler_usr1(self, signum, frame):
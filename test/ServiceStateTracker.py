@@ -0,0 +1,121 @@
+"""
+Check of ServiceStateTracker against test/fake_systemd.py.
+
+Run from the test directory: python ServiceStateTracker.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from MainClusterConfigurator import AppSetting
+from ServiceStateTracker import ServiceStateTracker
+
+
+def write_units(state_dir, lines):
+    with open(os.path.join(state_dir, "units"), "w") as units_file:
+        units_file.write("\n".join(lines) + "\n")
+
+
+def calls(state_dir):
+    with open(os.path.join(state_dir, "calls")) as calls_file:
+        return calls_file.read().splitlines()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    state_dir = tempfile.mkdtemp(prefix="fake-systemd.")
+    os.environ["FAKE_SYSTEMD_DIR"] = state_dir
+    fake = os.path.join(HERE, "fake_systemd.py")
+    ini = os.path.join(state_dir, "trinity.ini")
+    with open(ini, "w") as ini_file:
+        ini_file.write(f"[Logging]\nlog_file = {os.path.join(state_dir, 'log.log')}\nlog_level = INFO\n\n"
+                       f"[Services]\nsystemctl_path = {fake}\njournalctl_path = {fake}\n"
+                       f"poll_interval = 60\nresync_interval = 60\nbatch_delay = 0.1\n")
+    write_units(state_dir, [
+        "sshd.service loaded active running",
+        "cron.service loaded active running",
+        "nginx.service loaded failed failed",
+    ])
+    tracker = ServiceStateTracker(AppSetting(ini))
+
+    # Снимок list-units заполняет таблицу
+    assert tracker.snapshot()
+    answer = tracker.get_units()
+    assert set(answer["units"]) == {"sshd.service", "cron.service", "nginx.service"}, answer
+    assert answer["units"]["nginx.service"] == {"load": "loaded", "active": "failed", "sub": "failed"}, answer
+    assert tracker.unit_names() == ["cron.service", "nginx.service", "sshd.service"]
+    seq = answer["seq"]
+
+    # Повторный снимок без изменений ничего не меняет, изменённый юнит и пропавший юнит попадают в дельту
+    assert tracker.snapshot() and tracker.get_units(seq) == {"seq": seq, "units": {}}
+    write_units(state_dir, [
+        "sshd.service loaded active running",
+        "nginx.service loaded active running",
+    ])
+    assert tracker.snapshot()
+    delta = tracker.get_units(seq)
+    assert delta["units"] == {
+        "nginx.service": {"load": "loaded", "active": "active", "sub": "running"},
+        "cron.service": {"load": "not-found", "active": "inactive", "sub": "dead"},
+    }, delta
+    seq = delta["seq"]
+
+    # show по Id: псевдоним возвращает блок основного юнита, неизвестный юнит - not-found
+    write_units(state_dir, [
+        "sshd.service loaded failed failed",
+        "nginx.service loaded active running",
+        "web.service -> nginx.service",
+    ])
+    tracker.refresh_units(["sshd.service", "web.service", "missing.service"])
+    delta = tracker.get_units(seq)
+    assert delta["units"] == {"sshd.service": {"load": "loaded", "active": "failed", "sub": "failed"}}, delta
+    assert "web.service" not in tracker.units and "missing.service" not in tracker.units
+    seq = delta["seq"]
+
+    # Ошибка пакетного show: каждый юнит перечитывается отдельным вызовом
+    write_units(state_dir, [
+        "sshd.service loaded active running",
+        "nginx.service loaded active running",
+    ])
+    before = len(calls(state_dir))
+    tracker.refresh_units(["bad@name", "sshd.service"])
+    assert len(calls(state_dir)) - before == 3, calls(state_dir)[before:]
+    assert tracker.get_units(seq, ["sshd.service"])["units"] == {"sshd.service": {"load": "loaded", "active": "active", "sub": "running"}}
+    seq = tracker.seq
+
+    # Поток журнала: сообщение об юните приводит к systemctl show только для него
+    snapshots = tracker.snapshots
+    tracker.start()
+    try:
+        assert wait_for(lambda: tracker._stream_alive and tracker.snapshots > snapshots)
+        write_units(state_dir, [
+            "sshd.service loaded active running",
+            "nginx.service loaded activating start",
+        ])
+        # Фейковый journalctl мог ещё не перейти в конец журнала: сообщение повторяется до ответа
+        for _ in range(10):
+            with open(os.path.join(state_dir, "journal"), "a") as journal:
+                journal.write("nginx.service\n")
+            if wait_for(lambda: "nginx.service" in tracker.get_units(seq)["units"], timeout=0.5):
+                break
+        assert tracker.get_units(seq)["units"] == {"nginx.service": {"load": "loaded", "active": "activating", "sub": "start"}}
+        assert calls(state_dir)[-1].endswith("-- nginx.service"), calls(state_dir)[-1]
+    finally:
+        tracker.stop()
+    print("ServiceStateTracker: ok")
+
+
+if __name__ == "__main__":
+    main()
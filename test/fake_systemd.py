@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Fake systemctl and journalctl for ServiceStateTracker.
+
+Point both [Services] systemctl_path and journalctl_path at this script.
+The state lives in the directory from FAKE_SYSTEMD_DIR:
+
+    units    - one unit per line: "name load active sub", or "alias -> name"
+    journal  - appended lines are streamed as PID 1 messages about that unit
+    calls    - every systemctl call is logged here, one line per call
+
+Unit names starting with "bad" make `systemctl show` fail like an invalid
+unit name does, so the per-unit fallback can be checked.
+"""
+import json
+import os
+import sys
+import time
+
+STATE_DIR = os.environ.get("FAKE_SYSTEMD_DIR", os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_units():
+    units, aliases = {}, {}
+    with open(os.path.join(STATE_DIR, "units")) as units_file:
+        for line in units_file:
+            fields = line.split()
+            if len(fields) == 3 and fields[1] == "->":
+                aliases[fields[0]] = fields[2]
+            elif len(fields) >= 4:
+                units[fields[0]] = fields[1:4]
+    return units, aliases
+
+
+def list_units():
+    units, _ = read_units()
+    for name, (load, active, sub) in units.items():
+        print(f"{name} {load} {active} {sub} Fake unit {name}")
+
+
+def show(names):
+    if any(name.startswith("bad") for name in names):
+        print("Invalid unit name", file=sys.stderr)
+        return 1
+    units, aliases = read_units()
+    blocks = []
+    for name in names:
+        name = aliases.get(name, name)
+        load, active, sub = units.get(name, ("not-found", "inactive", "dead"))
+        blocks.append(f"Id={name}\nLoadState={load}\nActiveState={active}\nSubState={sub}\n")
+    sys.stdout.write("\n".join(blocks))
+    return 0
+
+
+def follow():
+    # --lines=0: только новые строки журнала
+    path = os.path.join(STATE_DIR, "journal")
+    open(path, "a").close()
+    with open(path) as journal:
+        journal.seek(0, os.SEEK_END)
+        while True:
+            line = journal.readline()
+            if not line:
+                time.sleep(0.05)
+                continue
+            print(json.dumps({"_PID": "1", "UNIT": line.strip(), "MESSAGE": "State changed"}), flush=True)
+
+
+def main(args):
+    if "--follow" in args:
+        follow()
+        return 0
+    with open(os.path.join(STATE_DIR, "calls"), "a") as calls:
+        calls.write(" ".join(args) + "\n")
+    if args and args[0] == "list-units":
+        list_units()
+        return 0
+    if args and args[0] == "show":
+        names = args[args.index("--") + 1:] if "--" in args else [arg for arg in args[1:] if not arg.startswith("-")]
+        return show(names)
+    print(f"Unsupported command: {' '.join(args)}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))